@@ -3,7 +3,9 @@ from flask import Blueprint, request, jsonify, g, current_app
 from app.models.file import File
 from app.utils.tokenUtils import token_required
 from app.services.file_service import store_file, get_files
+from app.services.retrieval import get_bm25_retriever, get_semantic_cache
 from app.extensions import oss_client, db
+from app.pipelines.chunk_hashes import ChunkHashStore
 
 bp = Blueprint('knowledge_base', __name__, url_prefix='/knowledge_base')
 
@@ -20,10 +22,35 @@ async def upload_file():
     files = request.files.getlist('files')
     collection_name = request.form.get('collection_name', 'java_doc_plus')
     category = request.form.get('category', 'Java开发')
-    milvus_client = current_app.extensions['milvus']
-    if milvus_client.collection_name != collection_name:
-        milvus_client.change_collection(collection_name)
-    return store_file(files, user.id, category)
+    replace = request.form.get('replace', 'false').lower() in ('1', 'true')
+    return store_file(files, user.id, category, collection_name, replace=replace)
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+async def get_job(job_id):
+    """查询入库任务的阶段、已处理分块数、吞吐与错误信息，只能查看自己的任务（管理员除外）"""
+    user = g.user
+    job = current_app.extensions['ingestion'].get_job(job_id)
+    # 他人的任务同样返回 404，不暴露任务是否存在
+    if job is None or (job.get('user_id') != user.id and user.user_type != 'Administrator'):
+        return jsonify({'error': 'Job not found'}), 404
+    job.pop('spool_path', None)
+    return jsonify(job), 200
+
+
+@bp.route('/jobs/<job_id>/retry', methods=['POST'])
+@token_required
+async def retry_job(job_id):
+    """重试失败的入库任务，使用服务端保存的文件，无需重新上传"""
+    user = g.user
+    if user.user_type != 'Administrator':
+        return jsonify({'error': 'You are not authorized'}), 401
+
+    error = current_app.extensions['ingestion'].retry(job_id)
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify({'msg': 'Job requeued', 'job_id': job_id}), 202
+
 
 @bp.route('/list_files', methods=['GET'])
 @token_required
@@ -65,17 +92,22 @@ async def delete_file(file_name):
 
     # 从数据库中删除文件记录
     file_record = File.query.filter_by(name=file_name).first()
-    collection_name = file_record.collection_name
+    collection_name = file_record.collection_name if file_record else request.args.get('collection_name', 'java_doc_plus')
     if file_record:
         db.session.delete(file_record)
         db.session.commit()
 
     # 从 Milvus 中删除文件相关的向量
     milvus_client = current_app.extensions['milvus']
-    if milvus_client.collection_name != collection_name:
-        milvus_client.change_collection(collection_name)
-
-    milvus_client.delete_by_file_name(file_name)
+    milvus_client.delete_by_file_name(file_name, collection_name=collection_name)
+    ChunkHashStore(collection_name).delete_file(file_name)
+    db.session.commit()
+    bm25 = get_bm25_retriever(collection_name)
+    with bm25.writing():
+        bm25.delete_file(file_name)
+    semantic_cache = get_semantic_cache()
+    if semantic_cache:
+        semantic_cache.invalidate_file(collection_name, file_name)
 
     return jsonify({'msg': 'File deleted successfully'}), 200
 
@@ -0,0 +1,43 @@
+from flask import Blueprint, Response
+
+from app.services.embedding import model_registry
+from app.services.embedding_cache import get_query_embedding_cache
+from app.utils.metrics import metrics_registry
+
+bp = Blueprint('metrics', __name__)
+
+
+def _model_samples(field: str):
+    return [
+        ({"model": stats["model_name"], "device": stats["device"]}, stats[field])
+        for stats in model_registry.stats()
+    ]
+
+
+metrics_registry.register_gauges("model_memory_bytes", "已加载模型占用的内存（字节）",
+                                 lambda: _model_samples("memory_bytes"))
+metrics_registry.register_gauges("model_load_seconds", "模型加载耗时（秒）",
+                                 lambda: _model_samples("load_seconds"))
+
+
+def _query_cache_samples(field: str):
+    cache = get_query_embedding_cache()
+    if cache is None:
+        return []
+    stats = cache.stats()
+    if field == "hit_rate":
+        return [({}, stats["hit_rate"])]
+    return [({"tier": "local"}, stats["local_hits"]), ({"tier": "redis"}, stats["redis_hits"]),
+            ({"tier": "miss"}, stats["misses"])]
+
+
+metrics_registry.register_gauges("query_embedding_cache_lookups", "查询向量缓存按层级统计的查询次数",
+                                 lambda: _query_cache_samples("lookups"))
+metrics_registry.register_gauges("query_embedding_cache_hit_rate", "查询向量缓存命中率",
+                                 lambda: _query_cache_samples("hit_rate"))
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 文本格式的指标"""
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
@@ -1,6 +1,12 @@
-from flask import Blueprint, request, jsonify, Response, current_app
+from contextlib import closing
 
+from flask import Blueprint, request, jsonify, Response, current_app, g
+
+from app.config import Settings
 from app.services.rag import RAGService
+from app.utils.async_stream import iterate_async
+from app.utils.metrics import start_request_timings
+from app.utils.tokenUtils import token_required
 
 bp = Blueprint('search', __name__)
 
@@ -12,27 +18,72 @@ async def search():
         query = data.get("query")
         top_k = data.get("top_k", 5)
         model = data.get("model", "hunyuan")# 默认检索前 5 条结果
+        collection_name = data.get("collection_name", "java_doc_plus")
 
         if not query:
             return jsonify({"error": "Missing 'query' in request body"}), 400
         if model not in ["hunyuan", "deepseek"]:
             model = "hunyuan"
         # 2. 初始化 RAG 服务
-        rag_service = RAGService(LLMrequire=model)
+        rag_service = RAGService(LLMrequire=model, collection_name=collection_name)
 
         # 3. 执行 RAG 查询
+        timings = start_request_timings()
         result = await rag_service.query(query, top_k=top_k)
 
         # 4. 构造响应
-        return jsonify({
+        response = {
             "answer": result["answer"],
             "retrieved_docs": result["retrieved_docs"]
-        })
+        }
+        if data.get("timings"):
+            response["timings"] = timings  # 各阶段耗时（毫秒）
+        return jsonify(response)
 
     except Exception as e:
         # 捕获异常并返回错误信息
         return jsonify({"error": str(e)}), 500
 
+@bp.route('/search/batch', methods=['POST'])
+@token_required
+async def batch_search():
+    """
+    批量检索（不调用 LLM），供离线评估与评分工具使用；检索当前用户可见的数据（公共数据 + 本人私有数据）
+    请求体：{"queries": ["...", {"query": "...", "top_k": 10}], "top_k": 5,
+             "collection_name": "java_doc_plus", "timings": false}
+    管理员可以用顶层或单条查询的 "belong_to" 指定按哪个用户的可见范围检索
+    """
+    try:
+        data = request.get_json()
+        queries = data.get("queries")
+        if not queries or not isinstance(queries, list):
+            return jsonify({"error": "Missing 'queries' in request body"}), 400
+        if len(queries) > Settings.SEARCH_BATCH_MAX_QUERIES:
+            return jsonify({"error": f"At most {Settings.SEARCH_BATCH_MAX_QUERIES} queries per request"}), 400
+        if any(not (q.get("query") if isinstance(q, dict) else q) for q in queries):
+            return jsonify({"error": "Empty query in 'queries'"}), 400
+
+        # 归属只能来自登录用户，请求体中的 belong_to 仅对管理员生效
+        user = g.user
+        belong_to = user.id
+        requested = [data.get("belong_to")] + [q.get("belong_to") for q in queries if isinstance(q, dict)]
+        if any(owner is not None and int(owner) != user.id for owner in requested):
+            if user.user_type != 'Administrator':
+                return jsonify({"error": "Only administrators can search other users' documents"}), 403
+            belong_to = int(data.get("belong_to", user.id))
+
+        rag_service = RAGService(collection_name=data.get("collection_name", "java_doc_plus"))
+        timings = start_request_timings()
+        results = rag_service.batch_retrieve(queries, top_k=data.get("top_k", 5), belong_to=belong_to)
+        response = {"results": results}
+        if data.get("timings"):
+            response["timings"] = timings  # 各阶段耗时（毫秒）
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @bp.route('/hybrid_search', methods=['POST'])
 async def hybrid_search():
     try:
@@ -41,6 +92,7 @@ async def hybrid_search():
         query = data.get("query")
         top_k = data.get("top_k", 5)  # 默认检索前 5 条结果
         model = data.get("model", "hunyuan")
+        collection_name = data.get("collection_name", "java_doc_plus")
 
         if not query:
             return jsonify({"error": "Missing 'query' in request body"}), 400
@@ -49,16 +101,20 @@ async def hybrid_search():
             model = "hunyuan"
 
         # 2. 初始化 RAG 服务
-        rag_service = RAGService(LLMrequire=model)
+        rag_service = RAGService(LLMrequire=model, collection_name=collection_name)
 
         # 3. 执行 RAG 查询
+        timings = start_request_timings()
         result = await rag_service.hybrid_search(query, top_k=top_k)
 
         # 4. 构造响应
-        return jsonify({
+        response = {
             "answer": result["answer"],
             "retrieved_docs": result["retrieved_docs"]
-        })
+        }
+        if data.get("timings"):
+            response["timings"] = timings  # 各阶段耗时（毫秒）
+        return jsonify(response)
 
     except Exception as e:
         # 捕获异常并返回错误信息
@@ -72,30 +128,23 @@ def stream_output():
     top_k = data.get("top_k", 5)# 默认检索前 5 条结果
     model = data.get("model","hunyuan")
     collection_name = data.get("collection_name", "java_doc_plus")
-    milvus_client = current_app.extensions['milvus']
-    if milvus_client.collection_name != collection_name:
-        milvus_client.change_collection(collection_name)
     print("query:",query)
     if not query:
         return jsonify({"error": "Missing 'query' in request body"}), 400
     if model not in ["hunyuan", "deepseek"]:
         model = "hunyuan"
         # 2. 初始化 RAG 服务
-    rag_service = RAGService(LLMrequire=model)
+    rag_service = RAGService(LLMrequire=model, collection_name=collection_name)
     print("service:",rag_service)
+    app = current_app._get_current_object()
 
     def generate():
         try:
-            # 流式输出文档和生成内容
-            import asyncio
-            async def _collect_async_results():
-                results = []
-                async for packet in rag_service.stream_output(query, top_k=top_k):
-                    results.append(packet)
-                return results
-
-            for packet in asyncio.run(_collect_async_results()):
-                yield f"data: {packet}\n\n"
+            # 文档包在检索完成后立即发送，LLM 增量到达即转发；客户端断开时取消上游生成
+            packets = iterate_async(lambda: rag_service.stream_output(query, top_k=top_k), app=app)
+            with closing(packets):
+                for packet in packets:
+                    yield f"data: {packet}\n\n"
             yield "data: [END]\n\n"
         except Exception as e:
             print(f"Error during streaming: {e}")
@@ -106,6 +155,7 @@ def stream_output():
         mimetype="text/event-stream",
         headers={
             'Cache-Control': 'no-cache',
-            'Connection': 'keep-alive'
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no'
         }
-    )
\ No newline at end of file
+    )
@@ -1,12 +1,12 @@
 from pathlib import Path
 
-from decouple import Config, RepositoryEnv
+from decouple import Config, RepositoryEmpty, RepositoryEnv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-# 加载 .env 文件
+# 加载 .env 文件；没有 .env 时（由容器注入环境变量、单元测试）只读取环境变量
 env_path = BASE_DIR / ".env"
-config = Config(RepositoryEnv(env_path))
+config = Config(RepositoryEnv(env_path) if env_path.exists() else RepositoryEmpty())
 
 
 class Settings:
@@ -31,3 +31,54 @@ class Settings:
     NEO4J_PASSWORD = config('NEO4J_PASSWORD')
     SECRET_KEY = config('SECRET_KEY')
     REDIS_URL = config('REDIS_URL')
+    JIEBA_CACHE_FILE = config('JIEBA_CACHE_FILE', default=str(BASE_DIR / 'data' / 'cache' / 'jieba.cache'))
+    KEYWORD_CACHE_SIZE = config('KEYWORD_CACHE_SIZE', default=4096, cast=int)
+    INTENT_CENTROIDS_PATH = config('INTENT_CENTROIDS_PATH', default=str(BASE_DIR / 'data' / 'models' / 'intent_centroids.npz'))
+    INTENT_CONFIDENCE_THRESHOLD = config('INTENT_CONFIDENCE_THRESHOLD', default=0.6, cast=float)
+    BM25_INDEX_DIR = config('BM25_INDEX_DIR', default=str(BASE_DIR / 'data' / 'index' / 'bm25'))
+    FUSION_STRATEGY = config('FUSION_STRATEGY', default='weighted')
+    RETRIEVAL_CANDIDATE_K = config('RETRIEVAL_CANDIDATE_K', default=30, cast=int)
+    RERANK_ENABLED = config('RERANK_ENABLED', default=False, cast=bool)
+    RERANK_MODEL = config('RERANK_MODEL', default='BAAI/bge-reranker-base')
+    RERANK_TOP_N = config('RERANK_TOP_N', default=20, cast=int)
+    RERANK_SCORE_THRESHOLD = config('RERANK_SCORE_THRESHOLD', default=0.05, cast=float)
+    RERANK_TOKEN_BUDGET = config('RERANK_TOKEN_BUDGET', default=0, cast=int)
+    # 同时保持 load 的集合数，超出后释放最久未使用（且空闲超过 MILVUS_COLLECTION_IDLE_SECONDS）的集合
+    MILVUS_MAX_LOADED_COLLECTIONS = config('MILVUS_MAX_LOADED_COLLECTIONS', default=4, cast=int)
+    MILVUS_COLLECTION_IDLE_SECONDS = config('MILVUS_COLLECTION_IDLE_SECONDS', default=300, cast=int)
+    # 新建集合的向量索引配置（见 app/db/index_profiles.py）：默认预置配置名，
+    # 及集合名 -> 预置配置名或完整配置的 JSON，例如 {"java_doc_plus": "hnsw"}
+    MILVUS_DEFAULT_INDEX_PROFILE = config('MILVUS_DEFAULT_INDEX_PROFILE', default='ivf_flat')
+    MILVUS_INDEX_PROFILES = config('MILVUS_INDEX_PROFILES', default='{}')
+    # 向量检索后端：milvus，或单机部署 / 基准测试使用的进程内 faiss（索引文件保存在 FAISS_INDEX_DIR）
+    VECTOR_STORE_BACKEND = config('VECTOR_STORE_BACKEND', default='milvus')
+    FAISS_INDEX_DIR = config('FAISS_INDEX_DIR', default=str(BASE_DIR / 'data' / 'index' / 'faiss'))
+    SEARCH_BATCH_MAX_QUERIES = config('SEARCH_BATCH_MAX_QUERIES', default=1000, cast=int)
+    # 启动时预加载模型并连接 Milvus，否则在首次使用时加载
+    WARMUP_ON_START = config('WARMUP_ON_START', default=False, cast=bool)
+    INGEST_WORKERS = config('INGEST_WORKERS', default=2, cast=int)
+    # 在 Web 进程内启动入库 worker（单进程部署）；默认关闭，由 `flask ingest-worker` 单独运行
+    INGEST_WORKERS_ON_START = config('INGEST_WORKERS_ON_START', default=False, cast=bool)
+    INGEST_SPOOL_DIR = config('INGEST_SPOOL_DIR', default=str(BASE_DIR / 'data' / 'spool'))
+    INGEST_STALE_SECONDS = config('INGEST_STALE_SECONDS', default=1800, cast=int)
+    # 0 表示 CPU 核数 - 1
+    PDF_PARTITION_WORKERS = config('PDF_PARTITION_WORKERS', default=0, cast=int)
+    PDF_PAGES_PER_TASK = config('PDF_PAGES_PER_TASK', default=20, cast=int)
+    EMBEDDING_BATCH_WINDOW_MS = config('EMBEDDING_BATCH_WINDOW_MS', default=5.0, cast=float)
+    EMBEDDING_MAX_BATCH_SIZE = config('EMBEDDING_MAX_BATCH_SIZE', default=32, cast=int)
+    EMBEDDING_INGEST_BATCH_SIZE = config('EMBEDDING_INGEST_BATCH_SIZE', default=64, cast=int)
+    INGEST_INSERT_BATCH_SIZE = config('INGEST_INSERT_BATCH_SIZE', default=512, cast=int)
+    QUERY_EMBEDDING_CACHE_SIZE = config('QUERY_EMBEDDING_CACHE_SIZE', default=10000, cast=int)
+    QUERY_EMBEDDING_CACHE_TTL = config('QUERY_EMBEDDING_CACHE_TTL', default=604800, cast=int)
+    # torch / onnx（需先运行 data/build/export_onnx_embedding.py 导出 int8 模型）
+    EMBEDDING_BACKEND = config('EMBEDDING_BACKEND', default='torch')
+    EMBEDDING_ONNX_DIR = config('EMBEDDING_ONNX_DIR', default=str(BASE_DIR / 'data' / 'onnx' / 'bge-small-zh-v1.5-int8'))
+    # 0 表示由 ONNX Runtime 自行决定
+    EMBEDDING_ONNX_THREADS = config('EMBEDDING_ONNX_THREADS', default=0, cast=int)
+    EMBEDDING_STORE_ENABLED = config('EMBEDDING_STORE_ENABLED', default=True, cast=bool)
+    EMBEDDING_STORE_DIR = config('EMBEDDING_STORE_DIR', default=str(BASE_DIR / 'data' / 'embeddings'))
+    CONTEXT_TOKEN_BUDGET = config('CONTEXT_TOKEN_BUDGET', default=3000, cast=int)
+    SEMANTIC_CACHE_ENABLED = config('SEMANTIC_CACHE_ENABLED', default=False, cast=bool)
+    SEMANTIC_CACHE_THRESHOLD = config('SEMANTIC_CACHE_THRESHOLD', default=0.92, cast=float)
+    SEMANTIC_CACHE_TTL = config('SEMANTIC_CACHE_TTL', default=86400, cast=int)
+    SEMANTIC_CACHE_MAX_ENTRIES = config('SEMANTIC_CACHE_MAX_ENTRIES', default=1000, cast=int)
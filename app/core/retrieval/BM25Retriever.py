@@ -0,0 +1,340 @@
+import json
+import math
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+
+import jieba
+
+from app.utils.versioned_dir import VersionedDir
+
+
+def default_tokenize(text: str) -> list:
+    """jieba 精确模式分词，保留词频，过滤空白与单个标点"""
+    return [w.lower() for w in jieba.lcut(text) if w.strip() and (len(w) > 1 or w.isalnum())]
+
+
+class BM25Retriever:
+    """
+    基于倒排索引的 BM25 检索，文档以 (file_name, chunk_index) 为键
+
+    - 基础段：按词项连续存放的 postings（doc_id / tf 两个 int32 数组 + 词项偏移），
+      持久化为 .npy 文件并以 mmap 方式加载
+    - 增量段：save() 之后新增的文档保存在内存中；删除通过墓碑标记
+    save() 合并两段、剔除已删除文档，写入 index_dir 下的新版本目录后一次切换（见 VersionedDir）
+    多个进程共享 index_dir 时，修改应在 writing() 内进行：持有跨进程锁，先加载其他进程保存的版本再修改并保存
+    """
+
+    ARRAY_FILES = ("offsets", "postings_doc", "postings_tf", "doc_len", "belong_to", "alive")
+
+    def __init__(self, index_dir: str = None, tokenize=default_tokenize, k1: float = 1.5, b: float = 0.75):
+        self.index_dir = index_dir
+        self.tokenize = tokenize
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._store = VersionedDir(index_dir) if index_dir else None
+        self._loaded_version = None
+        self._reset()
+        if self._store and self._store.current_path(legacy_marker="meta.json"):
+            self.load()
+
+    # ------------------------------------------------------------------ 状态
+    def _reset(self):
+        # 基础段（只读，可能来自 mmap）
+        self.vocab = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings_doc = np.zeros(0, dtype=np.int32)
+        self.postings_tf = np.zeros(0, dtype=np.int32)
+        # 文档表（可变）
+        self.doc_keys = []
+        self.key_to_doc = {}
+        self.file_docs = {}
+        self.doc_len = []
+        self.belong_to = []
+        self.alive = []
+        self.alive_count = 0
+        self.total_len = 0
+        # 增量段：term -> ([doc_id], [tf])
+        self.delta = {}
+        self.dirty = False
+        self._doc_arrays = None
+
+    def clear(self):
+        """清空索引（重建时使用），save() 后生效"""
+        with self._lock:
+            self._reset()
+            self.dirty = True
+
+    def __len__(self):
+        return self.alive_count
+
+    # ------------------------------------------------------------------ 写入
+    def add(self, file_name: str, chunk_index: int, text: str, belong_to: int = 0):
+        tf = Counter(self.tokenize(text))
+        with self._lock:
+            key = (file_name, int(chunk_index))
+            if key in self.key_to_doc:
+                self._delete_doc(self.key_to_doc[key])
+
+            doc_id = len(self.doc_keys)
+            self.doc_keys.append(key)
+            self.key_to_doc[key] = doc_id
+            self.file_docs.setdefault(file_name, set()).add(doc_id)
+            length = sum(tf.values())
+            self.doc_len.append(length)
+            self.belong_to.append(int(belong_to))
+            self.alive.append(True)
+            self.alive_count += 1
+            self.total_len += length
+            for term, count in tf.items():
+                docs, tfs = self.delta.setdefault(term, ([], []))
+                docs.append(doc_id)
+                tfs.append(count)
+            self.dirty = True
+            self._doc_arrays = None
+
+    def add_documents(self, documents):
+        """:param documents: 可迭代的 dict，包含 file_name / chunk_index / content / belong_to"""
+        for doc in documents:
+            self.add(doc["file_name"], doc["chunk_index"], doc["content"], doc.get("belong_to", 0))
+
+    def delete(self, file_name: str, chunk_index: int):
+        with self._lock:
+            doc_id = self.key_to_doc.get((file_name, int(chunk_index)))
+            if doc_id is not None:
+                self._delete_doc(doc_id)
+
+    def delete_file(self, file_name: str):
+        with self._lock:
+            for doc_id in list(self.file_docs.get(file_name, [])):
+                self._delete_doc(doc_id)
+
+    def _delete_doc(self, doc_id: int):
+        if not self.alive[doc_id]:
+            return
+        file_name, _ = self.doc_keys[doc_id]
+        self.alive[doc_id] = False
+        self.alive_count -= 1
+        self.total_len -= self.doc_len[doc_id]
+        del self.key_to_doc[self.doc_keys[doc_id]]
+        docs = self.file_docs[file_name]
+        docs.discard(doc_id)
+        if not docs:
+            del self.file_docs[file_name]
+        self.dirty = True
+        self._doc_arrays = None
+
+    def _get_doc_arrays(self):
+        # 文档表的 numpy 视图，写入后失效，避免每次检索都从 list 转换
+        if self._doc_arrays is None:
+            self._doc_arrays = (
+                np.asarray(self.doc_len, dtype=np.float32),
+                np.asarray(self.belong_to, dtype=np.int32),
+                np.asarray(self.alive, dtype=bool),
+            )
+        return self._doc_arrays
+
+    # ------------------------------------------------------------------ 检索
+    def _postings(self, term: str):
+        docs, tfs = [], []
+        term_id = self.vocab.get(term)
+        if term_id is not None:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs.append(self.postings_doc[start:end])
+            tfs.append(self.postings_tf[start:end])
+        if term in self.delta:
+            delta_docs, delta_tfs = self.delta[term]
+            docs.append(np.asarray(delta_docs, dtype=np.int32))
+            tfs.append(np.asarray(delta_tfs, dtype=np.int32))
+        if not docs:
+            return None, None
+        return np.concatenate(docs), np.concatenate(tfs)
+
+    def search(self, query: str, top_k: int = 5, belong_to=None) -> list:
+        """
+        :param belong_to: 允许的 belong_to 取值列表，None 表示不过滤
+        :return: 按 BM25 分数降序的 [{"file_name", "chunk_index", "belong_to", "score"}]
+        """
+        self.reload_if_changed()
+        terms = set(self.tokenize(query))
+        with self._lock:
+            if not terms or self.alive_count == 0:
+                return []
+            n_docs = self.alive_count
+            avgdl = self.total_len / n_docs or 1.0
+            doc_len, doc_belong_to, doc_alive = self._get_doc_arrays()
+
+            cand_docs, contribs = [], []
+            for term in terms:
+                docs, tfs = self._postings(term)
+                if docs is None or len(docs) == 0:
+                    continue
+                # df 包含尚未合并掉的已删除文档，与 Lucene 的做法一致，save() 后恢复精确值
+                df = len(docs)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                tfs = tfs.astype(np.float32)
+                norm = self.k1 * (1 - self.b + self.b * doc_len[docs] / avgdl)
+                cand_docs.append(docs)
+                contribs.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+            if not cand_docs:
+                return []
+
+            # 只在候选文档上累加分数，开销与命中的 postings 数量成正比
+            uniq, inverse = np.unique(np.concatenate(cand_docs), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(contribs))
+
+            mask = doc_alive[uniq]
+            if belong_to is not None:
+                mask &= np.isin(doc_belong_to[uniq], list(belong_to))
+            uniq, scores = uniq[mask], scores[mask]
+            if len(uniq) == 0:
+                return []
+
+            if len(uniq) > top_k:
+                top = np.argpartition(-scores, top_k - 1)[:top_k]
+            else:
+                top = np.arange(len(uniq))
+            top = top[np.argsort(-scores[top], kind="stable")]
+
+            results = []
+            for i in top:
+                doc_id = int(uniq[i])
+                file_name, chunk_index = self.doc_keys[doc_id]
+                results.append({
+                    "file_name": file_name,
+                    "chunk_index": chunk_index,
+                    "belong_to": self.belong_to[doc_id],
+                    "score": float(scores[i]),
+                })
+            return results
+
+    # ------------------------------------------------------------------ 持久化
+    @contextmanager
+    def writing(self):
+        """
+        跨进程独占修改：加锁 → 加载其他进程保存的最新版本 → 在 with 块内修改 → 保存
+        with 块抛出异常时丢弃本次未保存的修改
+        """
+        if not self._store:
+            raise ValueError("BM25Retriever 未配置 index_dir，无法持久化")
+        with self._lock, self._store.locked():
+            if self._store.current_version() != self._loaded_version:
+                if self.dirty:
+                    raise RuntimeError("BM25 索引已被其他进程更新，本进程有未保存的修改")
+                self.load()
+            try:
+                yield self
+            except BaseException:
+                self._discard()
+                raise
+            if self.dirty:
+                self.save()
+
+    def _discard(self):
+        if self._store.current_path(legacy_marker="meta.json"):
+            self.load()
+        else:
+            self._reset()
+
+    def save(self):
+        """合并基础段与增量段，压缩文档编号后写入新版本目录并切换"""
+        if not self._store:
+            raise ValueError("BM25Retriever 未配置 index_dir，无法持久化")
+        with self._lock, self._store.locked():
+            if self._store.current_version() != self._loaded_version:
+                # 直接保存会覆盖其他进程的修改
+                raise RuntimeError("BM25 索引已被其他进程更新，请在 writing() 中修改")
+            alive = np.asarray(self.alive, dtype=bool)
+            # 旧 doc_id -> 新 doc_id，已删除文档映射为 -1
+            remap = np.full(len(alive), -1, dtype=np.int64)
+            remap[alive] = np.arange(int(alive.sum()))
+
+            vocab_terms = list(self.vocab)
+            base_terms = np.repeat(np.arange(len(vocab_terms), dtype=np.int64), np.diff(self.offsets))
+            term_parts, doc_parts, tf_parts = [base_terms], [np.asarray(self.postings_doc, dtype=np.int64)], [
+                np.asarray(self.postings_tf, dtype=np.int32)]
+            term_ids = dict(self.vocab)
+            for term, (docs, tfs) in self.delta.items():
+                term_id = term_ids.setdefault(term, len(vocab_terms))
+                if term_id == len(vocab_terms):
+                    vocab_terms.append(term)
+                term_parts.append(np.full(len(docs), term_id, dtype=np.int64))
+                doc_parts.append(np.asarray(docs, dtype=np.int64))
+                tf_parts.append(np.asarray(tfs, dtype=np.int32))
+
+            all_terms = np.concatenate(term_parts)
+            all_docs = remap[np.concatenate(doc_parts)]
+            all_tfs = np.concatenate(tf_parts)
+            keep = all_docs >= 0
+            all_terms, all_docs, all_tfs = all_terms[keep], all_docs[keep], all_tfs[keep]
+
+            # 去掉没有 postings 的词项并重新编号
+            used_terms, all_terms = np.unique(all_terms, return_inverse=True)
+            order = np.lexsort((all_docs, all_terms))
+            counts = np.bincount(all_terms, minlength=len(used_terms))
+            offsets = np.zeros(len(used_terms) + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+
+            doc_keys = [key for key, is_alive in zip(self.doc_keys, self.alive) if is_alive]
+            arrays = {
+                "offsets": offsets,
+                "postings_doc": all_docs[order].astype(np.int32),
+                "postings_tf": all_tfs[order].astype(np.int32),
+                "doc_len": np.asarray(self.doc_len, dtype=np.int32)[alive],
+                "belong_to": np.asarray(self.belong_to, dtype=np.int32)[alive],
+                "alive": np.ones(len(doc_keys), dtype=bool),
+            }
+            meta = {
+                "vocab": [vocab_terms[i] for i in used_terms],
+                "doc_keys": doc_keys,
+                "k1": self.k1,
+                "b": self.b,
+            }
+
+            def write(path):
+                for name, array in arrays.items():
+                    np.save(os.path.join(path, f"{name}.npy"), array)
+                with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+                    json.dump(meta, f, ensure_ascii=False)
+
+            self._store.publish(write)
+            self.load()
+
+    def load(self):
+        with self._lock:
+            # 先读版本再读文件：读取期间切换了新版本时，下次检索会再次加载
+            version = self._store.current_version()
+            path = self._store.current_path(legacy_marker="meta.json")
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                      for name in self.ARRAY_FILES}
+
+            self._reset()
+            self.k1, self.b = meta["k1"], meta["b"]
+            self.vocab = {term: i for i, term in enumerate(meta["vocab"])}
+            self.offsets = arrays["offsets"]
+            self.postings_doc = arrays["postings_doc"]
+            self.postings_tf = arrays["postings_tf"]
+            self.doc_keys = [(file_name, chunk_index) for file_name, chunk_index in meta["doc_keys"]]
+            self.doc_len = arrays["doc_len"].tolist()
+            self.belong_to = arrays["belong_to"].tolist()
+            self.alive = arrays["alive"].tolist()
+            for doc_id, key in enumerate(self.doc_keys):
+                self.key_to_doc[key] = doc_id
+                self.file_docs.setdefault(key[0], set()).add(doc_id)
+            self.alive_count = len(self.doc_keys)
+            self.total_len = int(sum(self.doc_len))
+            self._loaded_version = version
+
+    def reload_if_changed(self):
+        """其他 worker 保存了新版本且本地没有未保存的修改时重新加载"""
+        if not self._store or self.dirty:
+            return
+        version = self._store.current_version()
+        if version is not None and version != self._loaded_version:
+            self.load()
@@ -0,0 +1,90 @@
+from app.utils.token_counter import count_tokens
+
+
+def _doc_score(doc: dict) -> float:
+    for key in ("rerank_score", "hybrid_score", "score"):
+        if doc.get(key) is not None:
+            return doc[key]
+    return 0.0
+
+
+def strip_overlap(previous: str, following: str, max_overlap: int = 200, min_overlap: int = 8) -> str:
+    """去掉 following 开头与 previous 结尾重复的部分（分块时 chunk_overlap 带来的重复）"""
+    limit = min(len(previous), len(following), max_overlap)
+    for size in range(limit, min_overlap - 1, -1):
+        if previous.endswith(following[:size]):
+            return following[size:]
+    return following
+
+
+class ContextPacker:
+    """
+    将检索结果打包为 prompt 上下文：
+    1. 同一文件中 chunk_index 相邻的分块合并，并去掉分块重叠部分
+    2. 按相关性分数从高到低填充 token 预算
+    """
+
+    def __init__(self, token_budget: int = 3000, max_overlap: int = 200):
+        self.token_budget = token_budget
+        self.max_overlap = max_overlap
+
+    def _merge_adjacent(self, docs: list) -> list:
+        segments = []
+        by_file = {}
+        seen = set()
+        for doc in docs:
+            content = doc.get("content") or ""
+            positioned = doc.get("file_name") is not None and doc.get("chunk_index") is not None
+            key = (doc["file_name"], doc["chunk_index"]) if positioned else content
+            if key in seen or not content:
+                continue
+            seen.add(key)
+            if positioned:
+                by_file.setdefault(doc["file_name"], []).append(doc)
+            else:
+                segments.append({"content": content, "score": _doc_score(doc), "chunks": [doc]})
+
+        for file_docs in by_file.values():
+            file_docs.sort(key=lambda d: d["chunk_index"])
+            current = None
+            for doc in file_docs:
+                if current is not None and doc["chunk_index"] == current["chunks"][-1]["chunk_index"] + 1:
+                    previous = current["chunks"][-1]["content"]
+                    current["parts"].append(strip_overlap(previous, doc["content"], self.max_overlap))
+                    current["chunks"].append(doc)
+                    current["score"] = max(current["score"], _doc_score(doc))
+                    continue
+                current = {"parts": [doc["content"]], "score": _doc_score(doc), "chunks": [doc]}
+                segments.append(current)
+
+        for segment in segments:
+            if "parts" in segment:
+                segment["content"] = "".join(segment.pop("parts"))
+        return segments
+
+    def pack(self, docs: list):
+        """
+        :return: (上下文文本, 统计信息)
+        """
+        tokens_before = sum(count_tokens(doc.get("content")) for doc in docs)
+        segments = sorted(self._merge_adjacent(docs), key=lambda s: s["score"], reverse=True)
+
+        selected = []
+        used_tokens = 0
+        for segment in segments:
+            tokens = count_tokens(segment["content"])
+            if self.token_budget and used_tokens + tokens > self.token_budget:
+                continue  # 放不下的片段跳过，继续尝试分数更低但更短的片段
+            selected.append(segment["content"])
+            used_tokens += tokens
+
+        stats = {
+            "chunks": len(docs),
+            "segments": len(segments),
+            "selected_segments": len(selected),
+            "tokens_before": tokens_before,
+            "tokens_after": used_tokens,
+            "tokens_saved": tokens_before - used_tokens,
+        }
+        return "\n".join(selected), stats
+
@@ -0,0 +1,161 @@
+import numpy as np
+
+
+def distance_to_similarity(scores: np.ndarray, metric: str = "L2", normalized: bool = True) -> np.ndarray:
+    """
+    将 Milvus 返回的分数统一为"越大越相似"
+    :param metric: L2 返回的是平方欧氏距离；IP / COSINE 本身就是相似度
+    :param normalized: 向量是否已归一化（bge 默认归一化），此时 cos = 1 - d / 2
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    if metric.upper() != "L2":
+        return scores
+    if normalized:
+        return 1.0 - scores / 2.0
+    return 1.0 / (1.0 + scores)
+
+
+def min_max(values: np.ndarray, valid: np.ndarray = None) -> np.ndarray:
+    """min-max 归一化到 [0, 1]，无效位置置 0；所有有效值相同时取 1"""
+    values = np.asarray(values, dtype=np.float32)
+    valid = np.ones(len(values), dtype=bool) if valid is None else valid
+    out = np.zeros(len(values), dtype=np.float32)
+    if not valid.any():
+        return out
+    low, high = values[valid].min(), values[valid].max()
+    out[valid] = (values[valid] - low) / (high - low) if high > low else 1.0
+    return out
+
+
+def keyword_overlap(doc_keywords: list, query_keywords: list):
+    """
+    批量计算关键词重合度
+    :param doc_keywords: 每个候选文档逗号分隔的关键词字符串
+    :return: (重合比例数组, 命中矩阵 [文档数, 查询关键词数])
+    """
+    matched = np.zeros((len(doc_keywords), len(query_keywords)), dtype=bool)
+    if len(doc_keywords) == 0 or not query_keywords:
+        return np.zeros(len(doc_keywords), dtype=np.float32), matched
+    # 两端补逗号后做整词子串匹配，每个查询关键词一次向量化查找
+    padded = np.array([f",{keywords or ''}," for keywords in doc_keywords])
+    for j, keyword in enumerate(query_keywords):
+        matched[:, j] = np.char.find(padded, f",{keyword},") >= 0
+    return matched.sum(axis=1).astype(np.float32) / len(query_keywords), matched
+
+
+class CandidatePool:
+    """稠密与稀疏检索的候选集合，以 (file_name, chunk_index) 去重"""
+
+    def __init__(self):
+        self.keys = []
+        self.fields = []
+        self._index = {}
+        self._dense = {}
+        self._sparse = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _slot(self, key, fields):
+        slot = self._index.get(key)
+        if slot is None:
+            slot = len(self.keys)
+            self._index[key] = slot
+            self.keys.append(key)
+            self.fields.append(fields)
+        elif fields and not self.fields[slot]:
+            self.fields[slot] = fields
+        return slot
+
+    def add_dense(self, key, score: float, rank: int, fields: dict):
+        self._dense[self._slot(key, fields)] = (score, rank)
+
+    def add_sparse(self, key, score: float, rank: int, fields: dict = None):
+        self._sparse[self._slot(key, fields)] = (score, rank)
+
+    def set_fields(self, key, fields: dict):
+        """补充只由稀疏检索命中的候选的实体字段"""
+        slot = self._index.get(key)
+        if slot is not None:
+            self.fields[slot] = fields
+
+    def arrays(self):
+        """:return: (稠密分数, 稠密排名, 稀疏分数, 稀疏排名)，缺失处分数为 nan、排名为 -1"""
+        n = len(self.keys)
+        dense_score = np.full(n, np.nan, dtype=np.float32)
+        dense_rank = np.full(n, -1, dtype=np.int64)
+        sparse_score = np.full(n, np.nan, dtype=np.float32)
+        sparse_rank = np.full(n, -1, dtype=np.int64)
+        for slot, (score, rank) in self._dense.items():
+            dense_score[slot], dense_rank[slot] = score, rank
+        for slot, (score, rank) in self._sparse.items():
+            sparse_score[slot], sparse_rank[slot] = score, rank
+        return dense_score, dense_rank, sparse_score, sparse_rank
+
+
+def rrf_fusion(engine, vector_sim, dense_rank, sparse_score, sparse_rank, overlap):
+    """倒数排名融合，只依赖名次，不受分数尺度影响"""
+    scores = np.zeros(len(dense_rank), dtype=np.float32)
+    has_dense, has_sparse = dense_rank >= 0, sparse_rank >= 0
+    scores[has_dense] += engine.vector_weight / (engine.rrf_k + dense_rank[has_dense] + 1)
+    scores[has_sparse] += engine.keyword_weight / (engine.rrf_k + sparse_rank[has_sparse] + 1)
+    return scores
+
+
+def weighted_fusion(engine, vector_sim, dense_rank, sparse_score, sparse_rank, overlap):
+    """min-max 归一化后加权求和；没有 BM25 命中时用关键词重合度作为稀疏信号"""
+    vector_part = min_max(vector_sim, dense_rank >= 0)
+    has_sparse = sparse_rank >= 0
+    keyword_part = min_max(sparse_score, has_sparse) if has_sparse.any() else overlap
+    return engine.vector_weight * vector_part + engine.keyword_weight * keyword_part
+
+
+FUSION_STRATEGIES = {
+    "rrf": rrf_fusion,
+    "weighted": weighted_fusion,
+}
+
+
+class FusionEngine:
+    def __init__(self, strategy: str = "weighted", vector_weight: float = 0.7, keyword_weight: float = 0.3,
+                 metric: str = "L2", normalized: bool = True, rrf_k: int = 60):
+        if strategy not in FUSION_STRATEGIES:
+            raise ValueError(f"Invalid fusion strategy: {strategy}")
+        self.strategy = strategy
+        self.vector_weight = vector_weight
+        self.keyword_weight = keyword_weight
+        self.metric = metric
+        self.normalized = normalized
+        self.rrf_k = rrf_k
+
+    def fuse(self, pool: CandidatePool, query_keywords: list, top_k: int, metric: str = None):
+        """
+        :param metric: 稠密分数的度量，默认 self.metric；按集合索引配置检索时由调用方传入
+        :return: 按融合分数降序的前 top_k 个候选，slot 为候选在 pool 中的下标
+        """
+        if len(pool) == 0:
+            return []
+        dense_score, dense_rank, sparse_score, sparse_rank = pool.arrays()
+        vector_sim = distance_to_similarity(dense_score, metric or self.metric, self.normalized)
+        overlap, matched = keyword_overlap([fields.get("keywords") if fields else "" for fields in pool.fields],
+                                           query_keywords)
+
+        scores = FUSION_STRATEGIES[self.strategy](self, vector_sim, dense_rank, sparse_score, sparse_rank, overlap)
+
+        if len(scores) > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [
+            {
+                "slot": int(slot),
+                "hybrid_score": float(scores[slot]),
+                "vector_score": None if dense_rank[slot] < 0 else float(vector_sim[slot]),
+                "bm25_score": None if sparse_rank[slot] < 0 else float(sparse_score[slot]),
+                "keyword_score": float(overlap[slot]),
+                "matched_keywords": [kw for kw, hit in zip(query_keywords, matched[slot]) if hit],
+            }
+            for slot in top
+        ]
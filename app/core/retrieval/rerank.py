@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+
+from app.utils.metrics import metrics_registry
+from app.utils.token_counter import count_tokens
+
+RERANK_SECONDS = metrics_registry.histogram(
+    "rerank_duration_seconds", "交叉编码器重排序耗时（秒）",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+RERANK_CANDIDATES = metrics_registry.counter("rerank_candidates_total", "交叉编码器打分的候选文档数")
+RERANK_DROPPED = metrics_registry.counter("rerank_dropped_total", "重排序后被丢弃的文档数（低于阈值、超出预算或 top_k）")
+
+
+class CrossEncoderReranker:
+    """
+    交叉编码器重排序：对融合后的前 N 个候选一次性批量打分，
+    按分数从高到低保留，低于阈值或超出 token 预算时提前截断
+    """
+
+    def __init__(self, model, max_candidates: int = 20, score_threshold: float = 0.05,
+                 token_budget: int = 0, min_keep: int = 1):
+        """
+        :param model: 具有 predict(pairs, **kwargs) 的交叉编码器（见 app.services.embedding.get_cross_encoder）
+        :param max_candidates: 参与打分的候选数量上限
+        :param score_threshold: 相关性分数阈值（sigmoid 后 0~1）
+        :param token_budget: 保留文档的 token 总预算，0 表示不限制
+        :param min_keep: 至少保留的文档数，避免上下文被全部丢弃
+        """
+        self.model = model
+        self.max_candidates = max_candidates
+        self.score_threshold = score_threshold
+        self.token_budget = token_budget
+        self.min_keep = min_keep
+
+    def rerank(self, query: str, docs: list, top_k: int = None):
+        """
+        统计信息同时计入 rerank_duration_seconds / rerank_candidates_total / rerank_dropped_total 指标
+        :return: (保留的文档列表, 统计信息 {"latency_ms", "candidates", "dropped"})
+        """
+        start = time.perf_counter()
+        candidates = docs[:self.max_candidates]
+        if not candidates:
+            return [], {"latency_ms": 0.0, "candidates": 0, "dropped": 0}
+
+        pairs = [(query, doc.get("content") or "") for doc in candidates]
+        # 所有候选放进同一个 padded batch，CPU 上只做一次前向
+        scores = np.asarray(self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False),
+                            dtype=np.float32).reshape(-1)
+
+        kept = []
+        used_tokens = 0
+        for i in np.argsort(-scores, kind="stable"):
+            if top_k is not None and len(kept) >= top_k:
+                break
+            doc = candidates[i]
+            tokens = count_tokens(doc.get("content"))
+            if len(kept) >= self.min_keep:
+                # 分数已排序，第一个不满足条件的候选之后都可以直接丢弃
+                if scores[i] < self.score_threshold:
+                    break
+                if self.token_budget and used_tokens + tokens > self.token_budget:
+                    break
+            kept.append(dict(doc, rerank_score=float(scores[i])))
+            used_tokens += tokens
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "latency_ms": round(elapsed * 1000, 2),
+            "candidates": len(candidates),
+            "dropped": len(docs) - len(kept),
+        }
+        RERANK_SECONDS.observe(elapsed)
+        RERANK_CANDIDATES.inc(stats["candidates"])
+        RERANK_DROPPED.inc(stats["dropped"])
+        return kept, stats
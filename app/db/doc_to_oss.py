@@ -27,12 +27,12 @@ class DocToOSS:
         bucket.put_object_from_file(os.path.basename(file_path), file_path)
         print(f"文件 {file_path} 上传成功")
 
-    def upload_file_to_oss(self, file_stream, filename):
+    def upload_file_to_oss(self, file_stream, filename, overwrite=False):
         auth = oss2.Auth(self.ACCESS_KEY_ID, self.ACCESS_KEY_SECRET)
         bucket = oss2.Bucket(auth, self.ENDPOINT_URL, self.bucket_name)
 
         try:
-            if bucket.object_exists(filename):
+            if not overwrite and bucket.object_exists(filename):
                 return "文件名已存在"
 
             result = bucket.put_object(filename, file_stream)
@@ -0,0 +1,392 @@
+"""
+进程内的 FAISS 向量库：实现 VectorStore 的检索接口与 VectorDB 的写入接口，
+适合单机的小规模部署与不经网络的基准测试（对比 Milvus 的 RPC 开销）
+
+每个集合一个目录：
+- owner_<belong_to>.faiss：每个归属一份精确（Flat）索引，过滤检索只搜索可见的归属，
+  开销与可见数据量成正比；Flat 索引支持按主键删除
+- 列式旁路文件：id / belong_to / chunk_index 为 .npy，content / file_name / keywords 为 .json，
+  与向量按主键关联
+- meta.json：维度、度量、下一个主键
+以上文件每次保存写入一个新的版本目录，再以一次 rename 切换（见 VersionedDir）；
+写入在跨进程锁内进行：加载其他进程发布的最新版本 → 修改 → 发布，主键从最新的 next_id 继续分配
+
+检索只读取已发布版本的只读快照（_Snapshot），取得快照后在锁外检索；
+写入在快照的副本上进行（索引首次修改时才复制），发布前对检索不可见，不会阻塞检索
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
+
+from app.db.vector_store import SearchHit, VectorStore, parse_belong_to
+from app.utils.versioned_dir import VersionedDir
+
+NUMERIC_COLUMNS = {"id": np.int64, "belong_to": np.int64, "chunk_index": np.int64}
+TEXT_COLUMNS = ("content", "file_name", "keywords")
+DEFAULT_OUTPUT_FIELDS = ["content", "keywords", "file_name", "chunk_index", "belong_to"]
+
+
+class _Snapshot:
+    """一个已发布版本的数据，创建后不再修改，可在锁外并发检索"""
+
+    def __init__(self, dim: int, metric_type: str, next_id: int = 1, indexes: dict = None, rows: dict = None,
+                 version: str = None):
+        self.dim = dim
+        self.metric_type = metric_type
+        self.next_id = next_id
+        self.version = version
+        self.indexes = indexes or {}  # belong_to -> IndexIDMap2
+        self.rows = rows or {column: [] for column in list(NUMERIC_COLUMNS) + list(TEXT_COLUMNS)}
+        self.row_of = {pk: row for row, pk in enumerate(self.rows["id"])}  # 主键 -> 行号
+        self.file_rows = {}  # file_name -> {行号}
+        for row, file_name in enumerate(self.rows["file_name"]):
+            self.file_rows.setdefault(file_name, set()).add(row)
+
+    @classmethod
+    def load(cls, path: str, version: str):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        indexes = {owner: faiss.read_index(os.path.join(path, f"owner_{owner}.faiss")) for owner in meta["owners"]}
+        rows = {column: np.load(os.path.join(path, f"{column}.npy")).tolist() for column in NUMERIC_COLUMNS}
+        for column in TEXT_COLUMNS:
+            with open(os.path.join(path, f"{column}.json"), encoding="utf-8") as f:
+                rows[column] = json.load(f)
+        return cls(meta["dim"], meta["metric_type"], meta["next_id"], indexes, rows, version)
+
+    def prepare(self, vectors) -> np.ndarray:
+        vectors = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        if self.metric_type == "COSINE":
+            vectors = vectors.copy()
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def search(self, query_vectors, top_k: int, owners=None) -> list:
+        """:return: 每条查询的 [(主键, 分数)]，L2 按距离升序，IP / COSINE 按相似度降序"""
+        queries = self.prepare(query_vectors)
+        indexes = [index for owner, index in self.indexes.items()
+                   if index.ntotal and (owners is None or owner in owners)]
+        if not indexes:
+            return [[] for _ in range(len(queries))]
+        scores, ids = zip(*(index.search(queries, min(top_k, index.ntotal)) for index in indexes))
+        scores, ids = np.concatenate(scores, axis=1), np.concatenate(ids, axis=1)
+        # 各归属的结果合并后重新排序
+        order = np.argsort(scores if self.metric_type == "L2" else -scores, axis=1, kind="stable")[:, :top_k]
+        results = []
+        for query_scores, query_ids, query_order in zip(scores, ids, order):
+            results.append([(int(query_ids[i]), float(query_scores[i])) for i in query_order if query_ids[i] >= 0])
+        return results
+
+    def entity(self, pk: int, output_fields) -> dict:
+        row = self.row_of[pk]
+        return {field: self.rows[field][row] for field in output_fields}
+
+
+class _FaissCollection:
+    def __init__(self, path: str, dim: int, metric_type: str):
+        self.path = path
+        self._store = VersionedDir(path)
+        self._snapshot_lock = threading.Lock()
+        self._depth = 0
+        self.snapshot = _Snapshot(dim, metric_type)
+        self._end()
+        if self._store.current_path(legacy_marker="meta.json"):
+            self.snapshot = self._load_snapshot()
+
+    @property
+    def dim(self) -> int:
+        return self.snapshot.dim
+
+    @property
+    def metric_type(self) -> str:
+        return self.snapshot.metric_type
+
+    def current(self) -> _Snapshot:
+        """已发布的最新版本，其他进程发布了新版本时重新加载"""
+        version = self._store.current_version()
+        if version is not None and version != self.snapshot.version:
+            with self._snapshot_lock:
+                if version != self.snapshot.version:
+                    self.snapshot = self._load_snapshot()
+        return self.snapshot
+
+    def _load_snapshot(self) -> _Snapshot:
+        # 先读版本再读文件：读取期间切换了新版本时，下次检索会再次加载
+        version = self._store.current_version()
+        return _Snapshot.load(self._store.current_path(legacy_marker="meta.json"), version)
+
+    # ------------------------------------------------------------------ 写入
+    def _begin(self):
+        """以最新快照的副本作为本次写入的工作数据；索引在首次修改时才复制（见 _writable_index）"""
+        snapshot = self.current()
+        self.next_id = snapshot.next_id
+        self.indexes = dict(snapshot.indexes)
+        self._copied = set()
+        self.rows = {column: list(values) for column, values in snapshot.rows.items()}
+        self.row_of = dict(snapshot.row_of)
+        self.file_rows = {file_name: set(rows) for file_name, rows in snapshot.file_rows.items()}
+        self.alive = [True] * len(self.rows["id"])
+        self.dirty = False
+
+    def _end(self):
+        """释放工作数据（包括复制出的索引），只保留快照"""
+        self.indexes = self.rows = self.row_of = self.file_rows = self.alive = None
+        self._copied = set()
+        self.dirty = False
+
+    def _writable_index(self, owner: int):
+        index = self.indexes.get(owner)
+        if owner not in self._copied:
+            if index is None:
+                flat = faiss.IndexFlatL2(self.dim) if self.metric_type == "L2" else faiss.IndexFlatIP(self.dim)
+                index = faiss.IndexIDMap2(flat)
+            else:
+                # 快照中的索引可能正被其他线程检索，复制后再修改
+                index = faiss.clone_index(index)
+            self.indexes[owner] = index
+            self._copied.add(owner)
+        return index
+
+    def add(self, documents: list) -> list:
+        ids = list(range(self.next_id, self.next_id + len(documents)))
+        self.next_id += len(documents)
+        by_owner = {}
+        for pk, doc in zip(ids, documents):
+            row = len(self.alive)
+            self.row_of[pk] = row
+            self.file_rows.setdefault(doc["file_name"], set()).add(row)
+            self.alive.append(True)
+            self.rows["id"].append(pk)
+            for column in ("belong_to", "chunk_index", "content", "file_name", "keywords"):
+                self.rows[column].append(doc[column])
+            owner_ids, owner_vectors = by_owner.setdefault(int(doc["belong_to"]), ([], []))
+            owner_ids.append(pk)
+            owner_vectors.append(doc["chunk_embedding"])
+        for owner, (owner_ids, owner_vectors) in by_owner.items():
+            self._writable_index(owner).add_with_ids(self.snapshot.prepare(owner_vectors),
+                                                     np.asarray(owner_ids, dtype=np.int64))
+        self.dirty = True
+        return ids
+
+    def delete_rows(self, rows):
+        by_owner = {}
+        for row in rows:
+            if not self.alive[row]:
+                continue
+            self.alive[row] = False
+            pk = self.rows["id"][row]
+            del self.row_of[pk]
+            file_rows = self.file_rows[self.rows["file_name"][row]]
+            file_rows.discard(row)
+            if not file_rows:
+                del self.file_rows[self.rows["file_name"][row]]
+            by_owner.setdefault(int(self.rows["belong_to"][row]), []).append(pk)
+        for owner, owner_ids in by_owner.items():
+            self._writable_index(owner).remove_ids(faiss.IDSelectorBatch(np.asarray(owner_ids, dtype=np.int64)))
+            self.dirty = True
+
+    # ------------------------------------------------------------------ 持久化
+    @contextmanager
+    def writing(self):
+        """
+        跨进程独占修改：加锁 → 复制其他进程发布的最新版本 → 在 with 块内修改副本 → 发布新版本
+        可嵌套，只在最外层加载与发布；with 块抛出异常时丢弃本次未发布的修改
+        """
+        with self._store.locked():
+            outermost = self._depth == 0
+            if outermost:
+                self._begin()
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                if outermost:
+                    self._end()
+                raise
+            finally:
+                self._depth -= 1
+            if outermost:
+                try:
+                    if self.dirty:
+                        self.save()
+                finally:
+                    self._end()
+
+    def save(self):
+        """剔除已删除的行，写入新版本目录并切换，随后检索使用新版本的快照"""
+        if self.rows is None:
+            raise RuntimeError("FAISS 集合只能在 writing() 中修改")
+        keep = [row for row, is_alive in enumerate(self.alive) if is_alive]
+        owners = [owner for owner, index in self.indexes.items() if index.ntotal]
+        meta = {"dim": self.dim, "metric_type": self.metric_type, "next_id": self.next_id, "owners": owners}
+
+        def write(path):
+            for column, dtype in NUMERIC_COLUMNS.items():
+                values = np.asarray(self.rows[column], dtype=dtype)[keep] if keep else np.zeros(0, dtype=dtype)
+                np.save(os.path.join(path, f"{column}.npy"), values)
+            for column in TEXT_COLUMNS:
+                with open(os.path.join(path, f"{column}.json"), "w", encoding="utf-8") as f:
+                    json.dump([self.rows[column][row] for row in keep], f, ensure_ascii=False)
+            for owner in owners:
+                faiss.write_index(self.indexes[owner], os.path.join(path, f"owner_{owner}.faiss"))
+            with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+        self._store.publish(write)
+        with self._snapshot_lock:
+            self.snapshot = self._load_snapshot()
+        self.dirty = False
+
+
+class FaissVectorStore(VectorStore):
+    """
+    读写接口与 MilvusClient / VectorDB 一致，可直接替换二者：
+    检索的 expr 只支持按 belong_to 过滤（见 parse_belong_to），索引为精确检索
+    每次写入都在跨进程锁内加载最新版本、修改并发布，flush 参数只为与 VectorDB 接口一致；
+    需要把多次写入合并为一次发布时（如批量导出）在 writing() 内调用
+    """
+
+    def __init__(self, root: str, dim: int = 512, collection_name: str = "java_doc_plus", metric_type: str = None):
+        """:param metric_type: 新建集合的度量，None 表示按集合的索引配置（见 app.db.index_profiles）"""
+        self.root = root
+        self.dim = dim
+        self.default_collection = collection_name
+        self.default_metric = metric_type
+        self._collections = {}
+        self._lock = threading.RLock()
+
+    def collection(self, collection_name: str = None) -> _FaissCollection:
+        collection_name = collection_name or self.default_collection
+        with self._lock:
+            handle = self._collections.get(collection_name)
+            if handle is None:
+                metric_type = self.default_metric
+                if metric_type is None:
+                    # 延迟导入，与 Milvus 集合使用相同的度量，融合打分一致
+                    from app.db.index_profiles import collection_index_profile
+                    metric_type = collection_index_profile(collection_name)["metric_type"]
+                handle = _FaissCollection(os.path.join(self.root, collection_name), self.dim, metric_type)
+                self._collections[collection_name] = handle
+            return handle
+
+    # ------------------------------------------------------------------ 检索
+    def _search(self, query_vectors, top_k, expr, collection_name, output_fields) -> list:
+        owners = parse_belong_to(expr)
+        # 快照不会被修改，检索不持有锁，也不等待正在进行的写入
+        snapshot = self.collection(collection_name).current()
+        results = snapshot.search(query_vectors, top_k, owners)
+        return [[SearchHit(pk, score, snapshot.entity(pk, output_fields)) for pk, score in hits]
+                for hits in results]
+
+    def search(self, query_vector, top_k=5, collection_name: str = None):
+        return self._search([query_vector], top_k, None, collection_name, ["content", "file_name", "chunk_index"])
+
+    def hybrid_search(self, query_vector, expr, top_k=5, collection_name: str = None):
+        return self._search([query_vector], top_k, expr, collection_name, DEFAULT_OUTPUT_FIELDS)
+
+    def batch_search(self, query_vectors: list, top_k=5, expr=None, collection_name: str = None,
+                     output_fields=None) -> list:
+        count = len(query_vectors)
+        top_ks = list(top_k) if isinstance(top_k, (list, tuple)) else [top_k] * count
+        exprs = list(expr) if isinstance(expr, (list, tuple)) else [expr] * count
+        output_fields = output_fields or DEFAULT_OUTPUT_FIELDS
+
+        # 与 MilvusClient 相同，表达式相同的查询合并为一次检索
+        groups = {}
+        for i, group_expr in enumerate(exprs):
+            groups.setdefault(group_expr, []).append(i)
+        results = [None] * count
+        for group_expr, group in groups.items():
+            hits = self._search([query_vectors[i] for i in group], max(top_ks[i] for i in group), group_expr,
+                                collection_name, output_fields)
+            for i, query_hits in zip(group, hits):
+                results[i] = query_hits[:top_ks[i]]
+        return results
+
+    def fetch_chunks(self, keys, collection_name: str = None) -> list:
+        wanted = {(file_name, int(chunk_index)) for file_name, chunk_index in keys}
+        fields = ["id"] + DEFAULT_OUTPUT_FIELDS
+        snapshot = self.collection(collection_name).current()
+        return [{field: snapshot.rows[field][row] for field in fields}
+                for file_name in {key[0] for key in wanted}
+                for row in sorted(snapshot.file_rows.get(file_name, ()))
+                if (file_name, snapshot.rows["chunk_index"][row]) in wanted]
+
+    def metric_type(self, collection_name: str = None) -> str:
+        return self.collection(collection_name).metric_type
+
+    # ------------------------------------------------------------------ 写入与删除
+    @contextmanager
+    def writing(self, collection_name: str = None):
+        """with 块内的写入共享同一把跨进程锁，结束时只发布一次；检索不受影响，继续读取已发布的版本"""
+        with self.collection(collection_name).writing():
+            yield self
+
+    def add_documents(self, documents: list, flush: bool = True, collection_name: str = None) -> list:
+        """:param documents: 与 VectorDB.add_documents 相同的入库记录 :return: 按写入顺序排列的主键"""
+        entities = [{
+            "content": doc["raw_text"],
+            "file_name": doc["file_name"],
+            "chunk_index": int(doc["chunk_index"]),
+            "keywords": ",".join([kw[0] for kw in doc["keywords"]]),
+            "chunk_embedding": doc["chunk_vector"],
+            "belong_to": int(doc["user_id"]),
+        } for doc in documents]
+        return self.insert(entities, flush, collection_name)
+
+    def insert(self, entities: list, flush: bool = True, collection_name: str = None) -> list:
+        """:param entities: 已是集合字段的 dict（content / file_name / chunk_index / keywords / chunk_embedding / belong_to）"""
+        if not entities:
+            return []
+        with self.writing(collection_name) as store:
+            return store.collection(collection_name).add(entities)
+
+    def move_chunks(self, moves: list, flush: bool = True, collection_name: str = None) -> list:
+        """:param moves: [(主键, 新 chunk_index)] :return: 与 moves 对齐的主键（原地修改，主键不变）"""
+        if not moves:
+            return []
+        with self.writing(collection_name) as store:
+            collection = store.collection(collection_name)
+            for pk, chunk_index in moves:
+                collection.rows["chunk_index"][collection.row_of[int(pk)]] = int(chunk_index)
+            collection.dirty = True
+            return [int(pk) for pk, _ in moves]
+
+    def delete_by_ids(self, ids: list, flush: bool = True, collection_name: str = None):
+        if not ids:
+            return
+        with self.writing(collection_name) as store:
+            collection = store.collection(collection_name)
+            collection.delete_rows([collection.row_of[int(pk)] for pk in ids if int(pk) in collection.row_of])
+
+    def delete_by_file_name(self, file_name: str, flush: bool = True, collection_name: str = None):
+        with self.writing(collection_name) as store:
+            collection = store.collection(collection_name)
+            collection.delete_rows(list(collection.file_rows.get(file_name, ())))
+        print(f"ℹ️ 已删除 {collection_name or self.default_collection} 中文件名为 {file_name} 的数据")
+
+    def flush(self, collection_name: str = None):
+        """写入已在 writing() 结束时发布，这里只加载其他进程发布的新版本"""
+        self.collection(collection_name).current()
+
+    def count(self, collection_name: str = None) -> int:
+        return len(self.collection(collection_name).current().row_of)
+
+
+_faiss_store = None
+_faiss_store_lock = threading.Lock()
+
+
+def get_faiss_store() -> FaissVectorStore:
+    """进程内共享一份 FAISS 向量库，检索与入库看到同一份内存中的索引"""
+    global _faiss_store
+    if _faiss_store is None:
+        with _faiss_store_lock:
+            if _faiss_store is None:
+                from app.config import Settings
+
+                _faiss_store = FaissVectorStore(Settings.FAISS_INDEX_DIR, dim=512)
+    return _faiss_store
@@ -0,0 +1,106 @@
+"""
+Milvus 向量索引配置：索引类型、构建参数、距离度量与检索参数按集合配置
+
+MILVUS_INDEX_PROFILES 为 JSON，集合名 -> 预置配置名或完整配置，例如
+    {"java_doc_plus": "hnsw", "java_interview_qa": {"index_type": "IVF_SQ8", "metric_type": "IP",
+     "params": {"nlist": 1024}, "search_params": {"nprobe": 32}}}
+未列出的集合使用 MILVUS_DEFAULT_INDEX_PROFILE。
+配置只决定新建集合的索引与检索参数；已建集合的度量以实际索引为准（见 MilvusClient），
+更换索引需重建集合，可先用 data/build/bench_index_profiles.py 比较各配置的召回与延迟。
+"""
+import copy
+import json
+
+# bge 输出已归一化的向量，IP 与 COSINE 等价；ivf_flat 保持与早期集合一致的 L2
+INDEX_PROFILES = {
+    "ivf_flat": {
+        "index_type": "IVF_FLAT",
+        "metric_type": "L2",
+        "params": {"nlist": 128},
+        "search_params": {"nprobe": 10},
+    },
+    "ivf_flat_ip": {
+        "index_type": "IVF_FLAT",
+        "metric_type": "IP",
+        "params": {"nlist": 1024},
+        "search_params": {"nprobe": 32},
+    },
+    "ivf_sq8": {
+        "index_type": "IVF_SQ8",
+        "metric_type": "IP",
+        "params": {"nlist": 1024},
+        "search_params": {"nprobe": 32},
+    },
+    "hnsw": {
+        "index_type": "HNSW",
+        "metric_type": "IP",
+        "params": {"M": 16, "efConstruction": 200},
+        "search_params": {"ef": 64},
+    },
+    "diskann": {
+        "index_type": "DISKANN",
+        "metric_type": "IP",
+        "params": {},
+        "search_params": {"search_list": 100},
+    },
+}
+
+# 已建集合的索引类型与配置不一致时使用的检索参数
+DEFAULT_SEARCH_PARAMS = {
+    "FLAT": {},
+    "IVF_FLAT": {"nprobe": 10},
+    "IVF_SQ8": {"nprobe": 32},
+    "IVF_PQ": {"nprobe": 32},
+    "HNSW": {"ef": 64},
+    "DISKANN": {"search_list": 100},
+    "AUTOINDEX": {},
+}
+
+
+def resolve_index_profile(profile) -> dict:
+    """:param profile: 预置配置名或完整配置 dict（缺省字段从同类型的预置配置补齐）"""
+    if isinstance(profile, str):
+        if profile not in INDEX_PROFILES:
+            raise ValueError(f"未知的索引配置 {profile}，可选：{', '.join(INDEX_PROFILES)}")
+        return copy.deepcopy(INDEX_PROFILES[profile])
+    profile = copy.deepcopy(profile)
+    index_type = profile["index_type"].upper()
+    profile["index_type"] = index_type
+    profile["metric_type"] = profile.get("metric_type", "IP").upper()
+    profile.setdefault("params", {})
+    profile.setdefault("search_params", dict(DEFAULT_SEARCH_PARAMS.get(index_type, {})))
+    return profile
+
+
+def collection_index_profile(collection_name: str) -> dict:
+    """按配置返回集合的索引配置"""
+    # 延迟导入，data/build 下的脚本可以不依赖应用配置使用预置配置
+    from app.config import Settings
+
+    overrides = json.loads(Settings.MILVUS_INDEX_PROFILES or "{}")
+    return resolve_index_profile(overrides.get(collection_name, Settings.MILVUS_DEFAULT_INDEX_PROFILE))
+
+
+def index_params(profile: dict) -> dict:
+    """create_index 使用的参数"""
+    return {"index_type": profile["index_type"], "metric_type": profile["metric_type"], "params": profile["params"]}
+
+
+def search_params(profile: dict) -> dict:
+    """collection.search 使用的参数"""
+    return {"metric_type": profile["metric_type"], "params": profile["search_params"]}
+
+
+def reconcile_with_index(profile: dict, built: dict) -> dict:
+    """
+    以集合上实际建好的索引为准：度量必须与索引一致，索引类型不同时检索参数改用该类型的默认值
+    :param built: Collection.indexes[i].params，含 index_type / metric_type / params
+    """
+    built_type = str(built.get("index_type", profile["index_type"])).upper()
+    built_metric = str(built.get("metric_type", profile["metric_type"])).upper()
+    if built_type == profile["index_type"] and built_metric == profile["metric_type"]:
+        return profile
+    reconciled = dict(profile, index_type=built_type, metric_type=built_metric)
+    if built_type != profile["index_type"]:
+        reconciled["search_params"] = dict(DEFAULT_SEARCH_PARAMS.get(built_type, {}))
+    return reconciled
@@ -1,16 +1,20 @@
 from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
 import configparser
 
+from app.db.index_profiles import index_params, resolve_index_profile
+
 
 class MilvusDBInitializer:
 
-    def __init__(self):
+    def __init__(self, index_profile="ivf_flat"):
         cfp = configparser.ConfigParser()
         cfp.read("../config/milvus_config.ini")
         self.milvus_uri = cfp.get("milvus", "uri")
         self.token = cfp.get("milvus", "token")
         self.collection_name = "java_interview_qa"  # 默认集合名称
         self.dim = 384  # 与嵌入模型维度匹配
+        # 预置配置名或完整配置，见 app/db/index_profiles.py
+        self.index_profile = resolve_index_profile(index_profile)
         self.connect()
 
     def connect(self):
@@ -44,14 +48,9 @@ class MilvusDBInitializer:
         collection = Collection(self.collection_name, schema)
 
         # 创建索引
-        index_params = {
-            "metric_type": "L2",  # 使用L2距离
-            "index_type": "IVF_FLAT",  # 使用倒排文件索引
-            "params": {"nlist": 128}  # 聚类中心数量
-        }
-        collection.create_index("question_vector", index_params)
+        collection.create_index("question_vector", index_params(self.index_profile))
 
-        print(f"Collection {self.collection_name} created with index")
+        print(f"Collection {self.collection_name} created with {self.index_profile['index_type']} index")
 
         return collection
 
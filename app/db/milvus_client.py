@@ -1,31 +1,55 @@
+import threading
+import time
+from collections import OrderedDict
+
 from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
 
 from app.config import Settings
+from app.db.index_profiles import collection_index_profile, reconcile_with_index, search_params as profile_search_params
+from app.db.milvus_expr import file_name_expr
+from app.db.vector_store import VectorStore
+from app.models.document import DocumentModel
+
 
+class MilvusClient(VectorStore):
+    """
+    按集合名管理已 load 的 Collection 句柄，所有检索 / 删除都显式传入集合名，
+    不再在共享对象上切换集合（并发请求切换会互相覆盖，检索可能落到错误的集合）
+    超过 max_loaded 个集合时按 LRU 释放最久未使用、且空闲超过 min_idle_seconds 的集合
+    检索参数与度量按集合的索引配置（见 app.db.index_profiles）在加载时确定
+    """
 
-class MilvusClient:
-    def __init__(self, port: str = '19530',app=None,collection_name = "java_interview_qa",dim=384):
+    def __init__(self, port: str = '19530',app=None,collection_name = "java_interview_qa",dim=384,
+                 max_loaded: int = 4, min_idle_seconds: float = 300):
         self.host = Settings.MILVUS_HOST # Milvus 服务器地址
         self.port = port  # Milvus 服务器端口
         self.db_name = 'Java_knowledge_base'
         self.token = Settings.MILVUS_TOKEN
         self.uri = Settings.MILVUS_URL
-        self.collection_name = collection_name  # 默认集合名称
+        self.default_collection = collection_name  # 请求未指定集合时使用
         self.dim = dim  # 与嵌入模型维度匹配
+        self.max_loaded = max_loaded
+        self.min_idle_seconds = min_idle_seconds
+        # 集合名 -> [Collection, 最近使用时间]，按使用顺序排列
+        self._collections = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        # 集合名 -> 索引配置，释放集合后仍保留，重新加载时刷新
+        self._profiles = {}
         self.app = app
         if app is not None:
             self.connect(app)
 
-    def connect(self,_app):
-        """连接到 Milvus 服务器"""
+    def connect(self,_app=None):
+        """连接到 Milvus 服务器并预加载默认集合，传入 _app 时注册到 app.extensions"""
         try:
             # NOT USING LAN CONNECT
             # connections.connect(alias="default",host=self.host, port=self.port, db_name=self.db_name)
             connections.connect(uri=self.uri, token=self.token)
-            self.collection = Collection(self.collection_name)
-            self.collection.load()
+            self.get_collection(self.default_collection)
             print(f"ℹ️ Milvus连接成功")
-            _app.extensions['milvus'] = self  # 存入扩展系统
+            if _app is not None:
+                _app.extensions['milvus'] = self  # 存入扩展系统
             # print(f"Connected to Milvus at {self.host}:{self.port}:{self.db_name}")
         except Exception as e:
             print(f"Failed to connect to Milvus: {e}")
@@ -36,47 +60,175 @@ class MilvusClient:
         connections.disconnect("default")
         print("ℹ️ Milvus连接已关闭")
 
-    def search(self, query_vector, top_k=5):
-        search_params = {"metric_type": "L2", "params": {"nprobe": 10}}
-        print(f"query_vector embedding done")
-        results = self.collection.search(
+    # ------------------------------------------------------------------ 集合句柄
+    def get_collection(self, collection_name: str = None) -> Collection:
+        """返回已 load 的集合句柄，首次使用时加载；集合不存在时抛出 ValueError"""
+        collection_name = collection_name or self.default_collection
+        with self._lock:
+            entry = self._collections.get(collection_name)
+            if entry is not None:
+                entry[1] = time.monotonic()
+                self._collections.move_to_end(collection_name)
+                return entry[0]
+            load_lock = self._load_locks.setdefault(collection_name, threading.Lock())
+
+        # 只对同一个集合的首次加载串行化，不阻塞其他集合的请求
+        with load_lock:
+            with self._lock:
+                entry = self._collections.get(collection_name)
+            if entry is not None:
+                return entry[0]
+            if not utility.has_collection(collection_name):
+                raise ValueError(f"集合 {collection_name} 不存在")
+            start = time.perf_counter()
+            collection = Collection(collection_name)
+            collection.load()
+            profile = self._resolve_profile(collection_name, collection)
+            if not DocumentModel.has_partition_key(collection.schema):
+                print(f"❗集合 {collection_name} 未按 belong_to 分区，私有文档检索会扫描整个集合，"
+                      f"可用 data/build/migrate_partition_key.py 迁移")
+            print(f"ℹ️ 集合 {collection_name} 加载完成，耗时 {time.perf_counter() - start:.2f}s")
+            with self._lock:
+                self._profiles[collection_name] = profile
+                self._collections[collection_name] = [collection, time.monotonic()]
+                evicted = self._pick_evictions()
+        for name, handle in evicted:
+            try:
+                handle.release()
+                print(f"ℹ️ 已释放长时间未使用的集合 {name}")
+            except Exception as e:
+                print(f"释放集合 {name} 失败: {e}")
+        return collection
+
+    def _pick_evictions(self) -> list:
+        """调用方持有 self._lock；最近使用过的集合可能仍有检索在进行，暂不释放"""
+        evicted = []
+        now = time.monotonic()
+        for name in list(self._collections):
+            if len(self._collections) <= self.max_loaded:
+                break
+            handle, last_used = self._collections[name]
+            if now - last_used < self.min_idle_seconds:
+                break
+            del self._collections[name]
+            evicted.append((name, handle))
+        return evicted
+
+    def loaded_collections(self) -> list:
+        with self._lock:
+            return list(self._collections)
+
+    @staticmethod
+    def _resolve_profile(collection_name: str, collection: Collection) -> dict:
+        """配置的索引与集合上实际建好的索引不一致时，以实际索引的类型与度量为准"""
+        profile = collection_index_profile(collection_name)
+        built = next((index.params for index in collection.indexes if index.field_name == "chunk_embedding"), None)
+        if not built:
+            return profile
+        reconciled = reconcile_with_index(profile, built)
+        if reconciled is not profile:
+            print(f"❗集合 {collection_name} 的索引为 {reconciled['index_type']}/{reconciled['metric_type']}，"
+                  f"与配置的 {profile['index_type']}/{profile['metric_type']} 不一致，按实际索引检索；"
+                  f"更换索引需重建集合")
+        return reconciled
+
+    def index_profile(self, collection_name: str = None) -> dict:
+        """集合的索引配置（index_type / metric_type / params / search_params）"""
+        collection_name = collection_name or self.default_collection
+        self.get_collection(collection_name)
+        return self._profiles[collection_name]
+
+    def metric_type(self, collection_name: str = None) -> str:
+        return self.index_profile(collection_name)["metric_type"]
+
+    def search_params(self, collection_name: str = None) -> dict:
+        return profile_search_params(self.index_profile(collection_name))
+
+    # ------------------------------------------------------------------ 检索与删除
+    def search(self, query_vector, top_k=5, collection_name: str = None):
+        results = self.get_collection(collection_name).search(
             data=[query_vector],
             anns_field="chunk_embedding",
-            param=search_params,
+            param=self.search_params(collection_name),
             limit=top_k,
-            output_fields=["content","file_name"],
+            output_fields=["content","file_name", "chunk_index"],
         )
         return results
 
-    def hybrid_search(self,query_vector, expr, top_k=5):
-        search_params = {"metric_type": "L2", "params": {"nprobe": 10}}
-        results = self.collection.search(
+    def hybrid_search(self,query_vector, expr, top_k=5, collection_name: str = None):
+        results = self.get_collection(collection_name).search(
             data=[query_vector],
             anns_field="chunk_embedding",
-            param=search_params,
+            param=self.search_params(collection_name),
             limit=top_k,
-            output_fields=["content","keywords","file_name", "belong_to"],
+            output_fields=["content","keywords","file_name", "chunk_index", "belong_to"],
             expr=expr
         )
         return results
 
-    def change_collection(self, collection_name):
-        """切换集合"""
-        if utility.has_collection(collection_name):
-            self.collection_name = collection_name
-            self.collection = Collection(self.collection_name)
-            self.collection.load()
-            print(f"ℹ️ 切换到集合 {self.collection_name} 成功")
-        else:
-            print(f"❗集合 {collection_name} 不存在")
+    def batch_search(self, query_vectors: list, top_k=5, expr=None, collection_name: str = None,
+                     output_fields=None, max_nq: int = 1024) -> list:
+        """
+        一次 RPC 检索多条查询向量
+        :param top_k: 整数，或与 query_vectors 等长的列表（每条查询各自的 top_k）
+        :param expr: None / 字符串，或与 query_vectors 等长的列表；表达式相同的查询合并为一次调用
+        :param max_nq: 单次调用的最大查询数，超出时拆分
+        :return: 与 query_vectors 对齐的命中列表
+        """
+        count = len(query_vectors)
+        top_ks = list(top_k) if isinstance(top_k, (list, tuple)) else [top_k] * count
+        exprs = list(expr) if isinstance(expr, (list, tuple)) else [expr] * count
+        collection = self.get_collection(collection_name)
+        params = self.search_params(collection_name)
+        output_fields = output_fields or ["content", "keywords", "file_name", "chunk_index", "belong_to"]
+
+        groups = {}
+        for i, group_expr in enumerate(exprs):
+            groups.setdefault(group_expr, []).append(i)
+        results = [None] * count
+        for group_expr, group in groups.items():
+            for start in range(0, len(group), max_nq):
+                self._search_group(collection, query_vectors, group[start:start + max_nq], top_ks, group_expr,
+                                   params, output_fields, results)
+        return results
+
+    @staticmethod
+    def _search_group(collection, query_vectors, indexes, top_ks, expr, search_params, output_fields, results):
+        hits = collection.search(
+            data=[query_vectors[i] for i in indexes],
+            anns_field="chunk_embedding",
+            param=search_params,
+            limit=max(top_ks[i] for i in indexes),
+            output_fields=output_fields,
+            expr=expr,
+        )
+        for i, query_hits in zip(indexes, hits):
+            results[i] = list(query_hits)[:top_ks[i]]
+
+    def fetch_chunks(self, keys, collection_name: str = None):
+        """按 (file_name, chunk_index) 批量取回分块内容"""
+        if not keys:
+            return []
+        by_file = {}
+        for file_name, chunk_index in keys:
+            by_file.setdefault(file_name, []).append(int(chunk_index))
+        expr = " or ".join(
+            f"({file_name_expr(file_name)} and chunk_index in {indexes})"
+            for file_name, indexes in by_file.items()
+        )
+        return self.get_collection(collection_name).query(
+            expr=expr,
+            output_fields=["id", "content", "keywords", "file_name", "chunk_index", "belong_to"],
+        )
 
-    def delete_by_file_name(self, file_name: str):
+    def delete_by_file_name(self, file_name: str, collection_name: str = None):
         """根据文件名删除数据"""
-        if not utility.has_collection(self.collection_name):
-            print(f"❗集合 {self.collection_name} 不存在")
+        collection_name = collection_name or self.default_collection
+        if not utility.has_collection(collection_name):
+            print(f"❗集合 {collection_name} 不存在")
             return
-        expr = f"file_name == '{file_name}'"
-        self.collection.delete(expr)
-        self.collection.flush()
-        print(f"ℹ️ 已删除文件名为 {file_name} 的数据")
-
+        collection = self.get_collection(collection_name)
+        expr = file_name_expr(file_name)
+        collection.delete(expr)
+        collection.flush()
+        print(f"ℹ️ 已删除 {collection_name} 中文件名为 {file_name} 的数据")
@@ -0,0 +1,12 @@
+"""
+Milvus 过滤表达式的字面量：文件名等来自用户的字符串必须转义后再拼入表达式
+"""
+
+
+def string_literal(value: str) -> str:
+    """返回单引号包裹的字符串字面量，转义反斜杠与单引号"""
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def file_name_expr(file_name: str) -> str:
+    return f"file_name == {string_literal(file_name)}"
@@ -9,7 +9,14 @@ class Neo4jClient:
         self.uri = Settings.NEO4J_URI
         self.user = Settings.NEO4J_USERNAME
         self.password =Settings.NEO4J_PASSWORD
-        self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+        self._driver = None
+
+    @property
+    def driver(self):
+        """首次使用时才创建驱动，导入本模块不连接数据库"""
+        if self._driver is None:
+            self._driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+        return self._driver
 
     def connect(self, _app=None):
         try:
@@ -21,7 +28,9 @@ class Neo4jClient:
 
 
     def close(self):
-        self.driver.close()
+        if self._driver is not None:
+            self._driver.close()
+            self._driver = None
 
 
 def main():
@@ -0,0 +1,82 @@
+"""
+向量检索后端的公共接口：RAGService 与知识库接口只依赖这里的方法，
+由 VECTOR_STORE_BACKEND 选择 Milvus（MilvusClient）或进程内的 FAISS（FaissVectorStore）
+"""
+import re
+from abc import ABC, abstractmethod
+
+_OWNER_EQ = re.compile(r"^\s*belong_to\s*==\s*(-?\d+)\s*$")
+_OWNER_IN = re.compile(r"^\s*belong_to\s+in\s+\[([-\d,\s]*)\]\s*$")
+
+
+def parse_belong_to(expr: str = None):
+    """
+    解析 RAGService 生成的归属过滤表达式，供不支持 Milvus 表达式的后端使用
+    支持 "belong_to == 1 or belong_to == 0" 与 "belong_to in [0, 1]"
+    :return: 允许的 belong_to 列表，None 表示不过滤
+    """
+    if expr is None or not expr.strip():
+        return None
+    matched = _OWNER_IN.match(expr)
+    if matched:
+        return [int(value) for value in matched.group(1).split(",") if value.strip()]
+    owners = []
+    for part in re.split(r"\s+or\s+", expr.strip()):
+        matched = _OWNER_EQ.match(part.strip("() "))
+        if not matched:
+            raise ValueError(f"不支持的过滤表达式: {expr}，只能按 belong_to 过滤")
+        owners.append(int(matched.group(1)))
+    return owners
+
+
+class SearchHit:
+    """与 pymilvus Hit 相同的读取方式：hit.id / hit.score / hit.fields / hit.get(field)"""
+
+    __slots__ = ("id", "score", "fields")
+
+    def __init__(self, id: int, score: float, fields: dict):
+        self.id = id
+        self.score = score
+        self.fields = fields
+
+    def get(self, field: str, default=None):
+        if field == "id":
+            return self.id
+        return self.fields.get(field, default)
+
+    def __repr__(self):
+        return f"SearchHit(id={self.id}, score={self.score:.4f})"
+
+
+class VectorStore(ABC):
+    """
+    分块向量的检索与删除；命中结果的分数语义由 metric_type 决定（L2 为距离，IP / COSINE 为相似度）
+    expr 为 Milvus 过滤表达式，非 Milvus 后端只支持 parse_belong_to 能解析的归属过滤
+    """
+
+    default_collection: str
+
+    @abstractmethod
+    def search(self, query_vector, top_k=5, collection_name: str = None):
+        """:return: 只含一条查询的命中列表 [[hit, ...]]，命中带 content / file_name / chunk_index"""
+
+    @abstractmethod
+    def hybrid_search(self, query_vector, expr, top_k=5, collection_name: str = None):
+        """:return: [[hit, ...]]，命中带 content / keywords / file_name / chunk_index / belong_to"""
+
+    @abstractmethod
+    def batch_search(self, query_vectors: list, top_k=5, expr=None, collection_name: str = None,
+                     output_fields=None) -> list:
+        """:return: 与 query_vectors 对齐的命中列表，top_k / expr 可为逐条查询的列表"""
+
+    @abstractmethod
+    def fetch_chunks(self, keys, collection_name: str = None) -> list:
+        """按 (file_name, chunk_index) 批量取回分块的 dict"""
+
+    @abstractmethod
+    def delete_by_file_name(self, file_name: str, collection_name: str = None):
+        """删除文件的全部分块"""
+
+    @abstractmethod
+    def metric_type(self, collection_name: str = None) -> str:
+        """集合向量的距离度量"""
@@ -1,14 +1,44 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_redis import FlaskRedis
 
-from app.db.doc_to_oss import DocToOSS
-from app.pipelines.pipeline import ProcessingPipeline
-from app.db.milvus_client import MilvusClient
+from app.services.ingestion import IngestionJobQueue
+from app.utils.startup import LazyExtension
 
 
+# 以下组件会加载模型或连接外部服务，首次使用时才构造（导入本模块不再有副作用）
+def _create_oss():
+    from app.db.doc_to_oss import DocToOSS
+    return DocToOSS()
+
+
+def _create_pipeline():
+    from app.pipelines.pipeline import ProcessingPipeline
+    return ProcessingPipeline()
+
+
+def _create_milvus():
+    from app.config import Settings
+    if Settings.VECTOR_STORE_BACKEND == 'faiss':
+        # 进程内向量库，与入库流水线共享同一实例；扩展名仍为 milvus，调用方不区分后端
+        from app.db.faiss_store import get_faiss_store
+        return get_faiss_store()
+    from app.db.milvus_client import MilvusClient
+    client = MilvusClient(collection_name="java_doc_plus", dim=512,
+                          max_loaded=Settings.MILVUS_MAX_LOADED_COLLECTIONS,
+                          min_idle_seconds=Settings.MILVUS_COLLECTION_IDLE_SECONDS)
+    client.connect()
+    return client
+
+
+def _create_neo4j():
+    from app.db.neo4j_client import neo4j_client
+    return neo4j_client
+
 
 db = SQLAlchemy()
 redis_client = FlaskRedis()
-oss_client = DocToOSS()
-upload_pipeline = ProcessingPipeline()
-milvus_client = MilvusClient(collection_name="java_doc_plus",dim=512)
\ No newline at end of file
+oss_client = LazyExtension("oss", _create_oss)
+upload_pipeline = LazyExtension("pipeline", _create_pipeline)
+milvus_client = LazyExtension("milvus", _create_milvus)
+neo4j_client = LazyExtension("neo4j", _create_neo4j)
+ingestion_queue = IngestionJobQueue()
@@ -1,12 +1,18 @@
 import os
 
+# 最先导入，以便从进程启动开始计时
+from app.utils.startup import boot_report, register_warmup, warmup
+
+import click
 from flask import Flask
 from flask_cors import CORS
 from flask_migrate import Migrate
 
-from app.api.endpoints import chat, search, document, auth, interview, knowledge_base, conversation
-from app.config import Settings
-from app.extensions import db, redis_client, oss_client, upload_pipeline, milvus_client
+with boot_report.step("imports"):
+    from app.api.endpoints import chat, search, document, auth, interview, knowledge_base, conversation, metrics
+    from app.config import Settings
+    from app.extensions import (db, redis_client, oss_client, upload_pipeline, milvus_client, neo4j_client,
+                                ingestion_queue)
 
 app = Flask(__name__)
 
@@ -21,24 +27,69 @@ def create_app():
     set_env()
     app.config.from_object(Settings)
 
+    # 延迟组件：首次使用时才加载模型 / 连接服务
     app.extensions['oss'] = oss_client
     app.extensions['pipeline'] = upload_pipeline
+    app.extensions['milvus'] = milvus_client
+    app.extensions['neo4j'] = neo4j_client
     # init db
-    db.init_app(app)
-    Migrate(app, db)
+    with boot_report.step("db"):
+        db.init_app(app)
+        Migrate(app, db)
     # init redis
-    redis_client.init_app(app)
-    app.register_blueprint(chat.bp)
-    app.register_blueprint(search.bp)
-    app.register_blueprint(document.bp)
-    app.register_blueprint(auth.bp)
-    app.register_blueprint(interview.interview_bp)
-    app.register_blueprint(knowledge_base.bp)
-    app.register_blueprint(conversation.bp)
-    milvus_client.connect(app)
+    with boot_report.step("redis"):
+        redis_client.init_app(app)
+    with boot_report.step("blueprints"):
+        app.register_blueprint(chat.bp)
+        app.register_blueprint(search.bp)
+        app.register_blueprint(document.bp)
+        app.register_blueprint(auth.bp)
+        app.register_blueprint(interview.interview_bp)
+        app.register_blueprint(knowledge_base.bp)
+        app.register_blueprint(conversation.bp)
+        app.register_blueprint(metrics.bp)
+    # 只注册入库队列；worker 只依赖 redis，oss / pipeline 在处理第一个任务时加载
+    with boot_report.step("ingestion"):
+        ingestion_queue.init_app(app)
+        if Settings.INGEST_WORKERS_ON_START:
+            ingestion_queue.run_workers()
     CORS(app, supports_credentials=True)
+
+    @app.cli.command("warmup")
+    def warmup_command():
+        """加载全部延迟组件与模型，用于检查配置与外部服务"""
+        warmup(app)
+
+    @app.cli.command("ingest-worker")
+    @click.option("--workers", type=int, default=None, help="worker 线程数，默认 INGEST_WORKERS")
+    def ingest_worker_command(workers):
+        """运行入库任务 worker，直到 Ctrl+C"""
+        ingestion_queue.run_workers(workers)
+        print("ℹ️ 入库 worker 已启动")
+        try:
+            ingestion_queue.wait()
+        except KeyboardInterrupt:
+            ingestion_queue.stop()
+            print("ℹ️ 等待进行中的任务完成后退出")
+            ingestion_queue.wait()
+
+    if Settings.WARMUP_ON_START:
+        with boot_report.step("warmup"):
+            warmup(app)
+    boot_report.print_report(app.extensions)
     return app
 
+
+def _warmup_query_models():
+    """查询侧的嵌入模型（含一次前向计算）与 jieba 词典"""
+    from app.pipelines.tokenizer import get_chinese_tokenizer
+    from app.utils.tokenizer import Tokenizer
+    Tokenizer(model_name="BAAI/bge-small-zh-v1.5").model.encode("预热")
+    get_chinese_tokenizer()
+
+
+register_warmup("query_models", _warmup_query_models)
+
 def set_env():
     os.environ['LANGSMITH_ENDPOINT'] = Settings.LANGSMITH_ENDPOINT
     os.environ['LANGSMITH_API_KEY'] = Settings.LANGSMITH_API_KEY
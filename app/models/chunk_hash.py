@@ -0,0 +1,16 @@
+from app.extensions import db
+
+
+class ChunkHash(db.Model):
+    """已入库分块的内容指纹，重新上传文件时据此只处理变化的分块"""
+    __tablename__ = 'chunk_hashes'
+    id = db.Column(db.Integer, primary_key=True)
+    collection_name = db.Column(db.String(255), nullable=False)
+    file_name = db.Column(db.String(255), nullable=False)
+    chunk_index = db.Column(db.Integer, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    milvus_id = db.Column(db.BigInteger, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_chunk_hashes_collection_file', 'collection_name', 'file_name'),
+    )
@@ -43,17 +43,30 @@ class DocumentModel:
             "max_length": 10000  # 逗号分隔的关键词
         },
         {
+            # 分区键：Milvus 按 belong_to 的哈希把数据分到 NUM_PARTITIONS 个分区，
+            # "belong_to in [0, uid]" 的检索只扫描公共数据与该用户所在的分区
+            # 早期集合为 INT32 且不是分区键，用 data/build/migrate_partition_key.py 迁移
             "name": "belong_to",
-            "dtype": DataType.INT32 #
+            "dtype": DataType.INT64,
+            "is_partition_key": True
         }
     ]
 
+    # 分区键集合的分区数，创建后不可修改
+    NUM_PARTITIONS = 64
+
     @classmethod
     def create_schema(cls):
-        """生成 Milvus 集合 Schema"""
+        """生成 Milvus 集合 Schema，创建集合时需传入 num_partitions=NUM_PARTITIONS"""
         fields = [FieldSchema(**field) for field in cls.FIELDS]
         return CollectionSchema(
             fields=fields,
             description="Java技术文档向量存储",
             enable_dynamic_field=False
-        )
\ No newline at end of file
+        )
+
+    @staticmethod
+    def has_partition_key(schema) -> bool:
+        """集合是否已按 belong_to 分区"""
+        return any(field.name == "belong_to" and getattr(field, "is_partition_key", False)
+                   for field in schema.fields)
\ No newline at end of file
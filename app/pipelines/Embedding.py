@@ -1,69 +1,131 @@
-from typing import List, Dict
+import threading
+from typing import List, Dict, Iterable
 
-from sentence_transformers import SentenceTransformer
+import numpy as np
 from pymilvus import connections,  Collection, utility, MilvusException
 
+from app.db.index_profiles import collection_index_profile, index_params
+from app.db.milvus_expr import file_name_expr
 from app.models.document import DocumentModel
+from app.services.embedding import get_embedding_model
+from app.utils.embedding_store import get_embedding_store
 
 
 # 1. 初始化Embedding模型
 class EmbeddingGenerator:
     def __init__(self, model_name='BAAI/bge-small-zh-v1.5',device='cpu'):
-        self.model = SentenceTransformer(model_name)
+        # 与 RAGService 共享同一份模型
+        self.model = get_embedding_model(model_name, device)
         self.dim = 512  # 嵌入向量维度
         self.device = device
+        # 已编码过的文本（按模型及后端 + 文本哈希）直接从磁盘读取
+        self.store = get_embedding_store(self.model.fingerprint, self.model.dim)
 
     def generate(self, texts):
         """批量生成嵌入向量"""
-        return self.model.encode(texts, convert_to_tensor=False, device=self.device)
+        if self.store is None:
+            return self.model.encode(texts, convert_to_tensor=False)
+        if isinstance(texts, str):
+            return self.store.get_or_compute([texts], self._encode)[0]
+        return self.store.get_or_compute(list(texts), self._encode)
+
+    def _encode(self, texts):
+        return self.model.encode(texts, convert_to_tensor=False)
+
+    def generate_batch(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """
+        按长度排序后分批编码，再恢复原始顺序
+        长度相近的文本放在同一批，填充最少；结果与逐条 generate 一致
+        开启向量存储时只对未编码过的文本执行这一过程
+        """
+        if self.store is not None:
+            return self.store.get_or_compute(list(texts), lambda missing: self._encode_sorted(missing, batch_size))
+        return self._encode_sorted(texts, batch_size)
+
+    def _encode_sorted(self, texts: List[str], batch_size: int) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        vectors = None
+        for start in range(0, len(order), batch_size):
+            batch_idx = order[start:start + batch_size]
+            batch_vectors = self.model.encode([texts[i] for i in batch_idx], batch_size=len(batch_idx),
+                                              convert_to_tensor=False)
+            if vectors is None:
+                vectors = np.empty((len(texts), batch_vectors.shape[1]), dtype=batch_vectors.dtype)
+            vectors[batch_idx] = batch_vectors
+        return vectors
+
+    def iter_embeddings(self, texts: Iterable[str], batch_size: int = 64, window: int = 8):
+        """
+        流式版本：每累积 batch_size * window 条文本排序编码一次，按输入顺序逐条产出 (文本, 向量)
+        适合多个文档连续入库，不需要一次性持有全部分块
+        """
+        buffer = []
+        for text in texts:
+            buffer.append(text)
+            if len(buffer) >= batch_size * window:
+                yield from zip(buffer, self.generate_batch(buffer, batch_size))
+                buffer = []
+        if buffer:
+            yield from zip(buffer, self.generate_batch(buffer, batch_size))
 
 
 # 2. Milvus向量数据库操作类
 class VectorDB:
-    def __init__(self, milvus_uri, token,dim=512):
+    """入库写入端：按集合名缓存 Collection 句柄，写入 / 删除不需要 load，所有操作显式指定集合"""
+
+    def __init__(self, milvus_uri, token,dim=512, collection_name: str = "java_doc_plus"):
         self.milvus_uri = milvus_uri
         self.token = token
-        self.collection_name = "java_doc_plus"
+        self.default_collection = collection_name
         self.dim = dim
+        self._collections = {}
+        self._lock = threading.Lock()
 
         # 连接Milvus
         connections.connect(uri=self.milvus_uri, token=self.token)
-
-        # 如果集合不存在则创建
-        if not utility.has_collection(self.collection_name):
-            self._create_collection()
-
-        self.collection = Collection(self.collection_name)
-
-    def _create_collection(self):
+        self.collection(self.default_collection)
+
+    def collection(self, collection_name: str = None) -> Collection:
+        """返回集合句柄，集合不存在时按文档 schema 创建"""
+        collection_name = collection_name or self.default_collection
+        with self._lock:
+            handle = self._collections.get(collection_name)
+            if handle is None:
+                # 如果集合不存在则创建
+                if not utility.has_collection(collection_name):
+                    self._create_collection(collection_name)
+                handle = self._collections[collection_name] = Collection(collection_name)
+        return handle
+
+    def _create_collection(self, collection_name: str):
         """创建带索引的集合"""
         try:
             # 检查集合是否已存在
-            if not utility.has_collection(self.collection_name):
+            if not utility.has_collection(collection_name):
                 # 创建集合
                 schema = DocumentModel.create_schema()
                 collection = Collection(
-                    name=self.collection_name,
+                    name=collection_name,
                     schema=schema,
+                    num_partitions=DocumentModel.NUM_PARTITIONS,
                 )
 
-                # 创建向量索引
-                index_params = {
-                    "index_type": "IVF_FLAT",
-                    "metric_type": "L2",
-                    "params": {"nlist": 128}
-                }
+                # 按集合的索引配置创建向量索引
+                profile = collection_index_profile(collection_name)
                 collection.create_index(
                     field_name="chunk_embedding",
-                    index_params=index_params
+                    index_params=index_params(profile)
                 )
-                print(f"集合 {self.collection_name} 创建成功")
+                print(f"集合 {collection_name} 创建成功，索引 {profile['index_type']}/{profile['metric_type']}")
             else:
-                print(f"集合 {self.collection_name} 已存在")
+                print(f"集合 {collection_name} 已存在")
         except MilvusException as e:
             print(f"创建集合失败: {e}")
 
-    def add_documents(self, documents: List[Dict]):
+    def add_documents(self, documents: List[Dict], flush: bool = True, collection_name: str = None) -> list:
+        """:return: 按写入顺序排列的 Milvus 主键"""
         data = []
         for doc in documents:
             entity = {
@@ -79,8 +141,59 @@ class VectorDB:
             data.append(entity)
 
         # 批量插入
-        self.collection.insert(data)
-        self.collection.flush()
+        collection = self.collection(collection_name)
+        result = collection.insert(data)
+        if flush:
+            collection.flush()
+        return list(result.primary_keys)
+
+    def move_chunks(self, moves: list, flush: bool = True, collection_name: str = None) -> list:
+        """
+        修改分块的 chunk_index：取回原有字段与向量，以新序号重新写入后按主键删除旧分块，不重新向量化
+        :param moves: [(主键, 新 chunk_index)]
+        :return: 与 moves 对齐的新主键
+        """
+        if not moves:
+            return []
+        collection = self.collection(collection_name)
+        collection.load()  # query 需要集合已加载，检索服务已加载时立即返回
+        ids = [int(pk) for pk, _ in moves]
+        rows = {row["id"]: row for row in collection.query(
+            expr=f"id in [{','.join(str(pk) for pk in ids)}]",
+            output_fields=["content", "file_name", "keywords", "chunk_embedding", "belong_to"],
+            consistency_level="Strong")}
+        missing = [pk for pk in ids if pk not in rows]
+        if missing:
+            raise ValueError(f"集合中找不到分块 {missing[:10]}，分块指纹与向量库不一致")
+        data = [{
+            "content": rows[pk]["content"],
+            "file_name": rows[pk]["file_name"],
+            "chunk_index": chunk_index,
+            "keywords": rows[pk]["keywords"],
+            "chunk_embedding": rows[pk]["chunk_embedding"],
+            "belong_to": rows[pk]["belong_to"],
+        } for pk, (_, chunk_index) in zip(ids, moves)]
+        result = collection.insert(data)
+        self.delete_by_ids(ids, flush=flush, collection_name=collection_name)
+        return list(result.primary_keys)
+
+    def delete_by_ids(self, ids: list, flush: bool = True, collection_name: str = None):
+        """按主键删除，只影响指定分块"""
+        if not ids:
+            return
+        collection = self.collection(collection_name)
+        collection.delete(f"id in [{','.join(str(int(i)) for i in ids)}]")
+        if flush:
+            collection.flush()
+
+    def delete_by_file_name(self, file_name: str, flush: bool = True, collection_name: str = None):
+        collection = self.collection(collection_name)
+        collection.delete(file_name_expr(file_name))
+        if flush:
+            collection.flush()
+
+    def flush(self, collection_name: str = None):
+        self.collection(collection_name).flush()
 
 
 # 3. 使用示例
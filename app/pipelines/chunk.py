@@ -1,10 +1,57 @@
-from unstructured.partition.pdf import partition_pdf
+import tempfile
+from collections import deque
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from app.pipelines.pdf_partition import iter_pdf_texts
+
+# 流式分块时读取临时文件的块大小（字符）
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def _iter_lines(texts):
+    """将元素文本流展开为行，等价于 "\n".join(texts).split("\n")"""
+    for text in texts:
+        yield from text.split('\n')
+
+
+def _iter_split_keep_start(blocks, separator: str):
+    """
+    按字面分隔符切分文本块流，分隔符保留在后一段开头，并丢弃空段
+    与 langchain 的 _split_text_with_regex(keep_separator=True) 结果一致
+    """
+    pending = []
+    tail = ""
+    carry = len(separator) - 1
+    for block in blocks:
+        data = tail + block
+        start = 0
+        while True:
+            idx = data.find(separator, start)
+            if idx == -1:
+                break
+            pending.append(data[start:idx])
+            piece = "".join(pending)
+            if piece:
+                yield piece
+            pending = [separator]
+            start = idx + len(separator)
+        # 末尾可能是跨块分隔符的前半部分，留到下一块再判断
+        keep = max(start, len(data) - carry)
+        pending.append(data[start:keep])
+        tail = data[keep:]
+    pending.append(tail)
+    piece = "".join(pending)
+    if piece:
+        yield piece
+
 
 class AdvancedChunker(RecursiveCharacterTextSplitter):
-    def __init__(self):
+    def __init__(self, pdf_workers: int = 1, pdf_pages_per_task: int = 20):
         self.min_chunk_size = 300
+        # PDF 提取的并行进程数，1 表示在当前进程中提取
+        self.pdf_workers = pdf_workers
+        self.pdf_pages_per_task = pdf_pages_per_task
         # 初始化分块器（针对中文优化）
         super().__init__(
             chunk_size=1000,
@@ -27,82 +74,145 @@ class AdvancedChunker(RecursiveCharacterTextSplitter):
         chunks = super().split_text(text)
         return chunks
 
+    def _iter_preprocessed(self, lines):
+        """逐行合并短段落，缓冲区以列表累积并记录长度，整体为线性时间"""
+        buffer, buffer_len = [], 0
+        for line in lines:
+            if buffer_len + len(line) < self.min_chunk_size:
+                buffer.append(line + "\n")
+                buffer_len += len(line) + 1
+            else:
+                # 第一行就超过最小长度时会产出空段落，与原有行为保持一致
+                yield "".join(buffer)
+                buffer, buffer_len = [line + "\n"], len(line) + 1
+        if buffer_len:
+            yield "".join(buffer)
 
     def _preprocess_text(self, text):
         """合并短段落"""
-        lines = text.split('\n')
-        merged = []
-        buffer = ""
-
-        for line in lines:
-            if len(buffer + line) < self.min_chunk_size:
-                buffer += line + "\n"
-            else:
-                merged.append(buffer)
-                buffer = line + "\n"
-        if buffer:
-            merged.append(buffer)
-        return "\n".join(merged)
+        return "\n".join(self._iter_preprocessed(text.split('\n')))
 
     def _postprocess_chunks(self, chunks):
         """合并过小分块"""
         processed = []
-        temp_chunk = ""
+        temp_chunk, temp_len = [], 0
 
         for chunk in chunks:
-            if len(temp_chunk + chunk) < self.min_chunk_size:
-                temp_chunk += chunk
+            if temp_len + len(chunk) < self.min_chunk_size:
+                temp_chunk.append(chunk)
+                temp_len += len(chunk)
             else:
-                if temp_chunk:
-                    processed.append(temp_chunk)
-                temp_chunk = chunk
-        if temp_chunk:
-            processed.append(temp_chunk)
+                if temp_len:
+                    processed.append("".join(temp_chunk))
+                temp_chunk, temp_len = [chunk], len(chunk)
+        if temp_len:
+            processed.append("".join(temp_chunk))
 
         return processed
 
+    def iter_chunks(self, texts):
+        """
+        流式分块：输入元素文本或行的可迭代对象，逐个产出分块，结果与 split_text("\n".join(texts)) 一致
+
+        第一遍将预处理后的文本写入临时文件并记录出现过的分隔符（选择顶层分隔符需要看到全文）；
+        第二遍按顶层分隔符流式切分并合并，内存占用只与单个顶层片段的大小有关
+        """
+        found = set()
+        longest = max(len(sep) for sep in self._separators)
+        with tempfile.TemporaryFile(mode="w+", encoding="utf-8") as spool:
+            tail = ""
+            for i, paragraph in enumerate(self._iter_preprocessed(_iter_lines(texts))):
+                data = tail + ("\n" if i else "") + paragraph
+                found.update(sep for sep in self._separators if sep not in found and sep in data)
+                spool.write(data[len(tail):])
+                tail = data[-(longest - 1):] if longest > 1 else ""
+
+            separator, new_separators = self._separators[-1], []
+            for i, sep in enumerate(self._separators):
+                if not sep:
+                    separator = sep
+                    break
+                if sep in found:
+                    separator, new_separators = sep, self._separators[i + 1:]
+                    break
+
+            spool.seek(0)
+            blocks = iter(lambda: spool.read(STREAM_BLOCK_SIZE), "")
+            if separator:
+                splits = _iter_split_keep_start(blocks, separator)
+            else:
+                splits = (char for block in blocks for char in block)
+            yield from self._iter_merge(splits, new_separators)
+
+    def _iter_merge(self, splits, new_separators):
+        """RecursiveCharacterTextSplitter._split_text 合并阶段的生成器版本（keep_separator=True，连接符为空）"""
+        current_doc, total = deque(), 0
+        for split in splits:
+            split_len = self._length_function(split)
+            if split_len >= self._chunk_size:
+                if current_doc:
+                    doc = self._join_docs(list(current_doc), "")
+                    if doc is not None:
+                        yield doc
+                    current_doc, total = deque(), 0
+                if not new_separators:
+                    yield split
+                else:
+                    yield from self._split_text(split, new_separators)
+                continue
+
+            if current_doc and total + split_len > self._chunk_size:
+                doc = self._join_docs(list(current_doc), "")
+                if doc is not None:
+                    yield doc
+                while total > self._chunk_overlap or (total + split_len > self._chunk_size and total > 0):
+                    total -= self._length_function(current_doc.popleft())
+            current_doc.append(split)
+            total += split_len
+        if current_doc:
+            doc = self._join_docs(list(current_doc), "")
+            if doc is not None:
+                yield doc
 
 
-    def process_pdf(self, file_stream):
-        # 使用Unstructured提取PDF元素（文本+表格+图片描述）
-        elements = partition_pdf(
-            file=file_stream,
-            strategy="fast",  # fast
-            extract_images_in_pdf=False,
-            infer_table_structure=True,
-            include_page_breaks=True,
-        )
-
-        # 提取纯文本内容
-        text_content = "\n".join([e.text for e in elements if hasattr(e, 'text')])
 
-        # 分块处理
-        chunks = self.split_text(text_content)
+    def process_pdf(self, file_stream):
+        chunks = list(self.iter_pdf_chunks(file_stream))
         if chunks.__len__() == 0:
             raise ValueError("分块失败，请检查PDF内容")
         return chunks
 
+    def iter_pdf_chunks(self, file_stream):
+        # 使用Unstructured提取PDF元素（文本+表格+图片描述），大文件按页码区间并行提取
+        texts = iter_pdf_texts(file_stream, workers=self.pdf_workers, pages_per_task=self.pdf_pages_per_task)
+        # 分块处理
+        yield from self.iter_chunks(texts)
+
     # chunk.py 更新后的 process_markdown 方法
     def process_markdown(self, file_stream):
         """兼容新版unstructured的Markdown处理方法"""
+        return list(self.iter_markdown_chunks(file_stream))
+
+    def iter_markdown_chunks(self, file_stream):
         try:
             from unstructured.partition.md import partition_md
             elements = partition_md(file=file_stream)
-
-            structured_text = []
-            for elem in elements:
-                # 新版unstructured兼容写法
-                elem_type = getattr(elem, "type", elem.__class__.__name__)
-
-                if elem_type in ["Header", "Title", "NarrativeText"]:
-                    structured_text.append(f"# {elem.text}" if elem_type in ["Header", "Title"] else elem.text)
-                elif elem_type == "Code":
-                    structured_text.append(f"```\n{elem.text}\n```")
-
-            return self.split_text("\n".join(structured_text))
-
         except ImportError:
             # 回退方案：直接读取原始文本
             file_stream.seek(0)
             content = file_stream.read().decode("utf-8")
-            return self.split_text(content)
+            yield from self.iter_chunks([content])
+            return
+
+        yield from self.iter_chunks(self._markdown_texts(elements))
+
+    @staticmethod
+    def _markdown_texts(elements):
+        for elem in elements:
+            # 新版unstructured兼容写法
+            elem_type = getattr(elem, "type", elem.__class__.__name__)
+
+            if elem_type in ["Header", "Title", "NarrativeText"]:
+                yield f"# {elem.text}" if elem_type in ["Header", "Title"] else elem.text
+            elif elem_type == "Code":
+                yield f"```\n{elem.text}\n```"
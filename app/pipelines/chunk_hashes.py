@@ -0,0 +1,94 @@
+"""
+分块内容指纹：记录每个文件已入库分块的归一化文本哈希与 Milvus 主键，
+重新上传同名文件时只向量化并写入新增分块、按主键删除消失的分块，位置变化的分块只更新序号
+"""
+from app.utils.text_normalize import content_hash
+
+
+class ChunkDiff:
+    """
+    逐个比对新文档的分块与已入库分块（按哈希多重集合匹配，重复分块各自计数）
+    chunk_index 始终等于分块在新文档中的位置，相邻合并等依赖文档顺序的逻辑才成立：
+    未变化的分块优先匹配原位置相同的一条，位置变化的记入 moved（复用已有向量，只改序号），
+    新增分块直接使用其位置
+    """
+
+    def __init__(self, existing_rows):
+        """:param existing_rows: 可迭代的 (row_id, chunk_index, content_hash, milvus_id)"""
+        self._by_hash = {}
+        for row in sorted(existing_rows, key=lambda row: row[1]):
+            self._by_hash.setdefault(row[2], []).append(row)
+        self.existing = sum(len(rows) for rows in self._by_hash.values())
+        self.unchanged = 0
+        self.moved = []  # [(已入库行, 新 chunk_index, 分块文本)]
+
+    def match(self, text: str, position: int):
+        """
+        :param position: 分块在新文档中的序号
+        :return: (是否已入库, 内容哈希)
+        """
+        digest = content_hash(text)
+        rows = self._by_hash.get(digest)
+        if not rows:
+            return False, digest
+        row = next((row for row in rows if row[1] == position), rows[0])
+        rows.remove(row)
+        self.unchanged += 1
+        if row[1] != position:
+            self.moved.append((row, position, text))
+        return True, digest
+
+    def removed(self) -> list:
+        """新文档中不再出现的已入库分块"""
+        return [row for rows in self._by_hash.values() for row in rows]
+
+
+class ChunkHashStore:
+    """chunk_hashes 表的读写，模型延迟导入以避免与 app.extensions 循环引用"""
+
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+
+    def load(self, file_name: str) -> list:
+        from app.models.chunk_hash import ChunkHash
+
+        rows = ChunkHash.query.filter_by(collection_name=self.collection_name, file_name=file_name).all()
+        return [(row.id, row.chunk_index, row.content_hash, row.milvus_id) for row in rows]
+
+    def add(self, file_name: str, entries):
+        """:param entries: 可迭代的 (chunk_index, content_hash, milvus_id)"""
+        from app.extensions import db
+        from app.models.chunk_hash import ChunkHash
+
+        db.session.add_all([
+            ChunkHash(collection_name=self.collection_name, file_name=file_name,
+                      chunk_index=chunk_index, content_hash=digest, milvus_id=milvus_id)
+            for chunk_index, digest, milvus_id in entries
+        ])
+
+    def move(self, entries):
+        """:param entries: 可迭代的 (row_id, chunk_index, milvus_id)"""
+        from app.extensions import db
+        from app.models.chunk_hash import ChunkHash
+
+        db.session.bulk_update_mappings(ChunkHash, [
+            {"id": row_id, "chunk_index": chunk_index, "milvus_id": milvus_id}
+            for row_id, chunk_index, milvus_id in entries
+        ])
+
+    def delete(self, row_ids: list):
+        from app.models.chunk_hash import ChunkHash
+
+        if row_ids:
+            ChunkHash.query.filter(ChunkHash.id.in_(row_ids)).delete(synchronize_session=False)
+
+    def delete_file(self, file_name: str):
+        from app.models.chunk_hash import ChunkHash
+
+        ChunkHash.query.filter_by(collection_name=self.collection_name, file_name=file_name)\
+            .delete(synchronize_session=False)
+
+    def commit(self):
+        from app.extensions import db
+
+        db.session.commit()
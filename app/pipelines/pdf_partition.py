@@ -0,0 +1,101 @@
+"""
+PDF 元素提取：大文件按页码区间切分后在进程池中并行 partition_pdf，再按页序合并
+
+子进程使用 spawn 方式启动，只导入本模块（不依赖 Flask 应用与配置），
+避免在多线程的 Web 进程中 fork。
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader, PdfWriter
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def get_pdf_executor(workers: int) -> ProcessPoolExecutor:
+    """进程池在首次使用时创建并常驻，避免每个文件都重新导入 unstructured"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _executor_workers = workers
+        return _executor
+
+
+def partition_pdf_texts(pdf_bytes: bytes) -> list:
+    """对一段 PDF 执行 partition_pdf，返回各元素的文本（进程池任务，参数与返回值均可序列化）"""
+    from unstructured.partition.pdf import partition_pdf
+
+    elements = partition_pdf(
+        file=io.BytesIO(pdf_bytes),
+        strategy="fast",  # fast
+        extract_images_in_pdf=False,
+        infer_table_structure=True,
+        include_page_breaks=True,
+    )
+    return [e.text for e in elements if hasattr(e, 'text')]
+
+
+def split_page_ranges(total_pages: int, workers: int, pages_per_task: int) -> list:
+    """
+    切分页码区间 [start, end)
+    区间数至少为 workers（页数足够时），每个区间不少于 pages_per_task 页以摊薄进程间传输开销
+    """
+    if total_pages <= 0:
+        return []
+    tasks = max(1, min(workers, total_pages // max(1, pages_per_task)))
+    size, extra = divmod(total_pages, tasks)
+    ranges, start = [], 0
+    for i in range(tasks):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def slice_pdf(reader: PdfReader, start: int, end: int) -> bytes:
+    writer = PdfWriter()
+    for page in reader.pages[start:end]:
+        writer.add_page(page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def iter_pdf_texts(file_stream, workers: int = None, pages_per_task: int = 20):
+    """
+    按页序逐段产出元素文本，前面的页码区间完成后即可交给下游分块
+    :param workers: 并行进程数，None 表示 CPU 核数 - 1，1 表示在当前进程中提取
+    """
+    workers = workers or default_workers()
+    pdf_bytes = file_stream.read()
+    if workers <= 1:
+        yield from partition_pdf_texts(pdf_bytes)
+        return
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    ranges = split_page_ranges(len(reader.pages), workers, pages_per_task)
+    if len(ranges) <= 1:
+        yield from partition_pdf_texts(pdf_bytes)
+        return
+
+    payloads = [slice_pdf(reader, start, end) for start, end in ranges]
+    # map 按提交顺序返回结果，依次产出即为原始页序
+    for range_texts in get_pdf_executor(workers).map(partition_pdf_texts, payloads):
+        yield from range_texts
+
+
+def extract_pdf_texts(file_stream, workers: int = None, pages_per_task: int = 20) -> list:
+    """:return: 按页序排列的元素文本"""
+    return list(iter_pdf_texts(file_stream, workers, pages_per_task))
@@ -1,16 +1,26 @@
 import os
+import time
+from collections import deque
+from contextlib import nullcontext
 
+from app.db.faiss_store import get_faiss_store
 from app.pipelines.Embedding import VectorDB, EmbeddingGenerator
 from app.pipelines.chunk import AdvancedChunker
-from app.pipelines.tokenizer import ChineseTokenizer
+from app.pipelines.chunk_hashes import ChunkDiff, ChunkHashStore
+from app.pipelines.tokenizer import get_chinese_tokenizer
 from app.config import Settings
+from app.services.retrieval import get_bm25_retriever, get_semantic_cache
 
 
 class ProcessingPipeline:
     def __init__(self):
-        self.chunker = AdvancedChunker()
-        self.tokenizer = ChineseTokenizer()
-        self.VectorDB = VectorDB(milvus_uri=Settings.MILVUS_URL,token=Settings.MILVUS_TOKEN)
+        self.chunker = AdvancedChunker(pdf_workers=Settings.PDF_PARTITION_WORKERS,
+                                       pdf_pages_per_task=Settings.PDF_PAGES_PER_TASK)
+        self.tokenizer = get_chinese_tokenizer()
+        if Settings.VECTOR_STORE_BACKEND == 'faiss':
+            self.VectorDB = get_faiss_store()
+        else:
+            self.VectorDB = VectorDB(milvus_uri=Settings.MILVUS_URL,token=Settings.MILVUS_TOKEN)
         self.embedding = EmbeddingGenerator(model_name='BAAI/bge-small-zh-v1.5')
 
 
@@ -20,38 +30,170 @@ class ProcessingPipeline:
         return file_name
 
 
-    def process_document(self, file_stream, file_name, user_id):
-        """完整处理流水线"""
+    def process_document(self, file_stream, file_name, user_id, progress=None, replace=False,
+                         collection_name=None):
+        """
+        完整处理流水线：分块以生成器方式产出，每凑满一批即向量化并写入 Milvus / BM25，
+        内存占用与文档大小无关
+
+        每个分块的归一化文本哈希记录在 chunk_hashes 表中；重新上传同名文件时与已入库分块比对，
+        只向量化、写入新增分块，并按主键删除新版本中消失的分块，耗时与改动量而非文档大小成正比；
+        chunk_index 始终为分块在文档中的位置，位置变化的已入库分块复用原向量改写序号（见 ChunkDiff）
+        :param progress: 可选的进度回调 progress(stage, **fields)，供入库任务上报阶段与已处理分块数
+        :param replace: 是否为替换已有文件
+        :param collection_name: 写入的集合，None 表示默认集合
+        :return: {"file_name", "chunks", "added", "removed", "moved", "unchanged", "chunks_per_second"}
+        """
+        progress = progress or (lambda stage, **fields: None)
+        collection_name = collection_name or self.VectorDB.default_collection
+        bm25 = get_bm25_retriever(collection_name)
+        hash_store = ChunkHashStore(collection_name)
+        existing_rows = hash_store.load(file_name)
+        # BM25 的修改先记录下来，结束时在跨进程锁内一次应用并保存，不在向量化期间长时间持有锁
+        bm25_ops = {"delete_file": False, "delete": [], "add": []}
+        # FAISS 向量库每次写入都会发布整个集合的新版本，本文件的写入合并在一次 writing() 内只发布一次；
+        # 发布前写入不可见，分块指纹随之在发布后才提交。Milvus 的写入即时生效，逐批提交
+        deferred = hasattr(self.VectorDB, "writing")
+        vector_writes = self.VectorDB.writing(collection_name) if deferred else nullcontext()
+        diff = ChunkDiff(existing_rows)
+
         # 分块处理
+        progress("chunking")
         if file_name.endswith(".pdf"):
-            chunks = self.chunker.process_pdf(file_stream)
+            chunks = self.chunker.iter_pdf_chunks(file_stream)
         else:
-            chunks = self.chunker.process_markdown(file_stream)
-        print("-------------chunking ready-------------")
-        # 并行分词
-        tokenized_chunks = [self._process_chunk(chunk) for chunk in chunks]
-        print("--------------token and embedding ready---------------")
-        #添加chunk元数据
-        for idx, chunk in enumerate(tokenized_chunks):
-            chunk.update({
-                "file_name": file_name,
-                "chunk_index": idx,
-                "user_id": user_id
-            })
-
-        self.VectorDB.add_documents(tokenized_chunks)
-        print("--------------vectorized done--------------")
-        return tokenized_chunks
-
-    def _process_chunk(self, chunk):
-        """单个分块处理"""
+            chunks = self.chunker.iter_markdown_chunks(file_stream)
+
+        # 只有新增分块进入向量化，其 (chunk_index, 哈希) 按产出顺序排队，与向量一一对应
+        pending = deque()
+        counts = {"chunks": 0}
+
+        def new_chunks():
+            for chunk in chunks:
+                position = counts["chunks"]
+                counts["chunks"] += 1
+                exists, digest = diff.match(chunk, position)
+                if not exists:
+                    pending.append((position, digest))
+                    yield chunk
+
+        # 分块按长度排序后批量编码，避免逐条前向计算
+        start = time.perf_counter()
+        batch_size = Settings.EMBEDDING_INGEST_BATCH_SIZE
+        insert_batch_size = Settings.INGEST_INSERT_BATCH_SIZE
+        batch = []
+        added = 0
+        removed = []
+        succeeded = False
+        try:
+            with vector_writes:
+                if replace and not existing_rows:
+                    # 没有分块指纹的旧数据无法比对，整体删除后重新入库
+                    self.VectorDB.delete_by_file_name(file_name, flush=False, collection_name=collection_name)
+                    bm25_ops["delete_file"] = True
+                for chunk, vector in self.embedding.iter_embeddings(new_chunks(), batch_size=batch_size,
+                                                                    window=max(1, insert_batch_size // batch_size)):
+                    #添加chunk元数据
+                    chunk_index, digest = pending.popleft()
+                    record = self._process_chunk(chunk, vector)
+                    record.update({
+                        "file_name": file_name,
+                        "chunk_index": chunk_index,
+                        "content_hash": digest,
+                        "user_id": user_id
+                    })
+                    batch.append(record)
+                    added += 1
+                    if len(batch) >= insert_batch_size:
+                        self._insert_batch(batch, bm25_ops, hash_store, collection_name, commit=not deferred)
+                        batch = []
+                        elapsed = time.perf_counter() - start
+                        progress("embedding", chunks_processed=added,
+                                 chunks_per_second=round(added / elapsed, 2) if elapsed else 0)
+                if batch:
+                    self._insert_batch(batch, bm25_ops, hash_store, collection_name, commit=not deferred)
+
+                if counts["chunks"] == 0 and file_name.endswith(".pdf"):
+                    raise ValueError("分块失败，请检查PDF内容")
+
+                # 新版本中已不存在的分块按主键删除
+                removed = diff.removed()
+                if removed:
+                    self.VectorDB.delete_by_ids([row[3] for row in removed], flush=False,
+                                                collection_name=collection_name)
+                    bm25_ops["delete"].extend(row[1] for row in removed)
+                    hash_store.delete([row[0] for row in removed])
+                for start_at in range(0, len(diff.moved), insert_batch_size):
+                    self._move_batch(diff.moved[start_at:start_at + insert_batch_size], user_id, bm25_ops,
+                                     hash_store, collection_name, commit=not deferred)
+            succeeded = True
+        finally:
+            # Milvus 中途失败时也把已写入的批次写入 BM25，与已提交的分块指纹保持一致；
+            # FAISS 中途失败时本文件的写入全部丢弃，BM25 也不写入
+            if succeeded or not deferred:
+                self._apply_bm25(bm25, file_name, bm25_ops)
+
+        # 所有批次写入后统一 flush 与持久化索引
+        progress("indexing", chunks_total=counts["chunks"], chunks_processed=added)
+        if added or removed or diff.moved or (replace and not existing_rows):
+            self.VectorDB.flush(collection_name)
+            semantic_cache = get_semantic_cache()
+            if semantic_cache and (existing_rows or replace):
+                semantic_cache.invalidate_file(collection_name, file_name)
+        hash_store.commit()
+        elapsed = time.perf_counter() - start
+        chunks_per_second = round(added / elapsed, 2) if elapsed else 0
+        progress("indexing", chunks_per_second=chunks_per_second)
+        print(f"--------------vectorized done: {counts['chunks']} chunks, added {added}, "
+              f"removed {len(removed)}, moved {len(diff.moved)}, unchanged {diff.unchanged}, "
+              f"{chunks_per_second} chunks/s--------------")
+        return {"file_name": file_name, "chunks": counts["chunks"], "added": added, "removed": len(removed),
+                "moved": len(diff.moved), "unchanged": diff.unchanged, "chunks_per_second": chunks_per_second}
+
+    def _insert_batch(self, records, bm25_ops, hash_store, collection_name, commit=True):
+        milvus_ids = self.VectorDB.add_documents(records, flush=False, collection_name=collection_name)
+        # BM25 倒排索引在整个文件完成后统一写入
+        bm25_ops["add"].extend((record["chunk_index"], record["raw_text"], record["user_id"]) for record in records)
+        hash_store.add(records[0]["file_name"], (
+            (record["chunk_index"], record["content_hash"], milvus_id)
+            for record, milvus_id in zip(records, milvus_ids)
+        ))
+        # 每批提交指纹，任务中途失败重试时已写入的分块会被识别为未变化
+        if commit:
+            hash_store.commit()
+
+    def _move_batch(self, moved, user_id, bm25_ops, hash_store, collection_name, commit=True):
+        """位置变化的未改动分块：向量库复用原向量改写 chunk_index（Milvus 会换新主键），BM25 按新序号重建"""
+        milvus_ids = self.VectorDB.move_chunks([(row[3], position) for row, position, _ in moved], flush=False,
+                                               collection_name=collection_name)
+        bm25_ops["delete"].extend(row[1] for row, _, _ in moved)
+        bm25_ops["add"].extend((position, text, user_id) for _, position, text in moved)
+        hash_store.move((row[0], position, milvus_id) for (row, position, _), milvus_id in zip(moved, milvus_ids))
+        if commit:
+            hash_store.commit()
+
+    @staticmethod
+    def _apply_bm25(bm25, file_name, bm25_ops):
+        """在跨进程锁内加载最新的 BM25 索引并应用本文件的修改，先删除后写入（删除与新增可能是同一序号）"""
+        if not (bm25_ops["delete_file"] or bm25_ops["delete"] or bm25_ops["add"]):
+            return
+        with bm25.writing():
+            if bm25_ops["delete_file"]:
+                bm25.delete_file(file_name)
+            for chunk_index in bm25_ops["delete"]:
+                bm25.delete(file_name, chunk_index)
+            for chunk_index, text, belong_to in bm25_ops["add"]:
+                bm25.add(file_name, chunk_index, text, belong_to)
+
+    def _process_chunk(self, chunk, chunk_vector=None):
+        """单个分块处理，chunk_vector 为批量编码得到的向量"""
 
         # 预处理：生成摘要和关键词
         # summary = self.pre_process(chunk)
         return {
             "raw_text": chunk,
             # "tokens": self.tokenizer.tokenize(chunk),
-            "chunk_vector": self.embedding.generate(chunk),
+            "chunk_vector": self.embedding.generate(chunk) if chunk_vector is None else chunk_vector,
             "keywords": self.tokenizer.extract_keywords(chunk),
             "is_valid": True
         }
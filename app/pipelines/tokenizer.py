@@ -1,16 +1,38 @@
+import os
+import threading
+from functools import lru_cache
+
 import jieba
 import jieba.analyse
 from collections import defaultdict
 
 from jieba import posseg
 
+from app.config import Settings
+
+KEYWORD_POS = ('n', 'vn', 'ns', 'eng')
+
+
+def init_jieba_dictionary(cache_file: str = Settings.JIEBA_CACHE_FILE):
+    """使用固定位置的前缀词典缓存初始化 jieba，进程重启后直接加载缓存"""
+    cache_dir, cache_name = os.path.split(os.path.abspath(cache_file))
+    os.makedirs(cache_dir, exist_ok=True)
+    jieba.dt.tmp_dir = cache_dir
+    jieba.dt.cache_file = cache_name
+    jieba.initialize()
+
 
 class ChineseTokenizer:
-    def __init__(self, tech_terms=None, synonyms=None, stopwords=None):
+    # jieba 词典是进程全局的，术语注册只需执行一次
+    _registered_terms = set()
+    _init_lock = threading.Lock()
+
+    def __init__(self, tech_terms=None, synonyms=None, stopwords=None, keyword_cache_size=Settings.KEYWORD_CACHE_SIZE):
         """
         :param tech_terms: 技术术语列表，如["SpringBoot", "JVM调优"]
         :param synonyms: 同义词字典，如{"JVM": ["Java虚拟机"]}
         :param stopwords: 补充停用词列表
+        :param keyword_cache_size: 关键词提取结果的 LRU 缓存条数
         """
         self.tech_terms = tech_terms or []
         self.synonyms = synonyms or {}
@@ -21,19 +43,26 @@ class ChineseTokenizer:
         self._init_stopwords()
         self._init_jieba_config()
 
+        # 关键词提取结果按 (text, top_k) 缓存，带权重与不带权重共用一份
+        self._extract_tags_cached = lru_cache(maxsize=keyword_cache_size)(self._extract_tags)
+
     def _init_jieba(self):
         """动态构建词典"""
-        # 自动识别技术术语（如果没有提供）
-        if not self.tech_terms:
-            self.tech_terms = self._auto_detect_tech_terms()
+        with self._init_lock:
+            init_jieba_dictionary()
 
-        # 动态加载到分词器
-        for term in self.tech_terms:
-            jieba.add_word(term, freq=1000)
+            # 自动识别技术术语（如果没有提供）
+            if not self.tech_terms:
+                self.tech_terms = list(_default_tech_terms())
 
-        jieba.initialize()
+            # 动态加载到分词器
+            for term in self.tech_terms:
+                if term not in self._registered_terms:
+                    jieba.add_word(term, freq=1000)
+                    self._registered_terms.add(term)
 
-    def _auto_detect_tech_terms(self, top_n=50):
+    @staticmethod
+    def _auto_detect_tech_terms(top_n=50):
         """从文档中自动提取技术术语"""
         sample_text = """
             Java虚拟机(JVM)的垃圾回收(GC)机制是SpringBoot应用调优的重点，
@@ -50,7 +79,6 @@ class ChineseTokenizer:
 
     def _init_jieba_config(self):
         """配置jieba参数"""
-        jieba.initialize()
         jieba.setLogLevel(jieba.logging.INFO)
 
     def tokenize(self, text, use_pos=False):
@@ -82,22 +110,28 @@ class ChineseTokenizer:
 
         return list(set(replaced))  # 去重后返回
 
-    def extract_keywords(self, text, top_k=10):
-        """基于TF-IDF的关键词提取"""
-        return jieba.analyse.extract_tags(
+    def tokenize_for_index(self, text):
+        """BM25 索引用分词：保留词频，过滤停用词、空白与单个标点"""
+        return [w.lower() for w in jieba.lcut(text)
+                if w.strip() and w not in self.full_stopwords and (len(w) > 1 or w.isalnum())]
+
+    def _extract_tags(self, text, top_k):
+        return tuple(jieba.analyse.extract_tags(
             text,
             topK=top_k,
             withWeight=True,
-            allowPOS=('n', 'vn', 'ns', 'eng')
-        )
+            allowPOS=KEYWORD_POS
+        ))
+
+    def extract_keywords(self, text, top_k=10):
+        """基于TF-IDF的关键词提取"""
+        return list(self._extract_tags_cached(text, top_k))
 
     def extract_keywords_without_weight(self, text, top_k=10):
-        return jieba.analyse.extract_tags(
-            text,
-            topK=top_k,
-            withWeight=False,
-            allowPOS=('n', 'vn', 'ns', 'eng')
-        )
+        return [word for word, _ in self._extract_tags_cached(text, top_k)]
+
+    def keyword_cache_info(self):
+        return self._extract_tags_cached.cache_info()
 
     def named_entity_recognition(self, text):
         """命名实体识别"""
@@ -108,4 +142,29 @@ class ChineseTokenizer:
         for word, flag in words:
             if flag in ('nr', 'ns', 'nt'):
                 entities[flag].append(word)
-        return dict(entities)
\ No newline at end of file
+        return dict(entities)
+
+
+@lru_cache(maxsize=1)
+def _default_tech_terms():
+    return tuple(ChineseTokenizer._auto_detect_tech_terms())
+
+
+_shared_tokenizer = None
+_shared_lock = threading.Lock()
+
+
+def get_chinese_tokenizer() -> ChineseTokenizer:
+    """进程内共享的默认分词器"""
+    global _shared_tokenizer
+    if _shared_tokenizer is None:
+        with _shared_lock:
+            if _shared_tokenizer is None:
+                _shared_tokenizer = ChineseTokenizer()
+    return _shared_tokenizer
+
+
+if __name__ == "__main__":
+    # 构建镜像时预生成 jieba 词典缓存
+    init_jieba_dictionary()
+    print(f"jieba 词典缓存已生成: {Settings.JIEBA_CACHE_FILE}")
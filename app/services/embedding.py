@@ -0,0 +1,253 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sentence_transformers import CrossEncoder, SentenceTransformer
+
+from app.services.onnx_embedding import load_onnx_encoder, read_onnx_config
+from app.utils.metrics import metrics_registry
+
+DEFAULT_EMBEDDING_MODEL = 'BAAI/bge-small-zh-v1.5'
+
+
+class SharedEmbeddingModel:
+    """进程内共享的 SentenceTransformer 句柄"""
+
+    backend = "torch"
+
+    def __init__(self, model_name: str, model: SentenceTransformer, device: str, load_seconds: float):
+        self.model_name = model_name
+        self.model = model
+        self.device = device
+        self.load_seconds = load_seconds
+        # HF fast tokenizer 不支持多线程同时调用（会抛出 "Already borrowed"），encode 需要串行化
+        self._lock = threading.Lock()
+
+    @property
+    def dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def fingerprint(self) -> str:
+        """标识模型输出的向量空间，用作向量缓存键的一部分"""
+        return f"{self.model_name}:{self.dim}"
+
+    @property
+    def memory_bytes(self) -> int:
+        """模型参数与 buffer 占用的内存（字节）"""
+        tensors = list(self.model.parameters()) + list(self.model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    def encode(self, texts, **kwargs):
+        kwargs.setdefault("device", self.device)
+        with self._lock:
+            return self.model.encode(texts, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "model_name": self.model_name,
+            "backend": self.backend,
+            "device": self.device,
+            "dim": self.dim,
+            "load_seconds": round(self.load_seconds, 3),
+            "memory_bytes": self.memory_bytes,
+        }
+
+
+class SharedOnnxEmbeddingModel(SharedEmbeddingModel):
+    """ONNX Runtime int8 后端，向量与 PyTorch 版本在 COSINE_TOLERANCE 内近似但不完全相同"""
+
+    backend = "onnx"
+
+    @property
+    def fingerprint(self) -> str:
+        # 与 PyTorch 向量区分，避免两种后端的向量混用同一份缓存
+        return f"{self.model_name}:onnx-int8:{self.dim}"
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.model.model_bytes
+
+
+class SharedCrossEncoder:
+    """进程内共享的 CrossEncoder 句柄，用于重排序"""
+
+    def __init__(self, model_name: str, model: CrossEncoder, device: str, load_seconds: float):
+        self.model_name = model_name
+        self.model = model
+        self.device = device
+        self.load_seconds = load_seconds
+        self._lock = threading.Lock()
+
+    @property
+    def memory_bytes(self) -> int:
+        module = getattr(self.model, "model", self.model)
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    def predict(self, pairs, **kwargs):
+        with self._lock:
+            return self.model.predict(pairs, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "model_name": self.model_name,
+            "device": self.device,
+            "load_seconds": round(self.load_seconds, 3),
+            "memory_bytes": self.memory_bytes,
+        }
+
+
+BATCH_SIZE = metrics_registry.histogram(
+    "embedding_batch_size", "合并后单次 encode 的查询条数", labelnames=("model",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+QUEUE_WAIT_SECONDS = metrics_registry.histogram(
+    "embedding_queue_wait_seconds", "查询在合并队列中等待的时间（秒）", labelnames=("model",),
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25),
+)
+
+
+class BatchingEncoder:
+    """
+    将并发的单条 encode 调用合并为一次批量前向计算
+    后台线程取出队列中已有的请求，凑满 max_batch_size 即执行；只有上一批合并了多个请求
+    （说明有并发调用）时才最多再等待 window_ms 凑批，单个调用方不承担等待延迟
+    """
+
+    def __init__(self, model: SharedEmbeddingModel, max_batch_size: int = 32, window_ms: float = 5.0,
+                 bucket_size: int = 16):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000
+        self.bucket_size = bucket_size
+        self._queue = queue.Queue()
+        self._concurrent = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # 延迟到第一次调用时启动，兼容 gunicorn preload 后 fork 的 worker
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, daemon=True, name="embedding-batcher")
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def encode(self, text: str, timeout: float = None):
+        return self.submit(text).result(timeout=timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # 上一批编码期间到达的请求直接并入本批
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            deadline = time.perf_counter() + self.window
+            while self._concurrent and len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._concurrent = len(batch) > 1
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch: list):
+        start = time.perf_counter()
+        BATCH_SIZE.observe(len(batch), model=self.model.model_name)
+        for _, _, enqueued in batch:
+            QUEUE_WAIT_SECONDS.observe(start - enqueued, model=self.model.model_name)
+        try:
+            # SentenceTransformer 内部按文本长度排序后再按 batch_size 切分，
+            # 每个子批次只填充到自身的最大长度
+            vectors = self.model.encode([text for text, _, _ in batch], batch_size=self.bucket_size,
+                                        convert_to_tensor=False)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+
+class EmbeddingModelRegistry:
+    """每个进程中每个 (模型, 设备) 只加载一次"""
+
+    def __init__(self):
+        self._models = {}
+        self._encoders = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str = DEFAULT_EMBEDDING_MODEL, device: str = 'cpu',
+            backend: str = None) -> SharedEmbeddingModel:
+        """
+        :param backend: torch / onnx，None 表示使用 EMBEDDING_BACKEND 配置；
+                        onnx 只对已导出的模型生效，其他模型仍使用 PyTorch
+        """
+        if backend is None:
+            # 延迟导入，离线脚本可以显式指定后端而不依赖应用配置
+            from app.config import Settings
+            backend = Settings.EMBEDDING_BACKEND
+        if backend == "onnx" and device == 'cpu':
+            from app.config import Settings
+            config = read_onnx_config(Settings.EMBEDDING_ONNX_DIR)
+            if config is not None and config["model_name"] == model_name:
+                return self._get_or_load(load_onnx_encoder, SharedOnnxEmbeddingModel, model_name, device,
+                                         model_dir=Settings.EMBEDDING_ONNX_DIR,
+                                         intra_op_threads=Settings.EMBEDDING_ONNX_THREADS)
+        return self._get_or_load(SentenceTransformer, SharedEmbeddingModel, model_name, device)
+
+    def get_cross_encoder(self, model_name: str, device: str = 'cpu', max_length: int = 512) -> SharedCrossEncoder:
+        return self._get_or_load(CrossEncoder, SharedCrossEncoder, model_name, device, max_length=max_length)
+
+    def _get_or_load(self, loader, handle_cls, model_name: str, device: str, **kwargs):
+        key = (loader.__name__, model_name, device)
+        handle = self._models.get(key)
+        if handle is not None:
+            return handle
+
+        with self._lock:
+            # 双重检查，避免并发请求重复加载
+            handle = self._models.get(key)
+            if handle is None:
+                start = time.perf_counter()
+                model = loader(model_name, device=device, **kwargs)
+                handle = handle_cls(model_name, model, device, time.perf_counter() - start)
+                self._models[key] = handle
+                print(f"ℹ️ 模型 {model_name} 加载完成，耗时 {handle.load_seconds:.2f}s，"
+                      f"占用 {handle.memory_bytes / 1024 / 1024:.1f}MB")
+        return handle
+
+    def get_batching_encoder(self, model_name: str = DEFAULT_EMBEDDING_MODEL, device: str = 'cpu',
+                             max_batch_size: int = 32, window_ms: float = 5.0) -> BatchingEncoder:
+        model = self.get(model_name, device)
+        key = (model.fingerprint, device)
+        encoder = self._encoders.get(key)
+        if encoder is None:
+            with self._lock:
+                encoder = self._encoders.setdefault(key, BatchingEncoder(model, max_batch_size, window_ms))
+        return encoder
+
+    def stats(self) -> list:
+        return [handle.stats() for handle in list(self._models.values())]
+
+
+model_registry = EmbeddingModelRegistry()
+
+
+def get_embedding_model(model_name: str = DEFAULT_EMBEDDING_MODEL, device: str = 'cpu',
+                        backend: str = None) -> SharedEmbeddingModel:
+    return model_registry.get(model_name, device, backend)
@@ -0,0 +1,118 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from flask import current_app
+
+from app.config import Settings
+from app.utils.text_normalize import normalize_text
+
+
+class QueryEmbeddingCache:
+    """
+    查询向量的两级缓存
+    - 进程内 LRU：float32 数组
+    - Redis：小端 float32 原始字节，所有 worker 共享
+    键由模型指纹与归一化后的查询组成，更换嵌入模型后旧键自然失效；
+    未命中时同样编码归一化后的查询，同一个键不会因先到的写法不同而对应不同的向量
+    """
+
+    def __init__(self, redis=None, capacity: int = 10000, ttl: int = 604800, prefix: str = "qemb"):
+        self.redis = redis
+        self.capacity = capacity
+        self.ttl = ttl
+        self.prefix = prefix
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _key(self, fingerprint: str, query: str) -> str:
+        digest = hashlib.sha1(normalize_text(query).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:{fingerprint}:{digest}"
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._local[key] = vector
+            self._local.move_to_end(key)
+            while len(self._local) > self.capacity:
+                self._local.popitem(last=False)
+
+    def get(self, fingerprint: str, query: str):
+        key = self._key(fingerprint, query)
+        with self._lock:
+            vector = self._local.get(key)
+            if vector is not None:
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                return vector
+
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(key)
+            except Exception as e:
+                print(f"查询向量缓存读取失败: {str(e)}")
+                raw = None
+            if raw is not None:
+                vector = np.frombuffer(raw, dtype="<f4").astype(np.float32)
+                self._remember(key, vector)
+                with self._lock:
+                    self.redis_hits += 1
+                return vector
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, fingerprint: str, query: str, vector):
+        key = self._key(fingerprint, query)
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        # 缓存的数组会被多个请求共享，设为只读避免被意外修改
+        vector.flags.writeable = False
+        self._remember(key, vector)
+        if self.redis is not None:
+            try:
+                self.redis.set(key, vector.astype("<f4").tobytes(), ex=self.ttl)
+            except Exception as e:
+                print(f"查询向量缓存写入失败: {str(e)}")
+
+    def get_or_encode(self, fingerprint: str, query: str, encode):
+        vector = self.get(fingerprint, query)
+        if vector is None:
+            vector = encode(normalize_text(query))
+            self.put(fingerprint, query, vector)
+        return vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            size, local_hits, redis_hits, misses = len(self._local), self.local_hits, self.redis_hits, self.misses
+        lookups = local_hits + redis_hits + misses
+        return {
+            "size": size,
+            "local_hits": local_hits,
+            "redis_hits": redis_hits,
+            "misses": misses,
+            "hit_rate": (local_hits + redis_hits) / lookups if lookups else 0.0,
+        }
+
+
+_query_embedding_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_query_embedding_cache():
+    """未开启 QUERY_EMBEDDING_CACHE_SIZE（为 0）时返回 None"""
+    global _query_embedding_cache
+    if Settings.QUERY_EMBEDDING_CACHE_SIZE <= 0:
+        return None
+    if _query_embedding_cache is None:
+        with _cache_lock:
+            if _query_embedding_cache is None:
+                _query_embedding_cache = QueryEmbeddingCache(
+                    current_app.extensions.get('redis'),
+                    capacity=Settings.QUERY_EMBEDDING_CACHE_SIZE,
+                    ttl=Settings.QUERY_EMBEDDING_CACHE_TTL,
+                )
+    return _query_embedding_cache
@@ -3,7 +3,6 @@ import os
 import unicodedata
 import re
 from app.models.file import File
-from app.extensions import db
 
 MAX_FILE_SIZE = 50 * 1024 * 1024 # 单个文件最大20MB
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'md'} # 允许的文件类型
@@ -32,10 +31,14 @@ def safe_filename(filename: str) -> str:
     # 5. 长度限制（保留最后255字符）
     return cleaned[:255]
 
-def store_file(files, user_id=0, file_category=None):
-    doc_to_oss = current_app.extensions['oss']
-    processed_pipeline = current_app.extensions['pipeline']
+def store_file(files, user_id=0, file_category=None, collection_name="java_doc_plus", replace=False):
+    """
+    校验并保存上传的文件，入库由后台任务完成，立即返回任务 id
+    :param replace: 替换同名文件，只重新处理有变化的分块
+    """
+    ingestion = current_app.extensions['ingestion']
     saved_files = []
+    jobs = []
     for file in files:
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file'}), 400
@@ -49,20 +52,13 @@ def store_file(files, user_id=0, file_category=None):
         print(file.filename)
         file_name = safe_filename(file.filename)
         print(file_name)
-        error = doc_to_oss.upload_file_to_oss(file.stream, file_name)
-        if error:
-            return jsonify({'error': error}), 400
 
+        # OSS 上传、分块、向量化与数据库记录都在任务中完成
+        job_id = ingestion.enqueue(file, file_name, user_id, file_category, collection_name, replace=replace)
         saved_files.append(file_name)
-        # 处理文件
-        file.seek(0)
-        processed_pipeline.process_document(file.stream, file_name, user_id)
-        # 保存文件信息到数据库
-        new_file = File(name=file_name, category=file_category, collection_name=current_app.extensions['milvus'].collection_name)
-        db.session.add(new_file)
-        db.session.commit()
+        jobs.append({'file_name': file_name, 'job_id': job_id})
 
-    return jsonify({'success': True, 'saved_files': saved_files}), 200
+    return jsonify({'success': True, 'saved_files': saved_files, 'jobs': jobs}), 202
 
 
 def get_files(file_category):
@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+
+from app.config import Settings
+from app.utils.metrics import metrics_registry
+
+INGEST_SECONDS = metrics_registry.histogram(
+    "ingestion_job_duration_seconds", "文件入库任务耗时（秒）", labelnames=("status",),
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+
+
+def _decode(mapping: dict) -> dict:
+    return {
+        (k.decode("utf-8") if isinstance(k, bytes) else k): (v.decode("utf-8") if isinstance(v, bytes) else v)
+        for k, v in mapping.items()
+    }
+
+
+class IngestionJobQueue:
+    """
+    基于 Redis 的文件入库任务队列，上传接口只负责落盘与入队，由后台 worker 线程完成
+    OSS 上传、分块、向量化与写入 Milvus / BM25
+
+    - {prefix}:queue       待处理任务 id（list）
+    - {prefix}:processing  正在处理的任务 id（list），worker 异常退出后可据此恢复
+    - {prefix}:job:{id}    任务状态（hash）：status / stage / chunks_total / chunks_processed /
+                           chunks_per_second / chunks_added / chunks_removed / error / attempts ...
+    上传的文件先保存在 spool_dir 中，任务成功后删除；失败的任务保留文件，可直接重试
+    init_app 只注册队列，worker 由 `flask ingest-worker` 或 INGEST_WORKERS_ON_START 显式启动，
+    迁移、预热与 data/build 下调用 create_app() 的脚本不会消费任务；worker 与 Web 进程需共享 spool_dir
+    """
+
+    STAGES = ("queued", "uploading", "chunking", "embedding", "inserting", "indexing", "done")
+
+    def __init__(self, app=None, prefix: str = "ingest"):
+        self.prefix = prefix
+        self.redis = None
+        self.spool_dir = None
+        self.job_ttl = 7 * 86400
+        self._workers = []
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, redis=None):
+        self.app = app
+        self.redis = redis if redis is not None else app.extensions['redis']
+        self.spool_dir = Settings.INGEST_SPOOL_DIR
+        os.makedirs(self.spool_dir, exist_ok=True)
+        app.extensions['ingestion'] = self
+
+    def _key(self, *parts) -> str:
+        return ":".join([self.prefix, *parts])
+
+    # ------------------------------------------------------------------ 任务状态
+    def get_job(self, job_id: str):
+        job = _decode(self.redis.hgetall(self._key("job", job_id)))
+        if not job:
+            return None
+        for field in ("user_id", "chunks_total", "chunks_processed", "attempts",
+                      "chunks_added", "chunks_removed", "chunks_unchanged"):
+            if field in job:
+                job[field] = int(job[field])
+        for field in ("chunks_per_second", "created_at", "updated_at", "started_at", "finished_at"):
+            if field in job:
+                job[field] = float(job[field])
+        job["uploaded"] = job.get("uploaded") == "1"
+        job["replace"] = job.get("replace") == "1"
+        return job
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        key = self._key("job", job_id)
+        self.redis.hset(key, mapping={k: ("" if v is None else v) for k, v in fields.items()})
+        self.redis.expire(key, self.job_ttl)
+
+    # ------------------------------------------------------------------ 入队
+    def enqueue(self, file_storage, file_name: str, user_id: int, category: str, collection_name: str,
+                replace: bool = False) -> str:
+        """
+        保存上传的文件并创建任务，立即返回任务 id
+        :param replace: 替换同名文件，只重新处理内容有变化的分块
+        """
+        job_id = uuid.uuid4().hex
+        spool_path = os.path.join(self.spool_dir, f"{job_id}_{file_name}")
+        file_storage.seek(0)
+        file_storage.save(spool_path)
+        now = time.time()
+        self.update(
+            job_id,
+            id=job_id,
+            file_name=file_name,
+            user_id=user_id,
+            category=category or "",
+            collection_name=collection_name,
+            spool_path=spool_path,
+            status="queued",
+            stage="queued",
+            chunks_total=0,
+            chunks_processed=0,
+            chunks_per_second=0,
+            attempts=0,
+            uploaded=0,
+            replace=int(bool(replace)),
+            error="",
+            created_at=now,
+        )
+        self.redis.lpush(self._key("queue"), job_id)
+        return job_id
+
+    def retry(self, job_id: str):
+        """重新排队失败的任务，使用已保存的文件，不需要重新上传"""
+        job = self.get_job(job_id)
+        if job is None:
+            return "任务不存在"
+        if job["status"] != "failed":
+            return "只有失败的任务可以重试"
+        if not os.path.exists(job["spool_path"]):
+            return "上传的文件已被清理，请重新上传"
+        self.update(job_id, status="queued", stage="queued", error="", chunks_processed=0)
+        self.redis.lpush(self._key("queue"), job_id)
+        return None
+
+    def recover_stale(self, max_age: float):
+        """将超过 max_age 秒没有更新的处理中任务放回队列（worker 进程异常退出的情况）"""
+        for raw_id in self.redis.lrange(self._key("processing"), 0, -1):
+            job_id = raw_id.decode("utf-8") if isinstance(raw_id, bytes) else raw_id
+            job = self.get_job(job_id)
+            if job is not None and time.time() - job.get("updated_at", 0) < max_age:
+                continue
+            if self.redis.lrem(self._key("processing"), 1, job_id):
+                if job is not None:
+                    self.update(job_id, status="queued", stage="queued")
+                    self.redis.lpush(self._key("queue"), job_id)
+                print(f"ℹ️ 入库任务 {job_id} 已恢复到队列")
+
+    # ------------------------------------------------------------------ worker
+    def run_workers(self, workers: int = None):
+        """恢复中断的任务并启动 worker 线程"""
+        self.recover_stale(Settings.INGEST_STALE_SECONDS)
+        self.start(Settings.INGEST_WORKERS if workers is None else workers)
+
+    def wait(self):
+        """阻塞到 stop() 被调用，供独立的 worker 进程使用"""
+        while not self._stopping.wait(1):
+            pass
+        for thread in self._workers:
+            thread.join()
+
+    def start(self, workers: int = 2):
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker_loop, daemon=True, name=f"ingestion-{i}")
+            thread.start()
+            self._workers.append(thread)
+
+    def stop(self):
+        self._stopping.set()
+
+    def _worker_loop(self):
+        while not self._stopping.is_set():
+            try:
+                job_id = self.claim(timeout=5)
+            except Exception as e:
+                print(f"入库队列读取失败: {str(e)}")
+                time.sleep(5)
+                continue
+            if job_id is not None:
+                self.process(job_id)
+
+    def claim(self, timeout: int = 5):
+        """把一个待处理任务原子地移入 processing，:return: 任务 id，timeout 秒内没有任务时为 None"""
+        job_id = self.redis.brpoplpush(self._key("queue"), self._key("processing"), timeout=timeout)
+        if job_id is None:
+            return None
+        return job_id.decode("utf-8") if isinstance(job_id, bytes) else job_id
+
+    def process(self, job_id: str):
+        """执行已领取的任务，结束后（无论成败）移出 processing"""
+        with self.app.app_context():
+            self.run_job(job_id)
+        self.redis.lrem(self._key("processing"), 1, job_id)
+
+    def run_job(self, job_id: str):
+        job = self.get_job(job_id)
+        if job is None:
+            return
+        start = time.perf_counter()
+        self.update(job_id, status="running", started_at=time.time(), attempts=job["attempts"] + 1)
+        try:
+            oss = self.app.extensions['oss']
+            pipeline = self.app.extensions['pipeline']
+
+            if not job["uploaded"]:
+                self.update(job_id, stage="uploading")
+                with open(job["spool_path"], "rb") as f:
+                    error = oss.upload_file_to_oss(f, job["file_name"], overwrite=job["replace"])
+                if error:
+                    raise RuntimeError(error)
+                self.update(job_id, uploaded=1)
+
+            def progress(stage, **fields):
+                self.update(job_id, stage=stage, **fields)
+
+            with open(job["spool_path"], "rb") as f:
+                result = pipeline.process_document(f, job["file_name"], job["user_id"], progress=progress,
+                                                   replace=job["replace"],
+                                                   collection_name=job["collection_name"])
+            self.update(job_id, chunks_added=result["added"], chunks_removed=result["removed"],
+                        chunks_unchanged=result["unchanged"])
+            self._record_file(job)
+
+            self.update(job_id, status="done", stage="done", finished_at=time.time())
+            os.remove(job["spool_path"])
+            INGEST_SECONDS.observe(time.perf_counter() - start, status="done")
+        except Exception as e:
+            self._rollback()
+            traceback.print_exc()
+            self.update(job_id, status="failed", error=str(e), finished_at=time.time())
+            INGEST_SECONDS.observe(time.perf_counter() - start, status="failed")
+
+    @staticmethod
+    def _record_file(job: dict):
+        """在 files 表中登记（或更新分类）入库的文件"""
+        # 延迟导入，避免与 app.extensions 循环引用
+        from app.extensions import db
+        from app.models.file import File
+
+        file_record = File.query.filter_by(name=job["file_name"], collection_name=job["collection_name"]).first()
+        if file_record is None:
+            db.session.add(File(name=job["file_name"], category=job["category"],
+                                collection_name=job["collection_name"]))
+        else:
+            file_record.category = job["category"]
+        db.session.commit()
+
+    @staticmethod
+    def _rollback():
+        from app.extensions import db
+
+        db.session.rollback()
@@ -27,3 +27,10 @@ class LLMService(ABC):
     @abstractmethod
     def stream_generate(self, prompt: str, **kwargs) -> str:
         pass
+
+
+async def aclose_stream(stream):
+    """关闭上游流式响应，停止 LLM 继续生成（兼容 openai AsyncStream 与 langsmith 包装后的异步生成器）"""
+    close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if close is not None:
+        await close()
@@ -1,14 +1,17 @@
 import asyncio
+import time
 
-from openai import AsyncOpenAI, OpenAI
+from openai import AsyncOpenAI
 
 from app.config import Settings
-from app.services.llm import LLMService
+from app.services.llm import LLMService, aclose_stream
 from langsmith.wrappers import wrap_openai
 from langsmith import traceable
 
-from app.utils.intent_classifier import IntentClassificationService
+from app.utils.intent_classifier import HybridIntentClassifier
 from app.services.prompt.factory import get_prompt_template
+from app.services.prompt.context import build_context
+from app.utils.metrics import record_stage, stage_timer
 
 API_URL = 'https://api.deepseek.com/v1'
 
@@ -27,17 +30,18 @@ class DeepseekService(LLMService):
         retrieved_docs = kwargs.get('retrieved_docs')
         conversation_id = kwargs.get('conversation_id')
 
-        context = "\n".join([doc["content"] for doc in retrieved_docs]) if retrieved_docs else None
+        with stage_timer("context_pack"):
+            context = build_context(retrieved_docs)
 
         # 获取意图分类结果
-        print("---------llm is classifying intent--------")
-        intent_classifier = IntentClassificationService()
-        intent = await intent_classifier.classify_intent(query)
-        print(intent.value)
+        intent_classifier = HybridIntentClassifier()
+        with stage_timer("intent_classification"):
+            intent = await intent_classifier.classify_intent(query, query_vector=kwargs.get('query_vector'))
 
         # 根据意图类型获取对应的prompt模板并生成prompt
-        prompt_template = get_prompt_template(intent.value)
-        generated_prompt = prompt_template.generate(query, context if context else "", conversation_id=conversation_id)
+        with stage_timer("prompt_build"):
+            prompt_template = get_prompt_template(intent.value)
+            generated_prompt = prompt_template.generate(query, context if context else "", conversation_id=conversation_id)
         return str(generated_prompt)
 
     async def simple_generate(self, prompt: str, **kwargs) -> str:
@@ -56,14 +60,15 @@ class DeepseekService(LLMService):
         print("---------llm is generating response--------")
         # 关于prompt的处理
         prompt = await self.get_prompt(query=prompt, **kwargs)
-        response = await self.client.chat.completions.create(
-            model='deepseek-chat',
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }],
-            temperature=kwargs.get('temperature', 0.5)
-        )
+        with stage_timer("llm_total"):
+            response = await self.client.chat.completions.create(
+                model='deepseek-chat',
+                messages=[{
+                    "role": "user",
+                    "content": prompt
+                }],
+                temperature=kwargs.get('temperature', 0.5)
+            )
         return response.choices[0].message.content
 
     async def stream_generate(self, prompt: str, **kwargs):
@@ -73,18 +78,28 @@ class DeepseekService(LLMService):
         :param kwargs: 其他参数（如 temperature）
         """
         print("---------llm is streaming response--------")
-        client = wrap_openai(OpenAI(base_url=API_URL, api_key=self.api_key))
         # 关于prompt的处理
         prompt = await self.get_prompt(query=prompt, **kwargs)
-        stream = client.chat.completions.create(
+        start = time.perf_counter()
+        first_token = True
+        stream = await self.client.chat.completions.create(
             model='deepseek-chat',
             messages=[{"role": "user", "content": prompt}],
             temperature=kwargs.get('temperature', 0.5),
             stream=True  # 启用流式输出
         )
 
-        for chunk in stream:
-            content = chunk.choices[0].delta.content
-            if content:
-                print(f"Yielding chunk: {content}")  # 调试日志
-                yield content
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    if first_token:
+                        record_stage("llm_ttft", time.perf_counter() - start)
+                        first_token = False
+                    yield content
+        finally:
+            # 客户端断开时任务被取消，关闭上游连接以停止生成
+            await aclose_stream(stream)
+            record_stage("llm_total", time.perf_counter() - start)
@@ -0,0 +1,87 @@
+"""
+ONNX Runtime 推理的句向量模型（int8 动态量化），接口与 SentenceTransformer.encode 保持一致
+
+模型目录由 data/build/export_onnx_embedding.py 生成：
+- model.onnx          量化后的 transformer，输出 last_hidden_state
+- onnx_config.json    模型名、维度、池化方式、是否归一化、最大长度
+- tokenizer 文件      与原模型相同
+导出脚本会校验与 PyTorch 向量的余弦相似度不低于 COSINE_TOLERANCE。
+"""
+import json
+import os
+
+import numpy as np
+
+# 量化后向量与 PyTorch 向量的最小余弦相似度
+COSINE_TOLERANCE = 0.99
+CONFIG_FILE = "onnx_config.json"
+MODEL_FILE = "model.onnx"
+
+
+def read_onnx_config(model_dir: str):
+    path = os.path.join(model_dir, CONFIG_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class OnnxSentenceEncoder:
+    def __init__(self, model_dir: str, intra_op_threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_dir = model_dir
+        self.config = read_onnx_config(model_dir)
+        if self.config is None:
+            raise FileNotFoundError(f"{model_dir} 下没有 {CONFIG_FILE}，请先运行 data/build/export_onnx_embedding.py")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(os.path.join(model_dir, MODEL_FILE), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = self.config["max_seq_length"]
+
+    @property
+    def model_bytes(self) -> int:
+        return os.path.getsize(os.path.join(self.model_dir, MODEL_FILE))
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dim"]
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        if self.config["pooling"] == "cls":
+            return hidden[:, 0]
+        mask = attention_mask[..., None].astype(hidden.dtype)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_tensor: bool = False,
+               normalize_embeddings: bool = False, **kwargs):
+        """与 SentenceTransformer.encode 相同：按长度排序分批，单条输入返回一维向量"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        vectors = np.empty((len(sentences), self.config["dim"]), dtype=np.float32)
+        order = np.argsort([-len(sentence) for sentence in sentences], kind="stable")
+        for start in range(0, len(order), batch_size):
+            batch_idx = order[start:start + batch_size]
+            encoded = self.tokenizer([sentences[i] for i in batch_idx], padding=True, truncation=True,
+                                     max_length=self.max_seq_length, return_tensors="np")
+            feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            vectors[batch_idx] = self._pool(hidden, encoded["attention_mask"])
+        if self.config["normalize"] or normalize_embeddings:
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors[0] if single else vectors
+
+
+def load_onnx_encoder(model_name: str, device: str = 'cpu', model_dir: str = None,
+                      intra_op_threads: int = 0) -> OnnxSentenceEncoder:
+    """供 EmbeddingModelRegistry 使用的加载函数，只支持 CPU"""
+    encoder = OnnxSentenceEncoder(model_dir, intra_op_threads)
+    if encoder.config["model_name"] != model_name:
+        raise ValueError(f"{model_dir} 导出自 {encoder.config['model_name']}，与 {model_name} 不一致")
+    return encoder
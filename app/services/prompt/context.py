@@ -0,0 +1,12 @@
+from app.config import Settings
+from app.core.retrieval.context_packer import ContextPacker
+
+
+def build_context(retrieved_docs: list, token_budget: int = None):
+    """LLM 服务构造 prompt 时使用的上下文，无检索结果时返回 None"""
+    if not retrieved_docs:
+        return None
+    packer = ContextPacker(token_budget=Settings.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget)
+    context, stats = packer.pack(retrieved_docs)
+    print("----------context packed:", stats)
+    return context or None
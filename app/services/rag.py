@@ -1,3 +1,4 @@
+import contextvars
 import json
 import time
 
@@ -5,42 +6,60 @@ from flask import current_app
 
 from app.api.dependency import get_llm_service_dependency
 from app.utils.tokenizer import Tokenizer
-from app.pipelines.tokenizer import ChineseTokenizer
+from app.pipelines.tokenizer import get_chinese_tokenizer
+from app.config import Settings
+from app.core.retrieval.fusion import CandidatePool, FusionEngine, distance_to_similarity
+from app.services.retrieval import get_bm25_retriever, get_reranker, get_semantic_cache, retrieval_pool
+from app.utils.metrics import stage_timer
 
 
 class RAGService:
-    def __init__(self, LLMrequire: str = 'deepseek'):
+    def __init__(self, LLMrequire: str = 'deepseek', collection_name: str = None):
         self.tokenizer = Tokenizer(model_name="BAAI/bge-small-zh-v1.5")
         self.milvus_client = current_app.extensions['milvus']  # 获取 Milvus 客户端
+        # 每个请求固定检索的集合，显式传给 Milvus，不修改共享客户端的状态
+        self.collection_name = collection_name or self.milvus_client.default_collection
         self.LLMService = LLMrequire
         self.llm_service = get_llm_service_dependency(LLMrequire)  # 初始化 LLM 服务
-        self.ChineseTokenizer = ChineseTokenizer()
+        self.ChineseTokenizer = get_chinese_tokenizer()
+        self.bm25 = get_bm25_retriever(self.collection_name)
+        self.fusion_engine = FusionEngine(strategy=Settings.FUSION_STRATEGY, vector_weight=0.7, keyword_weight=0.3)
+        self.reranker = get_reranker()
+        self.semantic_cache = get_semantic_cache()
 
-    def retrieve(self, query: str, top_k=5):
-        print("--------------encoding------------")
+    def retrieve(self, query: str, top_k=5, query_vector=None):
         # 1. 文本向量化
-        query_vector = self.tokenizer.encode(query)
+        if query_vector is None:
+            query_vector = self.encode_query(query)
 
         # 2. 在 Milvus 中检索
-        results = self.milvus_client.search(query_vector=query_vector, top_k=top_k)
-        print("----------retrieve files done------------------")
-        # 3. 解析结果
-        retrieved_docs = []
-        for hit in results[0]:
-            retrieved_docs.append({
-                "id": hit.id,
-                "score": hit.score,
-                "content": hit.get("content"),
-                "name": hit.get("file_name"),
-            })
-        return retrieved_docs
+        with stage_timer("milvus_search"):
+            results = self.milvus_client.search(query_vector=query_vector, top_k=top_k,
+                                                collection_name=self.collection_name)
+        # 3. 解析结果：L2 度量下 hit.score 是距离，统一换算为越大越相关，上下文打包按该分数排序
+        hits = list(results[0])
+        scores = distance_to_similarity([hit.score for hit in hits],
+                                        self.milvus_client.metric_type(self.collection_name))
+        return [self._search_doc(hit, score) for hit, score in zip(hits, scores)]
+
+    @staticmethod
+    def _search_doc(hit, score: float) -> dict:
+        """file_name / chunk_index 供上下文打包合并相邻分块；name 为 /search 接口返回给前端的文件名"""
+        return {
+            "id": hit.id,
+            "score": float(score),
+            "content": hit.get("content"),
+            "file_name": hit.get("file_name"),
+            "chunk_index": hit.get("chunk_index"),
+            "name": hit.get("file_name"),
+        }
 
-    async def generate_answer(self, query: str, retrieved_docs: list):
+    async def generate_answer(self, query: str, retrieved_docs: list, query_vector=None):
         # # 1. 构造提示
         # prompt = await self.llm_service.get_prompt(query, retrieved_docs=retrieved_docs)
 
-        # 2. 使用 LLM 生成答案
-        answer = await self.llm_service.agenerate(query, retrieved_docs=retrieved_docs)
+        # 2. 使用 LLM 生成答案，查询向量传给意图识别，避免重复编码
+        answer = await self.llm_service.agenerate(query, retrieved_docs=retrieved_docs, query_vector=query_vector)
         print("answer: ", answer)
         return answer
 
@@ -50,112 +69,234 @@ class RAGService:
         # intent = await intent_classifier.classify_intent(query)
         # print("----------intent classify done------------------", intent.value)
 
-        # 2. 检索相关文档
-        retrieved_docs = self.retrieve(query, top_k=top_k)
-        print("Yes" if retrieved_docs else "No")  # 调试日志
-        # print("----------retrieve docs done------------------")
+        # 2. 语义缓存命中时直接返回
+        query_vector = self.encode_query(query)
+        scope = self.cache_scope(belong_to=None, top_k=top_k)
+        cached = self.cache_lookup(scope, query_vector)
+        if cached:
+            return cached
+
+        # 3. 检索相关文档
+        retrieved_docs = self.retrieve(query, top_k=top_k, query_vector=query_vector)
 
-        # 3. 生成答案
-        answer = await self.generate_answer(query, retrieved_docs)
-        print("yes" if answer else "no")  # 调试日志
-        # ("----------generate answer done------------------")
+        # 4. 生成答案
+        answer = await self.generate_answer(query, retrieved_docs, query_vector=query_vector)
 
+        self.cache_store(scope, query, query_vector, answer, retrieved_docs)
         return {
             "answer": answer,
             "retrieved_docs": retrieved_docs
             # "intent": intent.value
         }
 
-    def hybrid_retrieve(self, query: str, top_k=5, belong_to: int = 0):
-        # 1. 文本向量化
-        query_vector = self.tokenizer.encode(query)
-
-        # 2. 关键词提取
-        query_keyword = self.ChineseTokenizer.extract_keywords_without_weight(query)
-
-        expr = self.build_expression(query_keyword, belong_to)
-
-        # 3. 在 Milvus 中检索
-        results = self.milvus_client.hybrid_search(query_vector=query_vector, expr=expr, top_k=top_k)
-        print("----------retrieve results:", results)
-        # 3. 解析结果
-        retrieved_docs = self.fuse_results(results, query_keyword, vector_weight=0.7, keyword_weight=0.3)
+    def hybrid_retrieve(self, query: str, top_k=5, belong_to: int = 0, query_vector=None):
+        # 1. 关键词提取
+        with stage_timer("keyword_extraction"):
+            query_keyword = self.ChineseTokenizer.extract_keywords_without_weight(query)
+        expr = self.build_expression(belong_to)
+        # 多召回一些候选，融合后再截断为更小、更准的上下文
+        candidate_k = max(top_k, Settings.RETRIEVAL_CANDIDATE_K)
+
+        # 2. 稠密检索与 BM25 检索并行执行（复制上下文，使线程内的耗时计入当前请求）
+        dense_future = retrieval_pool.submit(
+            contextvars.copy_context().run, self._dense_search, query, expr, candidate_k, query_vector
+        )
+        sparse_future = retrieval_pool.submit(
+            contextvars.copy_context().run, self._sparse_search, query, candidate_k, self.visible_owners(belong_to)
+        )
+        dense_results = dense_future.result()
+        sparse_hits = sparse_future.result()
+
+        # 3. 融合结果（开启重排序时多保留一些候选交给交叉编码器）
+        fuse_k = max(top_k, Settings.RERANK_TOP_N) if self.reranker else top_k
+        with stage_timer("fusion"):
+            retrieved_docs = self.fuse_results(dense_results, sparse_hits, query_keyword, top_k=fuse_k)
+
+        # 4. 重排序并截断上下文（候选数、丢弃数与耗时由 reranker 计入指标）
+        if self.reranker:
+            with stage_timer("rerank"):
+                retrieved_docs, _ = self.reranker.rerank(query, retrieved_docs, top_k=top_k)
         return retrieved_docs
 
+    def batch_retrieve(self, queries: list, top_k=5, belong_to: int = 0) -> list:
+        """
+        只检索不生成：批量编码，稠密检索按表达式合并为少量 Milvus 调用，BM25 与融合逐条在本地完成
+        :param queries: 字符串，或 {"query", "top_k", "belong_to"} 形式的 dict（覆盖默认参数）
+        :return: 与 queries 对齐的 [{"query", "retrieved_docs"}]
+        """
+        items = [q if isinstance(q, dict) else {"query": q} for q in queries]
+        texts = [item["query"] for item in items]
+        top_ks = [int(item.get("top_k", top_k)) for item in items]
+        owners = [int(item.get("belong_to", belong_to)) for item in items]
+        candidate_ks = [max(k, Settings.RETRIEVAL_CANDIDATE_K) for k in top_ks]
+
+        with stage_timer("embedding"):
+            query_vectors = self.tokenizer.encode_batch(texts)
+        dense_future = retrieval_pool.submit(
+            contextvars.copy_context().run, self._dense_batch_search, query_vectors, owners, candidate_ks
+        )
+        with stage_timer("keyword_extraction"):
+            keywords = [self.ChineseTokenizer.extract_keywords_without_weight(text) for text in texts]
+        with stage_timer("bm25_search"):
+            sparse_hits = [self.bm25.search(text, top_k=k, belong_to=self.visible_owners(owner))
+                           for text, k, owner in zip(texts, candidate_ks, owners)]
+        dense_results = dense_future.result()
+
+        with stage_timer("fusion"):
+            fuse_ks = [max(k, Settings.RERANK_TOP_N) if self.reranker else k for k in top_ks]
+            fused_list = [self._fuse([dense], sparse, query_keywords, k)
+                          for dense, sparse, query_keywords, k in zip(dense_results, sparse_hits, keywords, fuse_ks)]
+            self._fill_missing_fields(fused_list)
+            docs_list = [self._collect_docs(*fused) for fused in fused_list]
+
+        if self.reranker:
+            with stage_timer("rerank"):
+                docs_list = [self.reranker.rerank(text, docs, top_k=k)[0]
+                             for text, docs, k in zip(texts, docs_list, top_ks)]
+        return [{"query": text, "retrieved_docs": docs} for text, docs in zip(texts, docs_list)]
+
+    def _dense_batch_search(self, query_vectors: list, owners: list, top_ks: list):
+        with stage_timer("milvus_search"):
+            return self.milvus_client.batch_search(
+                query_vectors, top_k=top_ks, expr=[self.build_expression(owner) for owner in owners],
+                collection_name=self.collection_name,
+            )
+
+    def encode_query(self, query: str):
+        with stage_timer("embedding"):
+            return self.tokenizer.encode(query)
+
+    def _dense_search(self, query: str, expr: str, top_k: int, query_vector=None):
+        if query_vector is None:
+            query_vector = self.encode_query(query)
+        with stage_timer("milvus_search"):
+            return self.milvus_client.hybrid_search(query_vector=query_vector, expr=expr, top_k=top_k,
+                                                    collection_name=self.collection_name)
+
+    def _sparse_search(self, query: str, top_k: int, belong_to: list):
+        with stage_timer("bm25_search"):
+            return self.bm25.search(query, top_k=top_k, belong_to=belong_to)
+
     async def hybrid_search(self, query: str, top_k=5, belong_to: int = 0):
-        retrieved_docs = self.hybrid_retrieve(query, top_k=top_k, belong_to=belong_to)
+        query_vector = self.encode_query(query)
+        scope = self.cache_scope(belong_to=belong_to, top_k=top_k)
+        cached = self.cache_lookup(scope, query_vector)
+        if cached:
+            return cached
+
+        retrieved_docs = self.hybrid_retrieve(query, top_k=top_k, belong_to=belong_to, query_vector=query_vector)
 
-        answer = await self.generate_answer(query, retrieved_docs)
+        answer = await self.generate_answer(query, retrieved_docs, query_vector=query_vector)
 
+        self.cache_store(scope, query, query_vector, answer, retrieved_docs)
         return {
             "answer": answer,
             "retrieved_docs": retrieved_docs
         }
 
-    def build_expression(self, keywords: list, belong_to: int = 0 ):
-        """构建查询表达式"""
-        expressions = []
-
-        if keywords:
-            keyword_exprs = [f"keywords like '%{kw}%'" for kw in keywords]
-            expressions.append(f"({' or '.join(keyword_exprs)})")
-
-        if belong_to == 0:
-            expressions.append("belong_to == 0")
-        else:
-            expressions.append(f"belong_to == {belong_to} or belong_to == 0")  # 包含公共数据
-        return " and ".join(expressions) if expressions else ""
-
-    def fuse_results(self, results: list, query_keywords: list, vector_weight: float, keyword_weight: float):
+    def cache_scope(self, belong_to=None, top_k: int = None):
+        if not self.semantic_cache:
+            return None
+        return self.semantic_cache.scope(self.collection_name, belong_to, self.LLMService, top_k)
+
+    def cache_lookup(self, scope: str, query_vector):
+        """语义缓存查询，Redis 不可用时视为未命中"""
+        if not self.semantic_cache:
+            return None
+        try:
+            with stage_timer("cache_lookup"):
+                cached = self.semantic_cache.lookup(scope, query_vector)
+        except Exception as e:
+            print(f"语义缓存查询失败: {str(e)}")
+            return None
+        if cached:
+            print(f"----------semantic cache hit: {cached['similarity']:.4f} {cached['query']}")
+            return {
+                "answer": cached["answer"],
+                "retrieved_docs": cached["retrieved_docs"]
+            }
+        return None
+
+    def cache_store(self, scope: str, query: str, query_vector, answer, retrieved_docs: list):
+        if not self.semantic_cache or not answer:
+            return
+        try:
+            self.semantic_cache.store(scope, query, query_vector, answer, retrieved_docs)
+        except Exception as e:
+            print(f"语义缓存写入失败: {str(e)}")
+
+    @staticmethod
+    def visible_owners(belong_to: int = 0) -> list:
+        """当前用户可见的数据归属：公共数据 + 用户私有数据"""
+        return [0] if belong_to == 0 else [0, belong_to]
+
+    def build_expression(self, belong_to: int = 0):
+        """
+        构建查询表达式（关键词召回由 BM25 索引负责，不再使用 like 扫描）
+        belong_to 为分区键，in 表达式让 Milvus 只检索公共数据与该用户所在的分区
+        """
+        return f"belong_to in {self.visible_owners(belong_to)}"  # 包含公共数据
+
+    def fuse_results(self, dense_results: list, sparse_hits: list, query_keywords: list, top_k: int = 5):
         """融合向量和关键词检索结果"""
-        fused = []
-        # 第一轮: 处理向量检索结果
-        for hits in results:
-            for hit in hits:
-                entity_fields = hit.fields
-                vector_score = hit.score
-
-                content = entity_fields.get("content", "")
-                keywords = entity_fields.get("keywords", [])
-
-                # 计算关键词匹配分数
-                keyword_score = self.calculate_keyword_score(
-                    keywords,
-                    query_keywords
-                )
-
-                # 计算混合分数
-                hybrid_score = (vector_weight * vector_score +
-                                keyword_weight * keyword_score)
-
-                # 构建结果对象
-                result = {
-                    "id": hit.get("id"),
-                    "content": content,
-                    "file_name": entity_fields.get("file_name"),
-                    "belong_to": entity_fields.get("belong_to"),
-                    "vector_score": vector_score,
-                    "keyword_score": keyword_score,
-                    "hybrid_score": hybrid_score,
-                    "matched_keywords": list(set(query_keywords) &
-                                             set(keywords.split(',')))
-                }
-                fused.append(result)
-
-        return fused
+        fused = self._fuse(dense_results, sparse_hits, query_keywords, top_k)
+        self._fill_missing_fields([fused])
+        return self._collect_docs(*fused)
+
+    def _fuse(self, dense_results: list, sparse_hits: list, query_keywords: list, top_k: int):
+        """:return: (候选池, 融合排序结果)"""
+        pool = CandidatePool()
+        for hits in dense_results:
+            for rank, hit in enumerate(hits):
+                entity_fields = dict(hit.fields, id=hit.get("id"))
+                key = (entity_fields.get("file_name"), entity_fields.get("chunk_index"))
+                pool.add_dense(key, hit.score, rank, entity_fields)
+        for rank, hit in enumerate(sparse_hits):
+            pool.add_sparse((hit["file_name"], hit["chunk_index"]), hit["score"], rank)
+        # 稠密分数是距离还是相似度取决于集合索引的度量
+        metric = self.milvus_client.metric_type(self.collection_name)
+        return pool, self.fusion_engine.fuse(pool, query_keywords, top_k, metric=metric)
+
+    def _fill_missing_fields(self, fused_list: list):
+        """BM25 独有的命中只对最终入选的候选从向量库取回内容，多条查询合并为一次请求"""
+        missing = {
+            pool.keys[item["slot"]]
+            for pool, fused in fused_list for item in fused if not pool.fields[item["slot"]]
+        }
+        if not missing:
+            return
+        for row in self.milvus_client.fetch_chunks(sorted(missing), collection_name=self.collection_name):
+            for pool, _ in fused_list:
+                pool.set_fields((row["file_name"], row["chunk_index"]), row)
 
-    def calculate_keyword_score(self,doc_keywords: str, query_keywords: list) -> float:
-        """计算关键词匹配分数"""
-        if not doc_keywords or not query_keywords:
-            return 0.0
+    def _collect_docs(self, pool: CandidatePool, fused: list) -> list:
+        retrieved_docs = []
+        for item in fused:
+            entity_fields = pool.fields[item["slot"]]
+            if not entity_fields:
+                continue  # 索引与向量库暂未同步
+            retrieved_docs.append(self._build_doc(entity_fields, item))
+        return retrieved_docs
 
-        doc_kw_list = doc_keywords.split(',')
-        matched_count = len(set(query_keywords) & set(doc_kw_list))
-        return matched_count / len(query_keywords)
+    @staticmethod
+    def _build_doc(entity_fields: dict, fused: dict) -> dict:
+        return {
+            "id": entity_fields.get("id"),
+            "content": entity_fields.get("content", ""),
+            "file_name": entity_fields.get("file_name"),
+            "chunk_index": entity_fields.get("chunk_index"),
+            "belong_to": entity_fields.get("belong_to"),
+            "vector_score": fused["vector_score"],
+            "bm25_score": fused["bm25_score"],
+            "keyword_score": fused["keyword_score"],
+            "hybrid_score": fused["hybrid_score"],
+            "matched_keywords": fused["matched_keywords"]
+        }
 
     async def stream_output(self, query: str, top_k=5, user_id: int = 0):
-        # 1. 检索相关文档
-        retrieved_docs = self.hybrid_retrieve(query, top_k=top_k, belong_to=user_id)
+        # 1. 检索相关文档，查询向量同时用于意图识别
+        query_vector = self.encode_query(query)
+        retrieved_docs = self.hybrid_retrieve(query, top_k=top_k, belong_to=user_id, query_vector=query_vector)
         # 2. 返回文档
         doc_payload = {
             "type": "docs",
@@ -174,7 +315,8 @@ class RAGService:
         # 3. 流式生成内容
         async for chunk in self.llm_service.stream_generate(
                 prompt=query,
-                retrieved_docs=retrieved_docs
+                retrieved_docs=retrieved_docs,
+                query_vector=query_vector
         ):
             # 内容数据包
             content_payload = {
@@ -0,0 +1,76 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from app.config import Settings
+from app.core.retrieval.BM25Retriever import BM25Retriever
+from app.core.retrieval.rerank import CrossEncoderReranker
+from app.pipelines.tokenizer import get_chinese_tokenizer
+from app.services.semantic_cache import SemanticCache
+
+# 稠密检索与 BM25 检索并行执行使用的线程池
+retrieval_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+
+_bm25_retrievers = {}
+_bm25_lock = threading.Lock()
+
+
+def get_bm25_retriever(collection_name: str) -> BM25Retriever:
+    """每个集合一份 BM25 索引，进程内共享"""
+    retriever = _bm25_retrievers.get(collection_name)
+    if retriever is None:
+        with _bm25_lock:
+            retriever = _bm25_retrievers.get(collection_name)
+            if retriever is None:
+                retriever = BM25Retriever(
+                    index_dir=os.path.join(Settings.BM25_INDEX_DIR, collection_name),
+                    tokenize=get_chinese_tokenizer().tokenize_for_index,
+                )
+                _bm25_retrievers[collection_name] = retriever
+    return retriever
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker():
+    """未开启 RERANK_ENABLED 时返回 None"""
+    global _reranker
+    if not Settings.RERANK_ENABLED:
+        return None
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                from app.services.embedding import model_registry
+
+                _reranker = CrossEncoderReranker(
+                    model_registry.get_cross_encoder(Settings.RERANK_MODEL),
+                    max_candidates=Settings.RERANK_TOP_N,
+                    score_threshold=Settings.RERANK_SCORE_THRESHOLD,
+                    token_budget=Settings.RERANK_TOKEN_BUDGET,
+                )
+    return _reranker
+
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """未开启 SEMANTIC_CACHE_ENABLED 时返回 None"""
+    global _semantic_cache
+    if not Settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache(
+                    current_app.extensions['redis'],
+                    threshold=Settings.SEMANTIC_CACHE_THRESHOLD,
+                    ttl=Settings.SEMANTIC_CACHE_TTL,
+                    max_entries=Settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                )
+    return _semantic_cache
@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+import uuid
+
+import numpy as np
+
+
+def _to_str(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class SemanticCache:
+    """
+    基于 Redis 的语义答案缓存：问题向量与已缓存问题的余弦相似度超过阈值即视为命中
+
+    键结构（prefix 默认为 semcache）：
+    - {prefix}:{scope}:vectors   hash，entry_id -> float32 向量字节
+    - {prefix}:{scope}:expiry    zset，entry_id -> 过期时间戳，用于 TTL 清理与容量淘汰
+    - {prefix}:{scope}:version   每次写入/删除自增，进程内向量矩阵据此判断是否需要刷新
+    - {prefix}:entry:{entry_id}  答案与检索结果的 JSON，带 TTL
+    - {prefix}:{collection}:file:{file_name}  引用了该文件的条目，删除文件时据此失效
+    scope 由集合、belong_to、LLM 与 top_k 共同决定，不同用户的私有数据、不同检索条数的答案不会串用
+    """
+
+    def __init__(self, redis, threshold: float = 0.92, ttl: int = 86400, max_entries: int = 1000,
+                 prefix: str = "semcache"):
+        self.redis = redis
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prefix = prefix
+        # scope -> (version, entry_ids, 归一化向量矩阵)
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def scope(collection_name: str, belong_to=None, provider: str = "", top_k: int = None) -> str:
+        owner = "all" if belong_to is None else int(belong_to)
+        return f"{collection_name}:{owner}:{provider}:{'' if top_k is None else int(top_k)}"
+
+    def _key(self, *parts) -> str:
+        return ":".join([self.prefix, *parts])
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    # ------------------------------------------------------------------ 查询
+    def _load_matrix(self, scope: str):
+        version = _to_str(self.redis.get(self._key(scope, "version"))) or "0"
+        snapshot = self._snapshots.get(scope)
+        if snapshot is not None and snapshot[0] == version:
+            return snapshot[1], snapshot[2]
+
+        raw = self.redis.hgetall(self._key(scope, "vectors"))
+        entry_ids = [_to_str(entry_id) for entry_id in raw]
+        if entry_ids:
+            matrix = np.stack([np.frombuffer(vector, dtype=np.float32) for vector in raw.values()])
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        with self._lock:
+            self._snapshots[scope] = (version, entry_ids, matrix)
+        return entry_ids, matrix
+
+    def lookup(self, scope: str, query_vector):
+        """:return: 命中时返回缓存的 dict（含 similarity），否则返回 None"""
+        self._expire(scope)
+        entry_ids, matrix = self._load_matrix(scope)
+        if not entry_ids:
+            return None
+
+        query = self._normalize(query_vector)
+        if matrix.shape[1] != len(query):
+            return None  # 换了嵌入模型，旧条目不可比
+        similarities = matrix @ query
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < self.threshold:
+            return None
+
+        payload = self.redis.get(self._key("entry", entry_ids[best]))
+        if payload is None:
+            # 条目已过期但索引尚未清理
+            self._remove(scope, [entry_ids[best]])
+            return None
+        result = json.loads(payload)
+        result["similarity"] = similarity
+        return result
+
+    # ------------------------------------------------------------------ 写入
+    def store(self, scope: str, query: str, query_vector, answer, retrieved_docs: list):
+        entry_id = uuid.uuid4().hex
+        collection_name = scope.split(":", 1)[0]
+        file_names = {doc.get("file_name") or doc.get("name") for doc in retrieved_docs} - {None}
+        payload = {
+            "query": query,
+            "answer": answer,
+            "retrieved_docs": retrieved_docs,
+            "doc_ids": [doc.get("id") for doc in retrieved_docs],
+            "scope": scope,
+            "file_names": sorted(file_names),
+            "created_at": time.time(),
+        }
+
+        pipe = self.redis.pipeline()
+        pipe.set(self._key("entry", entry_id), json.dumps(payload, ensure_ascii=False, default=str), ex=self.ttl)
+        pipe.hset(self._key(scope, "vectors"), entry_id, self._normalize(query_vector).tobytes())
+        pipe.zadd(self._key(scope, "expiry"), {entry_id: time.time() + self.ttl})
+        for file_name in file_names:
+            file_key = self._key(collection_name, "file", file_name)
+            pipe.sadd(file_key, f"{scope}|{entry_id}")
+            pipe.expire(file_key, self.ttl)
+        pipe.incr(self._key(scope, "version"))
+        pipe.execute()
+
+        # 超出容量时淘汰最早过期的条目
+        overflow = self.redis.zcard(self._key(scope, "expiry")) - self.max_entries
+        if overflow > 0:
+            oldest = self.redis.zrange(self._key(scope, "expiry"), 0, overflow - 1)
+            self._remove(scope, [_to_str(entry_id) for entry_id in oldest])
+        return entry_id
+
+    # ------------------------------------------------------------------ 失效
+    def _expire(self, scope: str):
+        expired = self.redis.zrangebyscore(self._key(scope, "expiry"), 0, time.time())
+        if expired:
+            self._remove(scope, [_to_str(entry_id) for entry_id in expired])
+
+    def _remove(self, scope: str, entry_ids: list):
+        if not entry_ids:
+            return
+        pipe = self.redis.pipeline()
+        pipe.hdel(self._key(scope, "vectors"), *entry_ids)
+        pipe.zrem(self._key(scope, "expiry"), *entry_ids)
+        pipe.delete(*[self._key("entry", entry_id) for entry_id in entry_ids])
+        pipe.incr(self._key(scope, "version"))
+        pipe.execute()
+
+    def invalidate_file(self, collection_name: str, file_name: str) -> int:
+        """删除引用了该文件的全部缓存条目，返回删除的条目数"""
+        file_key = self._key(collection_name, "file", file_name)
+        by_scope = {}
+        for member in self.redis.smembers(file_key):
+            scope, entry_id = _to_str(member).rsplit("|", 1)
+            by_scope.setdefault(scope, []).append(entry_id)
+        for scope, entry_ids in by_scope.items():
+            self._remove(scope, entry_ids)
+        self.redis.delete(file_key)
+        removed = sum(len(entry_ids) for entry_ids in by_scope.values())
+        if removed:
+            print(f"ℹ️ 已失效 {removed} 条引用 {file_name} 的语义缓存")
+        return removed
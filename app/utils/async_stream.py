@@ -0,0 +1,68 @@
+import asyncio
+import contextlib
+import queue
+import threading
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def iterate_async(agen_factory, app=None):
+    """
+    在后台线程的事件循环中运行异步生成器，并以同步生成器的形式逐项产出。
+    WSGI 可以边生成边写出；消费方关闭生成器（如客户端断开）时取消上游任务。
+    :param agen_factory: 返回异步生成器的无参函数
+    :param app: Flask 应用，传入时在后台线程中推入应用上下文
+    """
+    items = queue.Queue()
+    loop = asyncio.new_event_loop()
+
+    async def _pump():
+        try:
+            async for item in agen_factory():
+                items.put(item)
+        except Exception as e:
+            items.put(_Failure(e))
+        finally:
+            items.put(_DONE)
+
+    started = threading.Event()
+    holder = {}
+
+    def _run_loop():
+        asyncio.set_event_loop(loop)
+        with app.app_context() if app is not None else contextlib.nullcontext():
+            task = loop.create_task(_pump())
+            holder['task'] = task
+            started.set()
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                pass
+            finally:
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                loop.close()
+
+    threading.Thread(target=_run_loop, daemon=True).start()
+    started.wait()
+
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        task = holder['task']
+        if not task.done():
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                # 事件循环已关闭，任务已经结束
+                pass
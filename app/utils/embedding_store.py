@@ -0,0 +1,226 @@
+"""
+持久化的文本向量存储：按 模型 + 文本哈希 复用已经计算过的向量
+
+重建集合、运行 data/build 下的导入脚本或把同一批书导入另一个集合时，相同的文本不再重复编码。
+每个模型一个目录：
+- vectors.f32  追加写入的 float32 矩阵（行优先，无文件头），读取时以 np.memmap 映射，不整体载入内存
+- index.bin    追加写入的定长记录：32 字节 sha256(文本) + 8 字节行号（小端 int64）
+- meta.json    模型名与向量维度
+
+写入顺序为先向量后索引，进程中途退出最多留下没有索引的孤立行（由 compact() 清理）与不完整的尾部，
+下一次写入在文件锁内先把两个文件截断到整行 / 整条记录，行号始终与文件偏移对齐；
+同一文本被多个进程重复写入时以最后一条索引为准。
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows 上只做进程内加锁
+    fcntl = None
+
+_DIGEST_BYTES = 32
+_RECORD = np.dtype([("digest", f"S{_DIGEST_BYTES}"), ("row", "<i8")])
+
+
+def text_digest(text: str) -> bytes:
+    """按原文计算哈希：空白或全半角不同的文本向量也可能不同，不做归一化"""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def _model_dirname(model_name: str) -> str:
+    return re.sub(r"[^\w.\-]+", "__", model_name)
+
+
+class EmbeddingStore:
+    def __init__(self, root: str, model_name: str, dim: int):
+        self.model_name = model_name
+        self.dim = dim
+        self.path = os.path.join(root, _model_dirname(model_name))
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.index_path = os.path.join(self.path, "index.bin")
+        self._row_bytes = dim * 4
+        self._index = {}
+        self._index_offset = 0
+        self._matrix = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.path, exist_ok=True)
+        meta_path = os.path.join(self.path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["dim"] != dim:
+                raise ValueError(f"向量存储 {self.path} 的维度为 {meta['dim']}，与模型维度 {dim} 不一致")
+        else:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model_name": model_name, "dim": dim}, f, ensure_ascii=False)
+        for path in (self.vectors_path, self.index_path):
+            open(path, "ab").close()
+        self._refresh()
+
+    def __len__(self):
+        return len(self._index)
+
+    # ------------------------------------------------------------------ 读取
+    def _refresh(self):
+        """读取其他进程追加的索引记录；不完整的尾部记录留到下次再读"""
+        size = os.path.getsize(self.index_path)
+        usable = (size - self._index_offset) // _RECORD.itemsize * _RECORD.itemsize
+        if usable <= 0:
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read(usable)
+        # 直接按字节切出哈希：numpy 的 S 类型取值时会去掉末尾的 \x00
+        step = _RECORD.itemsize
+        for i, row in enumerate(np.frombuffer(data, dtype=_RECORD)["row"].tolist()):
+            self._index[data[i * step:i * step + _DIGEST_BYTES]] = row
+        self._index_offset += usable
+
+    def _rows(self, rows: int) -> np.ndarray:
+        """返回至少包含 rows 行的只读映射，文件增长后重新映射"""
+        if self._matrix is None or len(self._matrix) < rows:
+            total = os.path.getsize(self.vectors_path) // self._row_bytes
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(total, self.dim))
+        return self._matrix
+
+    def lookup(self, digests: list) -> list:
+        """:return: 与 digests 对齐的列表，命中为向量（np.ndarray），未命中为 None"""
+        with self._lock:
+            if any(digest not in self._index for digest in digests):
+                self._refresh()
+            rows = [self._index.get(digest) for digest in digests]
+            found = [row for row in rows if row is not None]
+            matrix = self._rows(max(found) + 1) if found else None
+            result = [None if row is None else np.array(matrix[row]) for row in rows]
+        hits = len(found)
+        self.hits += hits
+        self.misses += len(digests) - hits
+        return result
+
+    # ------------------------------------------------------------------ 写入
+    def _locked_files(self):
+        vectors = open(self.vectors_path, "ab")
+        index = open(self.index_path, "ab")
+        if fcntl is not None:
+            fcntl.flock(index.fileno(), fcntl.LOCK_EX)
+        return vectors, index
+
+    def put_many(self, digests: list, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if not digests:
+            return
+        with self._lock:
+            vectors_file, index_file = self._locked_files()
+            try:
+                # 持有文件锁后的整行数即为本批起始行号，先截掉中途退出留下的不完整尾部
+                first_row = os.fstat(vectors_file.fileno()).st_size // self._row_bytes
+                vectors_file.truncate(first_row * self._row_bytes)
+                index_records = os.fstat(index_file.fileno()).st_size // _RECORD.itemsize
+                index_file.truncate(index_records * _RECORD.itemsize)
+                vectors_file.write(vectors.tobytes())
+                vectors_file.flush()
+                os.fsync(vectors_file.fileno())
+                records = np.empty(len(digests), dtype=_RECORD)
+                records["digest"] = digests
+                records["row"] = np.arange(first_row, first_row + len(digests))
+                index_file.write(records.tobytes())
+                index_file.flush()
+            finally:
+                index_file.close()
+                vectors_file.close()
+            self._refresh()
+
+    def get_or_compute(self, texts: list, compute) -> np.ndarray:
+        """
+        已存储的文本直接读取，其余调用 compute(缺失文本列表) 编码后写入存储
+        :return: 与 texts 对齐的 (n, dim) float32 矩阵
+        """
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        digests = [text_digest(text) for text in texts]
+        cached = self.lookup(digests)
+        vectors = np.empty((len(texts), self.dim), dtype=np.float32)
+        missing = {}
+        for i, (digest, vector) in enumerate(zip(digests, cached)):
+            if vector is None:
+                missing.setdefault(digest, []).append(i)
+            else:
+                vectors[i] = vector
+        if missing:
+            # 同一批中重复的文本只编码一次
+            first = [positions[0] for positions in missing.values()]
+            computed = np.asarray(compute([texts[i] for i in first]), dtype=np.float32).reshape(-1, self.dim)
+            for positions, vector in zip(missing.values(), computed):
+                vectors[positions] = vector
+            self.put_many(list(missing), computed)
+        return vectors
+
+    # ------------------------------------------------------------------ 压缩
+    def compact(self) -> dict:
+        """
+        只保留索引引用的行（去掉重复写入与孤立行），按索引顺序重写两个文件后原子替换
+        行号会变化，需在没有其他进程使用该存储时执行（见 data/build/compact_embedding_store.py）
+        :return: {"rows_before", "rows_after", "bytes_before", "bytes_after"}
+        """
+        with self._lock:
+            vectors_file, index_file = self._locked_files()
+            try:
+                self._index, self._index_offset = {}, 0
+                self._refresh()
+                bytes_before = os.path.getsize(self.vectors_path)
+                rows_before = bytes_before // self._row_bytes
+                matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows_before, self.dim)) \
+                    if rows_before else np.zeros((0, self.dim), dtype=np.float32)
+
+                digests = list(self._index)
+                records = np.empty(len(digests), dtype=_RECORD)
+                records["digest"] = digests
+                records["row"] = np.arange(len(digests))
+                with open(self.vectors_path + ".tmp", "wb") as f:
+                    for start in range(0, len(digests), 4096):
+                        rows = [self._index[digest] for digest in digests[start:start + 4096]]
+                        f.write(np.ascontiguousarray(matrix[rows]).tobytes())
+                with open(self.index_path + ".tmp", "wb") as f:
+                    f.write(records.tobytes())
+                del matrix
+                self._matrix = None
+                os.replace(self.vectors_path + ".tmp", self.vectors_path)
+                os.replace(self.index_path + ".tmp", self.index_path)
+                self._index = {digest: row for row, digest in enumerate(digests)}
+                self._index_offset = records.nbytes
+            finally:
+                index_file.close()
+                vectors_file.close()
+        return {
+            "rows_before": rows_before,
+            "rows_after": len(digests),
+            "bytes_before": bytes_before,
+            "bytes_after": len(digests) * self._row_bytes,
+        }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(model_name: str, dim: int):
+    """未开启 EMBEDDING_STORE_ENABLED 时返回 None"""
+    # 延迟导入，data/build 下的脚本可以不依赖应用配置直接使用 EmbeddingStore
+    from app.config import Settings
+
+    if not Settings.EMBEDDING_STORE_ENABLED:
+        return None
+    key = (model_name, dim)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = EmbeddingStore(Settings.EMBEDDING_STORE_DIR, model_name, dim)
+        return _stores[key]
@@ -1,5 +1,11 @@
+import os
+import threading
 from enum import Enum
 
+import numpy as np
+
+from app.config import Settings
+
 # 意图类型
 class InterviewIntent(Enum):
     TECHNICAL = "technical"                # 技术意图
@@ -17,6 +23,14 @@ INTENT_DESCRIPTIONS = {
     InterviewIntent.GENERAL: "通用意图，适用于无法明确分类的情况。"
 }
 
+# 意图关键词，既用于解析 LLM 返回结果，也作为本地分类器的种子标注
+INTENT_KEYWORDS = {
+    InterviewIntent.TECHNICAL: ["TECHNICAL", "技术", "代码", "原理", "优化", "设计模式"],
+    InterviewIntent.PROCESS: ["PROCESS", "流程", "步骤", "时间安排", "HR技巧"],
+    InterviewIntent.INTERACTIVE: ["INTERACTIVE", "交互", "追问", "反馈", "对话"],
+    InterviewIntent.ANALYSIS: ["ANALYSIS", "分析", "对比", "案例"]
+}
+
 # 意图分类服务
 class IntentClassificationService:
     def __init__(self, provider: str = 'deepseek'):
@@ -36,19 +50,11 @@ class IntentClassificationService:
         response = await self.llm_service.simple_generate(prompt)
         intent_str = response.strip().upper()
         
-        # 使用文本相似度匹配意图
-        intent_keywords = {
-            InterviewIntent.TECHNICAL: ["TECHNICAL", "技术", "代码", "原理", "优化", "设计模式"],
-            InterviewIntent.PROCESS: ["PROCESS", "流程", "步骤", "时间安排", "HR技巧"],
-            InterviewIntent.INTERACTIVE: ["INTERACTIVE", "交互", "追问", "反馈", "对话"],
-            InterviewIntent.ANALYSIS: ["ANALYSIS", "分析", "对比", "案例"]
-        }
-        
         # 计算匹配分数
         best_intent = InterviewIntent.GENERAL  # 默认意图
         best_score = 0
         
-        for intent, keywords in intent_keywords.items():
+        for intent, keywords in INTENT_KEYWORDS.items():
             # 计算关键词匹配分数
             score = sum(1 for keyword in keywords if keyword in intent_str)
             if score > best_score:
@@ -66,4 +72,104 @@ class IntentClassificationService:
             return InterviewIntent.ANALYSIS
         
         # 如果没有直接匹配，返回基于关键词的最佳匹配
-        return best_intent
\ No newline at end of file
+        return best_intent
+
+
+class LocalIntentClassifier:
+    """基于 bge 向量的最近质心分类器，质心由 data/build/train_intent_classifier.py 离线训练"""
+
+    def __init__(self, centroids_path: str = Settings.INTENT_CENTROIDS_PATH):
+        artifact = np.load(centroids_path)
+        self.intents = [InterviewIntent(label) for label in artifact["labels"]]
+        self.centroids = artifact["centroids"].astype(np.float32)
+        self.temperature = float(artifact["temperature"])
+        self.model_name = str(artifact["model_name"])
+        self._model = None
+
+    @property
+    def model(self):
+        """只在调用方没有传入查询向量时才需要加载编码模型"""
+        if self._model is None:
+            from app.services.embedding import get_embedding_model
+
+            self._model = get_embedding_model(self.model_name)
+        return self._model
+
+    def predict(self, text: str, query_vector=None):
+        """
+        :param query_vector: 已计算好的查询向量（可选），避免重复编码
+        :return: (意图, 置信度)
+        """
+        if query_vector is None or len(query_vector) != self.centroids.shape[1]:
+            # 检索端的向量来自其他模型时按质心的模型重新编码
+            query_vector = self.model.encode(text, normalize_embeddings=True)
+        vector = np.asarray(query_vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+
+        # 余弦相似度经温度缩放后 softmax，取最高概率作为置信度
+        logits = self.centroids @ vector / self.temperature
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        best = int(np.argmax(probs))
+        return self.intents[best], float(probs[best])
+
+
+_local_classifier = None
+_local_classifier_lock = threading.Lock()
+# 最近一次回退到 LLM 的原因与加载失败的质心文件版本，相同的原因只打印一次，文件未变化时不重复加载
+_fallback_reason = None
+_failed_mtime = None
+
+
+def _fallback(reason: str):
+    global _fallback_reason
+    if reason != _fallback_reason:
+        print(f"❗{reason}，意图识别回退到 LLM（可运行 python -m data.build.train_intent_classifier 生成质心）")
+        _fallback_reason = reason
+    return None
+
+
+def get_local_intent_classifier():
+    """
+    懒加载本地分类器，质心文件不存在或加载失败时返回 None（回退到 LLM 分类）
+    失败不会永久缓存：之后生成或更新的质心文件在下一次调用时加载，无需重启进程
+    """
+    global _local_classifier, _fallback_reason, _failed_mtime
+    if _local_classifier is not None:
+        return _local_classifier
+    with _local_classifier_lock:
+        if _local_classifier is not None:
+            return _local_classifier
+        path = Settings.INTENT_CENTROIDS_PATH
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return _fallback(f"未找到意图质心文件 {path}")
+        if mtime == _failed_mtime:
+            return None
+        try:
+            _local_classifier = LocalIntentClassifier(path)
+        except Exception as e:
+            _failed_mtime = mtime
+            return _fallback(f"意图质心文件 {path} 加载失败: {str(e)}")
+        _fallback_reason = _failed_mtime = None
+        print(f"ℹ️ 已加载本地意图分类器 {path}（{len(_local_classifier.intents)} 个意图）")
+        return _local_classifier
+
+
+class HybridIntentClassifier:
+    """优先使用本地分类器，置信度不足时才调用 LLM"""
+
+    def __init__(self, provider: str = 'deepseek', threshold: float = Settings.INTENT_CONFIDENCE_THRESHOLD):
+        self.provider = provider
+        self.threshold = threshold
+
+    async def classify_intent(self, text: str, query_vector=None) -> InterviewIntent:
+        local_classifier = get_local_intent_classifier()
+        if local_classifier is not None:
+            intent, confidence = local_classifier.predict(text, query_vector=query_vector)
+            if confidence >= self.threshold:
+                return intent
+            print(f"本地意图置信度 {confidence:.2f} 低于阈值，回退到 LLM 分类")
+
+        return await IntentClassificationService(self.provider).classify_intent(text)
@@ -0,0 +1,167 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# 覆盖 jieba / Milvus 的毫秒级耗时到 LLM 的数十秒耗时
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Histogram:
+    """Prometheus 风格的累积直方图，按标签取值分组"""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签取值 -> [各桶计数（不累积，最后一个为 +Inf）, 总和, 总数]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in sorted(snapshot):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(dict(labels, le=le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Counter:
+    """Prometheus 风格的单调递增计数器，按标签取值分组"""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for key, value in snapshot:
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._gauge_collectors = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, documentation, labelnames, buckets)
+            return self._histograms[name]
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        with self._lock:
+            if name not in self._counters:
+                self._counters[name] = Counter(name, documentation, labelnames)
+            return self._counters[name]
+
+    def register_gauges(self, name: str, documentation: str, collect):
+        """
+        :param collect: 无参函数，返回 [(标签 dict, 数值)]，在每次导出时调用
+        """
+        self._gauge_collectors.append((name, documentation, collect))
+
+    def render(self) -> str:
+        lines = []
+        for histogram in list(self._histograms.values()):
+            lines.extend(histogram.render())
+        for counter in list(self._counters.values()):
+            lines.extend(counter.render())
+        for name, documentation, collect in self._gauge_collectors:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} gauge")
+            try:
+                samples = collect()
+            except Exception as e:
+                print(f"指标采集失败 {name}: {str(e)}")
+                continue
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+STAGE_SECONDS = metrics_registry.histogram(
+    "rag_stage_duration_seconds", "RAG 请求各阶段耗时（秒）", labelnames=("stage",)
+)
+
+# 当前请求的分阶段耗时，未开启时为 None
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> dict:
+    """开始记录当前请求的分阶段耗时，返回的 dict 会在各阶段结束时写入（毫秒）"""
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def current_timings():
+    return _request_timings.get()
+
+
+def record_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 2)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
@@ -0,0 +1,121 @@
+"""
+启动耗时统计与重量级组件的延迟加载
+
+模型、Milvus 连接等组件以 LazyExtension 注册到 app.extensions，首次使用时才构造，
+CLI 命令、数据库迁移与测试不再需要加载模型或连接外部服务；
+生产 worker 可开启 WARMUP_ON_START 或在进程启动钩子中调用 warmup(app) 提前加载。
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from app.utils.metrics import metrics_registry
+
+
+class BootReport:
+    """记录进程启动各步骤与各组件的初始化耗时"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps = {}
+        self.components = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = time.perf_counter() - start
+
+    def record_component(self, name: str, seconds: float):
+        with self._lock:
+            self.components[name] = seconds
+
+    def print_report(self, extensions: dict = None):
+        elapsed = time.perf_counter() - self.started
+        lines = [f"ℹ️ 应用启动完成，耗时 {elapsed:.2f}s"]
+        lines += [f"   - {name}: {seconds:.3f}s" for name, seconds in self.steps.items()]
+        for name, extension in (extensions or {}).items():
+            if isinstance(extension, LazyExtension):
+                if extension.lazy_loaded:
+                    lines.append(f"   - {name}: 已加载 {self.components.get(name, 0):.3f}s")
+                else:
+                    lines.append(f"   - {name}: 首次使用时加载")
+        print("\n".join(lines))
+
+
+boot_report = BootReport()
+
+metrics_registry.register_gauges(
+    "component_load_seconds", "启动步骤与组件的初始化耗时（秒）",
+    lambda: [({"component": name}, round(seconds, 4))
+             for name, seconds in list(boot_report.steps.items()) + list(boot_report.components.items())],
+)
+
+
+class LazyExtension:
+    """
+    延迟构造的扩展：首次访问属性时调用 factory 构造真实对象，之后的属性访问全部转发给它
+    代理自身的属性都以 _ 或 lazy_ 开头，避免遮挡真实对象的同名属性
+    """
+
+    def __init__(self, name: str, factory):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def lazy_loaded(self) -> bool:
+        return self._instance is not None
+
+    def lazy_resolve(self):
+        if self._instance is None:
+            with self._lock:
+                # 双重检查，并发的首次请求只构造一次
+                if self._instance is None:
+                    start = time.perf_counter()
+                    instance = self._factory()
+                    seconds = time.perf_counter() - start
+                    boot_report.record_component(self._name, seconds)
+                    print(f"ℹ️ 组件 {self._name} 初始化完成，耗时 {seconds:.2f}s")
+                    self._instance = instance
+        return self._instance
+
+    def __getattr__(self, item):
+        if item in ("_name", "_factory", "_instance", "_lock"):
+            # 尚未初始化（如 copy / pickle 重建对象时），避免无限递归
+            raise AttributeError(item)
+        return getattr(self.lazy_resolve(), item)
+
+    def __repr__(self):
+        state = repr(self._instance) if self._instance is not None else "未加载"
+        return f"<LazyExtension {self._name}: {state}>"
+
+
+_warmup_tasks = []
+
+
+def register_warmup(name: str, task):
+    """登记除扩展外需要预热的组件，task 为无参函数"""
+    _warmup_tasks.append((name, task))
+
+
+def warmup(app, names=None):
+    """
+    提前构造 app.extensions 中的延迟组件并执行登记的预热任务，用于生产 worker 启动后、接收请求前
+    :param names: 只预热指定的组件，None 表示全部
+    """
+    start = time.perf_counter()
+    for name, extension in list(app.extensions.items()):
+        if isinstance(extension, LazyExtension) and (names is None or name in names):
+            extension.lazy_resolve()
+    for name, task in _warmup_tasks:
+        if names is None or name in names:
+            task_start = time.perf_counter()
+            with app.app_context():
+                task()
+            boot_report.record_component(name, time.perf_counter() - task_start)
+    print(f"ℹ️ 预热完成，耗时 {time.perf_counter() - start:.2f}s")
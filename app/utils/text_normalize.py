@@ -0,0 +1,15 @@
+import hashlib
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """NFKC 归一化（全角转半角等）并合并连续空白，用作缓存键与内容指纹"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def content_hash(text: str) -> str:
+    """归一化文本的 sha256，空白或全半角差异不影响结果"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
@@ -0,0 +1,15 @@
+import re
+
+# 中日韩字符按 1 个 token 计；连续的字母数字约 4 个字符 1 个 token；其余非空白符号各计 1 个
+_TOKEN_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿豈-﫿]|[A-Za-z0-9_]+|[^\sA-Za-z0-9_]")
+
+
+def count_tokens(text: str) -> int:
+    """估算文本的 LLM token 数（不依赖具体模型的分词器）"""
+    if not text:
+        return 0
+    total = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        is_word = piece[0].isascii() and (piece[0].isalnum() or piece[0] == "_")
+        total += (len(piece) + 3) // 4 if is_word else 1
+    return total
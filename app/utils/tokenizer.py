@@ -1,9 +1,49 @@
 # app/utils/tokenizer.py
-from sentence_transformers import SentenceTransformer
+from app.config import Settings
+from app.services.embedding import get_embedding_model, model_registry
+from app.services.embedding_cache import get_query_embedding_cache
+from app.utils.text_normalize import normalize_text
+
 
 class Tokenizer:
     def __init__(self, model_name="sentence-transformers/paraphrase-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+        # 模型由进程级注册表共享，不再每次请求重新加载
+        self.model = get_embedding_model(model_name)
+        self.batcher = None
+        if Settings.EMBEDDING_BATCH_WINDOW_MS > 0:
+            self.batcher = model_registry.get_batching_encoder(
+                model_name,
+                max_batch_size=Settings.EMBEDDING_MAX_BATCH_SIZE,
+                window_ms=Settings.EMBEDDING_BATCH_WINDOW_MS,
+            )
+        self.cache = get_query_embedding_cache()
 
     def encode(self, text)-> list:
-        return self.model.encode(text)
\ No newline at end of file
+        if not isinstance(text, str):
+            return self.model.encode(text)
+        if self.cache is not None:
+            return self.cache.get_or_encode(self.model.fingerprint, text, self._encode_query)
+        return self._encode_query(text)
+
+    def _encode_query(self, text: str):
+        # 单条查询交给合并队列，与其他并发请求一起批量计算
+        if self.batcher is not None:
+            return self.batcher.encode(text)
+        return self.model.encode(text)
+
+    def encode_batch(self, texts: list, batch_size: int = 64) -> list:
+        """批量编码查询：缓存命中的直接返回，其余在一次 encode 中按长度分批计算"""
+        vectors = [None] * len(texts)
+        if self.cache is not None:
+            for i, text in enumerate(texts):
+                vectors[i] = self.cache.get(self.model.fingerprint, text)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # 与 get_or_encode 一致，写入缓存的向量由缓存键对应的归一化文本编码
+            inputs = [normalize_text(texts[i]) if self.cache is not None else texts[i] for i in missing]
+            encoded = self.model.encode(inputs, batch_size=batch_size, convert_to_tensor=False)
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+                if self.cache is not None:
+                    self.cache.put(self.model.fingerprint, texts[i], vector)
+        return vectors
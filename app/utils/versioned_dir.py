@@ -0,0 +1,105 @@
+"""
+多进程共享的磁盘索引目录：每个版本写入独立的子目录，写完后以一次 rename 切换
+
+    root/
+      CURRENT      当前版本的子目录名，写入临时文件后 os.replace，读者看到的要么是旧版本要么是新版本
+      v<序号>/     各版本的全部文件，只写一次，之后只读
+      .lock        写入方的跨进程排他锁（fcntl.flock）
+
+写入方应在 locked() 内完成 "加载最新版本 → 修改 → publish()"，避免多个进程互相覆盖。
+旧版本保留最近 KEEP_VERSIONS 个，正在读取旧版本的进程不会读到被删除的文件（Linux 下已 mmap 的文件删除后仍可访问）。
+"""
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 上只做进程内加锁
+    fcntl = None
+
+_VERSION = re.compile(r"^v(\d+)$")
+
+
+class VersionedDir:
+    POINTER = "CURRENT"
+    KEEP_VERSIONS = 2
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._lock_file = None
+
+    def current_version(self):
+        """:return: 当前版本名，尚未发布过时为 None"""
+        try:
+            with open(os.path.join(self.root, self.POINTER), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current_path(self, legacy_marker: str = None):
+        """
+        :param legacy_marker: 早期直接写在 root 下的索引的标志文件，没有 CURRENT 时按旧布局读取 root
+        :return: 当前版本的目录，不存在时为 None
+        """
+        version = self.current_version()
+        if version:
+            return os.path.join(self.root, version)
+        if legacy_marker and os.path.exists(os.path.join(self.root, legacy_marker)):
+            return self.root
+        return None
+
+    @contextmanager
+    def locked(self):
+        """跨进程排他锁，同一线程内可重入"""
+        with self._lock:
+            if self._depth == 0:
+                os.makedirs(self.root, exist_ok=True)
+                self._lock_file = open(os.path.join(self.root, ".lock"), "a")
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._lock_file.close()  # 关闭文件即释放 flock
+                    self._lock_file = None
+
+    def publish(self, write) -> str:
+        """
+        :param write: write(path)，把新版本的全部文件写入 path
+        :return: 新版本名
+        """
+        with self.locked():
+            current = self.current_version()
+            matched = _VERSION.match(current or "")
+            version = f"v{int(matched.group(1)) + 1 if matched else 1}"
+            tmp_path = os.path.join(self.root, version + ".tmp")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+            write(tmp_path)
+            os.rename(tmp_path, os.path.join(self.root, version))
+
+            pointer = os.path.join(self.root, self.POINTER)
+            with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+                f.write(version)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(pointer + ".tmp", pointer)
+            self._prune(version)
+        return version
+
+    def _prune(self, current: str):
+        """删除较旧的版本与中断留下的临时目录"""
+        versions = sorted((int(m.group(1)), name) for name in os.listdir(self.root)
+                          for m in [_VERSION.match(name)] if m)
+        stale = [name for _, name in versions[:-self.KEEP_VERSIONS] if name != current]
+        stale += [name for name in os.listdir(self.root) if name.endswith(".tmp") and name != self.POINTER + ".tmp"]
+        for name in stale:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
@@ -0,0 +1,77 @@
+"""
+批量检索吞吐基准：逐条循环 与 批量接口 在同一批查询上的对比
+- embedding：逐条 encode vs 一次批量 encode（绕过查询向量缓存）
+- milvus：MilvusClient.hybrid_search 逐条 vs batch_search
+- 检索全流程（编码 + 稠密 + BM25 + 融合）：RAGService.hybrid_retrieve 逐条 vs batch_retrieve
+
+需要应用配置与可用的 Milvus。
+用法: python -m data.build.bench_batch_search [--queries 500] [--collection java_doc_plus] [--file queries.txt]
+"""
+import argparse
+import time
+
+from app.main import create_app
+
+
+def load_queries(milvus_client, collection_name: str, count: int, path: str = None) -> list:
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()][:count]
+    # 未提供查询文件时，以集合中分块的开头作为查询
+    rows = milvus_client.get_collection(collection_name).query(
+        expr="chunk_index >= 0", output_fields=["content"], limit=count)
+    return [row["content"][:64] for row in rows if row["content"].strip()]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def report(name: str, count: int, loop_seconds: float, batch_seconds: float):
+    print(f"{name:<10} 逐条 {count / loop_seconds:8.1f} 条/s ({loop_seconds:6.2f}s)   "
+          f"批量 {count / batch_seconds:8.1f} 条/s ({batch_seconds:6.2f}s)   加速比 {loop_seconds / batch_seconds:5.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量检索吞吐基准")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--collection", default="java_doc_plus")
+    parser.add_argument("--file", help="查询文件，每行一条")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        from app.services.rag import RAGService
+
+        rag_service = RAGService(collection_name=args.collection)
+        milvus_client = rag_service.milvus_client
+        queries = load_queries(milvus_client, args.collection, args.queries, args.file)
+        print(f"集合 {args.collection}，{len(queries)} 条查询，top_k={args.top_k}")
+
+        # 预热模型、集合与 BM25 索引
+        rag_service.batch_retrieve(queries[:8], top_k=args.top_k)
+        model = rag_service.tokenizer.model
+        loop = timed(lambda: [model.encode(query) for query in queries])
+        batch = timed(lambda: model.encode(queries, batch_size=64))
+        report("embedding", len(queries), loop, batch)
+
+        vectors = rag_service.tokenizer.encode_batch(queries)
+        expr = rag_service.build_expression(0)
+
+        loop = timed(lambda: [milvus_client.hybrid_search(vector, expr, top_k=args.top_k,
+                                                          collection_name=args.collection) for vector in vectors])
+        batch = timed(lambda: milvus_client.batch_search(vectors, top_k=args.top_k, expr=expr,
+                                                         collection_name=args.collection))
+        report("milvus", len(queries), loop, batch)
+
+        # 开启查询向量缓存时，上面的 encode_batch 已写入缓存，这里比较的主要是检索与融合
+        loop = timed(lambda: [rag_service.hybrid_retrieve(query, top_k=args.top_k) for query in queries])
+        batch = timed(lambda: rag_service.batch_retrieve(queries, top_k=args.top_k))
+        report("retrieval", len(queries), loop, batch)
+
+
+if __name__ == "__main__":
+    main()
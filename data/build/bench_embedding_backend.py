@@ -0,0 +1,147 @@
+"""
+句向量后端基准：对比 PyTorch 与 ONNX int8 的吞吐、单条延迟与常驻内存，并可在集合上检查召回
+
+每个后端在独立子进程中运行，RSS 互不影响。
+用法: python -m data.build.bench_embedding_backend [--texts 2000] [--queries 200]
+      python -m data.build.bench_embedding_backend --recall --collection java_doc_plus [--top-k 10]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from app.services.embedding import DEFAULT_EMBEDDING_MODEL, get_embedding_model
+
+PHRASES = [
+    "HashMap 在负载因子超过阈值时扩容，扩容后重新计算每个节点的桶位置",
+    "JVM 通过可达性分析判断对象是否存活，GC Roots 包括栈帧中的局部变量",
+    "ArrayList 基于动态数组，随机访问快；LinkedList 基于双向链表，插入删除快",
+    "synchronized 是 JVM 层面的锁，ReentrantLock 支持公平锁与可中断的获取",
+    "进程是资源分配的单位，线程是调度的单位，线程切换不需要切换地址空间",
+    "The JVM garbage collector reclaims unreachable objects in the young generation first.",
+]
+
+
+def build_texts(count: int, seed: int = 0) -> list:
+    """长度从几个字到数百字不等的合成文本，接近真实分块的长度分布"""
+    rng = np.random.default_rng(seed)
+    texts = []
+    for i in range(count):
+        repeat = int(rng.integers(1, 8))
+        texts.append(f"第{i}段：" + "；".join(PHRASES[int(j)] for j in rng.integers(0, len(PHRASES), repeat)))
+    return texts
+
+
+def rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return float("nan")
+    # Linux 下 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_backend(backend: str, model_name: str, texts: int, queries: int, batch_size: int) -> dict:
+    start = time.perf_counter()
+    model = get_embedding_model(model_name, backend=backend)
+    load_seconds = time.perf_counter() - start
+    corpus = build_texts(texts)
+    model.encode(corpus[:batch_size], batch_size=batch_size)  # 预热
+
+    start = time.perf_counter()
+    model.encode(corpus, batch_size=batch_size)
+    throughput = len(corpus) / (time.perf_counter() - start)
+
+    latencies = []
+    for query in build_texts(queries, seed=1):
+        query = query[:64]
+        start = time.perf_counter()
+        model.encode(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "backend": model.backend,
+        "load_seconds": round(load_seconds, 2),
+        "texts_per_second": round(throughput, 1),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "latency_p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "max_rss_mb": round(rss_mb(), 1),
+    }
+
+
+def check_recall(model_name: str, collection_name: str, queries: int, top_k: int):
+    """以 PyTorch 查询向量在集合上的 top_k 为基准，计算 ONNX 查询向量检索结果的重合率"""
+    from pymilvus import Collection, connections
+
+    from app.config import Settings
+
+    connections.connect(uri=Settings.MILVUS_URL, token=Settings.MILVUS_TOKEN)
+    collection = Collection(collection_name)
+    collection.load()
+    # 用集合中分块的开头作为查询，覆盖库内真实的主题分布
+    rows = collection.query(expr="chunk_index >= 0", output_fields=["content"], limit=queries)
+    query_texts = [row["content"][:64] for row in rows if row["content"].strip()]
+
+    torch_vectors = get_embedding_model(model_name, backend="torch").encode(query_texts)
+    onnx_model = get_embedding_model(model_name, backend="onnx")
+    if onnx_model.backend != "onnx":
+        raise SystemExit("EMBEDDING_ONNX_DIR 下没有该模型的导出，请先运行 data.build.export_onnx_embedding")
+    onnx_vectors = onnx_model.encode(query_texts)
+
+    search_params = {"metric_type": "L2", "params": {"nprobe": 10}}
+
+    def search(vectors):
+        results = collection.search(data=[v.tolist() for v in vectors], anns_field="chunk_embedding",
+                                    param=search_params, limit=top_k)
+        return [set(hit.id for hit in hits) for hits in results]
+
+    recalls = [len(expected & actual) / max(1, len(expected))
+               for expected, actual in zip(search(torch_vectors), search(onnx_vectors))]
+    cosine = (torch_vectors * onnx_vectors).sum(axis=1) / (
+        np.linalg.norm(torch_vectors, axis=1) * np.linalg.norm(onnx_vectors, axis=1))
+    print(f"集合 {collection_name}：{len(query_texts)} 条查询，recall@{top_k} = {np.mean(recalls):.4f}"
+          f"（最低 {np.min(recalls):.2f}），查询向量余弦相似度 最小 {cosine.min():.5f} 平均 {cosine.mean():.5f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="句向量后端基准")
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--backends", nargs="*", default=["torch", "onnx"])
+    parser.add_argument("--texts", type=int, default=2000, help="吞吐测试的文本条数")
+    parser.add_argument("--queries", type=int, default=200, help="单条延迟测试的查询数")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--recall", action="store_true", help="在 Milvus 集合上检查召回（需要应用配置）")
+    parser.add_argument("--collection", default="java_doc_plus")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.recall:
+        check_recall(args.model, args.collection, args.queries, args.top_k)
+        return
+    if args.child:
+        print(json.dumps(run_backend(args.child, args.model, args.texts, args.queries, args.batch_size)))
+        return
+
+    results = []
+    for backend in args.backends:
+        output = subprocess.run(
+            [sys.executable, "-m", "data.build.bench_embedding_backend", "--child", backend,
+             "--model", args.model, "--texts", str(args.texts), "--queries", str(args.queries),
+             "--batch-size", str(args.batch_size)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    baseline = results[0]
+    for result in results:
+        print(f"{result['backend']:<6} 加载 {result['load_seconds']:6.2f}s  "
+              f"吞吐 {result['texts_per_second']:8.1f} 条/s（{result['texts_per_second'] / baseline['texts_per_second']:.2f}x）  "
+              f"单条 p50 {result['latency_p50_ms']:6.2f}ms p99 {result['latency_p99_ms']:6.2f}ms  "
+              f"RSS {result['max_rss_mb']:7.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
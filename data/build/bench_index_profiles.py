@@ -0,0 +1,182 @@
+"""
+向量索引配置基准：在同一份向量与查询集上，对比各索引配置的 recall@k（以暴力检索为基准）、单条检索延迟与索引内存
+
+从源集合复制向量到临时集合 bench_<配置名>，按配置建索引、load 后逐条回放查询；
+--sweep 在同一个索引上扫描一个检索参数（如 ef=16,32,64,128），便于选择召回与延迟的折中点。
+需要应用配置与可用的 Milvus；DISKANN 需要 Milvus 开启磁盘索引，失败时跳过该配置。
+用法: python -m data.build.bench_index_profiles [--collection java_doc_plus] [--profiles ivf_flat ivf_sq8 hnsw diskann]
+      [--queries 500] [--top-k 10] [--file queries.txt] [--sweep ef=16,32,64,128] [--keep]
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections, utility
+
+from app.config import Settings
+from app.db.index_profiles import INDEX_PROFILES, index_params, resolve_index_profile, search_params
+from app.services.embedding import DEFAULT_EMBEDDING_MODEL, get_embedding_model
+
+INSERT_BATCH = 2000
+
+
+def load_corpus(collection_name: str, max_vectors: int):
+    """:return: (主键数组, 向量矩阵, 分块内容)"""
+    collection = Collection(collection_name)
+    iterator = collection.query_iterator(batch_size=INSERT_BATCH, expr="chunk_index >= 0",
+                                         output_fields=["id", "chunk_embedding", "content"])
+    ids, vectors, contents = [], [], []
+    try:
+        while len(ids) < max_vectors:
+            rows = iterator.next()
+            if not rows:
+                break
+            for row in rows:
+                ids.append(row["id"])
+                vectors.append(row["chunk_embedding"])
+                contents.append(row["content"])
+    finally:
+        iterator.close()
+    return (np.asarray(ids[:max_vectors], dtype=np.int64), np.asarray(vectors[:max_vectors], dtype=np.float32),
+            contents[:max_vectors])
+
+
+def load_queries(contents: list, count: int, model_name: str, path: str = None, seed: int = 0) -> np.ndarray:
+    if path:
+        with open(path, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()][:count]
+    else:
+        # 未提供查询文件时，以随机分块的开头作为查询
+        rng = np.random.default_rng(seed)
+        picks = rng.choice(len(contents), size=min(count, len(contents)), replace=False)
+        texts = [contents[i][:64] for i in picks if contents[i].strip()]
+    return np.asarray(get_embedding_model(model_name).encode(texts), dtype=np.float32)
+
+
+def brute_force_topk(corpus: np.ndarray, queries: np.ndarray, top_k: int, metric: str) -> np.ndarray:
+    """:return: 每条查询的前 top_k 个语料下标，按 metric 精确计算"""
+    if metric == "L2":
+        # |q - x|^2 = |x|^2 - 2 q·x + |q|^2，最后一项不影响同一查询内的排序
+        scores = -((corpus ** 2).sum(axis=1)[None, :] - 2 * queries @ corpus.T)
+    else:
+        if metric == "COSINE":
+            corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+            queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = queries @ corpus.T
+    top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    return top
+
+
+def recall_at_k(expected: list, actual: list) -> float:
+    """每条查询 |命中 ∩ 真实近邻| / |真实近邻| 的平均值"""
+    return float(np.mean([len(set(e) & set(a)) / max(1, len(e)) for e, a in zip(expected, actual)]))
+
+
+def build_collection(name: str, ids: np.ndarray, vectors: np.ndarray, profile: dict) -> tuple:
+    """:return: (集合, 建索引与加载耗时)"""
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    schema = CollectionSchema([
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name="chunk_embedding", dtype=DataType.FLOAT_VECTOR, dim=vectors.shape[1]),
+    ], description="索引配置基准临时集合")
+    collection = Collection(name, schema)
+    for start in range(0, len(ids), INSERT_BATCH):
+        collection.insert([ids[start:start + INSERT_BATCH].tolist(), vectors[start:start + INSERT_BATCH].tolist()])
+    collection.flush()
+
+    start = time.perf_counter()
+    collection.create_index("chunk_embedding", index_params(profile))
+    utility.wait_for_index_building_complete(name)
+    collection.load()
+    return collection, time.perf_counter() - start
+
+
+def index_memory_mb(name: str) -> float:
+    """已加载分段占用的内存，按 query node 上报的 mem_size 求和"""
+    segments = utility.get_query_segment_info(name)
+    return sum(segment.mem_size for segment in segments) / 1024 / 1024
+
+
+def replay(collection: Collection, queries: np.ndarray, id_of: dict, top_k: int, params: dict) -> tuple:
+    """逐条检索（nq=1，与线上单条查询一致）:return: (每条查询的语料下标, 延迟毫秒列表)"""
+    collection.search(data=[queries[0].tolist()], anns_field="chunk_embedding", param=params, limit=top_k)  # 预热
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = collection.search(data=[query.tolist()], anns_field="chunk_embedding", param=params, limit=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([id_of[hit.id] for hit in hits[0]])
+    return results, latencies
+
+
+def parse_sweep(sweep: str):
+    """ef=16,32,64 -> ("ef", [16, 32, 64])"""
+    if not sweep:
+        return None, []
+    key, values = sweep.split("=", 1)
+    return key, [json.loads(value) for value in values.split(",")]
+
+
+def report(name: str, profile: dict, recall: float, latencies: list, memory_mb: float, build_seconds: float):
+    print(f"{name:<12} {profile['index_type']:<9} {profile['metric_type']:<6} "
+          f"{json.dumps(profile['search_params']):<22} recall {recall:.4f}  "
+          f"p50 {np.percentile(latencies, 50):6.2f}ms  p99 {np.percentile(latencies, 99):6.2f}ms  "
+          f"内存 {memory_mb:8.1f}MB  建索引 {build_seconds:6.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量索引配置基准")
+    parser.add_argument("--collection", default="java_doc_plus", help="提供向量与查询的源集合")
+    parser.add_argument("--profiles", nargs="*", default=["ivf_flat", "ivf_sq8", "hnsw", "diskann"],
+                        help=f"预置配置名（{', '.join(INDEX_PROFILES)}）或 JSON 形式的完整配置")
+    parser.add_argument("--max-vectors", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--file", help="查询文件，每行一条")
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--sweep", help="在每个索引上扫描一个检索参数，如 ef=16,32,64,128 或 nprobe=8,16,32")
+    parser.add_argument("--keep", action="store_true", help="保留临时集合")
+    args = parser.parse_args()
+
+    connections.connect(uri=Settings.MILVUS_URL, token=Settings.MILVUS_TOKEN)
+    ids, corpus, contents = load_corpus(args.collection, args.max_vectors)
+    queries = load_queries(contents, args.queries, args.model, args.file)
+    id_of = {int(pk): i for i, pk in enumerate(ids)}
+    print(f"集合 {args.collection}：{len(ids)} 条向量（dim={corpus.shape[1]}），{len(queries)} 条查询，top_k={args.top_k}")
+
+    sweep_key, sweep_values = parse_sweep(args.sweep)
+    truths = {}
+    for spec in args.profiles:
+        profile = resolve_index_profile(json.loads(spec) if spec.startswith("{") else spec)
+        name = spec if spec in INDEX_PROFILES else profile["index_type"].lower()
+        if profile["metric_type"] not in truths:
+            truths[profile["metric_type"]] = brute_force_topk(corpus, queries, args.top_k, profile["metric_type"])
+        truth = truths[profile["metric_type"]].tolist()
+
+        collection_name = f"bench_{name}"
+        try:
+            collection, build_seconds = build_collection(collection_name, ids, corpus, profile)
+        except Exception as e:
+            print(f"{name:<12} 建索引失败，跳过：{e}")
+            if utility.has_collection(collection_name):
+                utility.drop_collection(collection_name)
+            continue
+        try:
+            memory_mb = index_memory_mb(collection_name)
+            variants = [profile]
+            if sweep_key and sweep_key in profile["search_params"]:
+                variants = [dict(profile, search_params=dict(profile["search_params"], **{sweep_key: value}))
+                            for value in sweep_values]
+            for variant in variants:
+                actual, latencies = replay(collection, queries, id_of, args.top_k, search_params(variant))
+                report(name, variant, recall_at_k(truth, actual), latencies, memory_mb, build_seconds)
+        finally:
+            if not args.keep:
+                collection.release()
+                utility.drop_collection(collection_name)
+
+
+if __name__ == "__main__":
+    main()
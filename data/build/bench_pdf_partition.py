@@ -0,0 +1,81 @@
+"""
+PDF 并行提取基准：生成多页合成 PDF，对比不同进程数下 extract_pdf_texts 的耗时与加速比
+
+用法: python -m data.build.bench_pdf_partition [--pages 300] [--pages-per-task 20]
+"""
+import argparse
+import io
+import os
+import time
+
+from app.pipelines.pdf_partition import extract_pdf_texts
+
+LINE = "The JVM garbage collector reclaims unreachable objects; HashMap resizes when the load factor is exceeded."
+
+
+def build_synthetic_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    """手写最小 PDF：每页若干行 Helvetica 文本，不依赖额外的 PDF 生成库"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages，等页面对象编号确定后再填
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        text_ops = ["BT /F1 10 Tf 12 TL 50 780 Td"]
+        for line in range(lines_per_page):
+            text_ops.append(f"(Page {page + 1} line {line + 1}: {LINE}) Tj T*")
+        text_ops.append("ET")
+        stream = "\n".join(text_ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % i + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 并行提取基准")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--pages-per-task", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="*", help="要测试的进程数，默认 1,2,4,... 直到 CPU 核数")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({1, cores} | {2 ** i for i in range(1, 8) if 2 ** i < cores})
+    pdf_bytes = build_synthetic_pdf(args.pages)
+    print(f"合成 PDF：{args.pages} 页，{len(pdf_bytes) / 1024:.0f}KB，CPU 核数 {cores}")
+
+    baseline, expected = None, None
+    for workers in worker_counts:
+        # 预热进程池，避免把子进程导入 unstructured 的时间计入
+        extract_pdf_texts(io.BytesIO(build_synthetic_pdf(workers * args.pages_per_task)), workers, args.pages_per_task)
+        start = time.perf_counter()
+        texts = extract_pdf_texts(io.BytesIO(pdf_bytes), workers, args.pages_per_task)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        expected = expected if expected is not None else texts
+        same = "一致" if texts == expected else "不一致"
+        print(f"workers={workers:<3d} 耗时 {elapsed:7.2f}s  加速比 {baseline / elapsed:5.2f}x  "
+              f"元素 {len(texts)}  与单进程结果{same}")
+
+
+if __name__ == "__main__":
+    main()
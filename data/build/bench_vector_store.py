@@ -0,0 +1,112 @@
+"""
+向量库后端基准：把 Milvus 集合导出到进程内 FAISS 向量库，在同一批查询上对比两者的检索延迟与结果重合率，
+用于衡量 Milvus 的 RPC 开销；--export-only 只导出，供 VECTOR_STORE_BACKEND=faiss 的单机部署使用
+
+需要应用配置与可用的 Milvus。
+用法: python -m data.build.bench_vector_store [--collection java_doc_plus] [--queries 500] [--belong-to 0]
+      python -m data.build.bench_vector_store --export-only [--output data/index/faiss]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.main import create_app
+
+EXPORT_BATCH = 2000
+FIELDS = ["content", "file_name", "chunk_index", "keywords", "chunk_embedding", "belong_to"]
+
+
+def export_collection(milvus_client, store, collection_name: str) -> int:
+    """按批读取 Milvus 集合写入 FAISS 向量库（已有的同名集合会被清空），全部写入后一次发布"""
+    iterator = milvus_client.get_collection(collection_name).query_iterator(
+        batch_size=EXPORT_BATCH, expr="chunk_index >= 0", output_fields=FIELDS)
+    total = 0
+    try:
+        with store.writing(collection_name):
+            store.delete_by_ids(list(store.collection(collection_name).row_of), flush=False,
+                                collection_name=collection_name)
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                store.insert([{field: row[field] for field in FIELDS} for row in rows], flush=False,
+                             collection_name=collection_name)
+                total += len(rows)
+    finally:
+        iterator.close()
+    return total
+
+
+def timed_each(fn, items) -> tuple:
+    results, latencies = [], []
+    for item in items:
+        start = time.perf_counter()
+        results.append(fn(item))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+
+def report(name: str, latencies: list, batch_seconds: float, count: int):
+    print(f"{name:<7} 单条 p50 {np.percentile(latencies, 50):7.2f}ms  p99 {np.percentile(latencies, 99):7.2f}ms   "
+          f"批量 {count / batch_seconds:8.1f} 条/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Milvus 与进程内 FAISS 向量库的检索对比")
+    parser.add_argument("--collection", default="java_doc_plus")
+    parser.add_argument("--output", help="FAISS 索引目录，默认 FAISS_INDEX_DIR")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--belong-to", type=int, default=0, help="按该用户可见的数据过滤")
+    parser.add_argument("--export-only", action="store_true")
+    parser.add_argument("--skip-export", action="store_true", help="复用已导出的 FAISS 索引")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        from app.config import Settings
+        from app.db.faiss_store import FaissVectorStore
+        from app.db.milvus_client import MilvusClient
+        from app.services.rag import RAGService
+
+        milvus_client = app.extensions["milvus"].lazy_resolve()
+        if not isinstance(milvus_client, MilvusClient):
+            raise SystemExit("请在 VECTOR_STORE_BACKEND=milvus 下运行")
+        store = FaissVectorStore(args.output or Settings.FAISS_INDEX_DIR,
+                                 metric_type=milvus_client.metric_type(args.collection))
+        if not args.skip_export:
+            start = time.perf_counter()
+            total = export_collection(milvus_client, store, args.collection)
+            print(f"已导出 {total} 条分块到 {store.root}，耗时 {time.perf_counter() - start:.1f}s")
+        if args.export_only:
+            return
+
+        rows = milvus_client.get_collection(args.collection).query(
+            expr="chunk_index >= 0", output_fields=["content"], limit=args.queries)
+        queries = [row["content"][:64] for row in rows if row["content"].strip()]
+        rag_service = RAGService(collection_name=args.collection)
+        vectors = rag_service.tokenizer.encode_batch(queries)
+        expr = rag_service.build_expression(args.belong_to)
+        print(f"集合 {args.collection}：FAISS {store.count(args.collection)} 条，{len(vectors)} 条查询，"
+              f"top_k={args.top_k}，过滤 {expr}")
+
+        results = {}
+        for name, backend in (("milvus", milvus_client), ("faiss", store)):
+            backend.hybrid_search(vectors[0], expr, top_k=args.top_k, collection_name=args.collection)  # 预热
+            hits, latencies = timed_each(
+                lambda vector: backend.hybrid_search(vector, expr, top_k=args.top_k,
+                                                     collection_name=args.collection)[0], vectors)
+            start = time.perf_counter()
+            backend.batch_search(vectors, top_k=args.top_k, expr=expr, collection_name=args.collection)
+            report(name, latencies, time.perf_counter() - start, len(vectors))
+            results[name] = [{(hit.get("file_name"), hit.get("chunk_index")) for hit in query_hits}
+                             for query_hits in hits]
+
+        # FAISS 为精确检索，重合率即 Milvus 索引在该集合上的 recall@k
+        overlap = [len(m & f) / max(1, len(f)) for m, f in zip(results["milvus"], results["faiss"])]
+        print(f"结果重合率 {np.mean(overlap):.4f}（最低 {np.min(overlap):.2f}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+从 Milvus 集合全量重建 BM25 倒排索引
+
+用法: python -m data.build.build_bm25_index [--collection java_doc_plus]
+"""
+import argparse
+import os
+
+from pymilvus import Collection, connections
+
+from app.config import Settings
+from app.core.retrieval.BM25Retriever import BM25Retriever
+from app.pipelines.tokenizer import get_chinese_tokenizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重建 BM25 索引")
+    parser.add_argument("--collection", default="java_doc_plus")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    connections.connect(uri=Settings.MILVUS_URL, token=Settings.MILVUS_TOKEN)
+    collection = Collection(args.collection)
+    collection.load()
+
+    index_dir = os.path.join(Settings.BM25_INDEX_DIR, args.collection)
+    retriever = BM25Retriever(index_dir=index_dir, tokenize=get_chinese_tokenizer().tokenize_for_index)
+    iterator = collection.query_iterator(
+        batch_size=args.batch_size,
+        expr="chunk_index >= 0",
+        output_fields=["content", "file_name", "chunk_index", "belong_to"],
+    )
+    total = 0
+    # 持有写锁重建，完成后作为新版本切换，运行中的服务在下次检索时加载
+    with retriever.writing():
+        retriever.clear()
+        while True:
+            batch = iterator.next()
+            if not batch:
+                iterator.close()
+                break
+            retriever.add_documents(batch)
+            total += len(batch)
+            print(f"已索引 {total} 个分块")
+    print(f"BM25 索引已写入 {index_dir}，共 {len(retriever)} 个分块")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+压缩磁盘向量存储：去掉重复写入与没有索引的孤立行，按索引顺序重写文件
+压缩会改变行号，请在应用与导入脚本都停止后执行
+
+用法: python -m data.build.compact_embedding_store [--dir data/embeddings] [--model BAAI/bge-small-zh-v1.5]
+"""
+import argparse
+import json
+import os
+
+from app.utils.embedding_store import EmbeddingStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="压缩磁盘向量存储")
+    parser.add_argument("--dir", default=os.path.join("data", "embeddings"), help="存储根目录（EMBEDDING_STORE_DIR）")
+    parser.add_argument("--model", nargs="*", help="只压缩指定模型，默认压缩目录下的全部模型")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f"目录 {args.dir} 不存在")
+        return
+    for name in sorted(os.listdir(args.dir)):
+        meta_path = os.path.join(args.dir, name, "meta.json")
+        if not os.path.exists(meta_path):
+            continue
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if args.model and meta["model_name"] not in args.model:
+            continue
+        stats = EmbeddingStore(args.dir, meta["model_name"], meta["dim"]).compact()
+        print(f"{meta['model_name']}: {stats['rows_before']} -> {stats['rows_after']} 行，"
+              f"{stats['bytes_before'] / 1024 / 1024:.1f}MB -> {stats['bytes_after'] / 1024 / 1024:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+将 SentenceTransformer 模型导出为 ONNX 并做 int8 动态量化，生成 EMBEDDING_ONNX_DIR 使用的模型目录
+导出后对一组样例文本比较两种后端的向量，余弦相似度低于 COSINE_TOLERANCE 时报错
+
+用法: python -m data.build.export_onnx_embedding [--model BAAI/bge-small-zh-v1.5]
+      [--output data/onnx/bge-small-zh-v1.5-int8] [--per-channel]
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from sentence_transformers import SentenceTransformer
+
+from app.services.onnx_embedding import CONFIG_FILE, COSINE_TOLERANCE, MODEL_FILE, OnnxSentenceEncoder
+
+SAMPLE_TEXTS = [
+    "HashMap 的扩容机制是什么？",
+    "JVM 垃圾回收器如何判断对象是否可以回收",
+    "ArrayList和LinkedList有什么区别？",
+    "synchronized 与 ReentrantLock 的区别",
+    "进程和线程的区别，以及上下文切换的开销",
+    "The JVM garbage collector reclaims unreachable objects.",
+    "虚拟化 CPU：操作系统通过时分共享让每个进程以为自己独占处理器。" * 8,
+    "索引",
+]
+
+
+class _HiddenStateOnly(torch.nn.Module):
+    """只输出 last_hidden_state，池化与归一化在推理端完成"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                          token_type_ids=token_type_ids).last_hidden_state
+
+
+def export(model_name: str, output: str, per_channel: bool = False, opset: int = 14):
+    """:return: (onnx_config, 原 SentenceTransformer 模型)"""
+    os.makedirs(output, exist_ok=True)
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0]
+    pooling = st_model[1].get_pooling_mode_str()
+    if pooling not in ("cls", "mean"):
+        raise ValueError(f"不支持的池化方式 {pooling}")
+    normalize = any(type(module).__name__ == "Normalize" for module in st_model)
+
+    fp32_path = os.path.join(output, "model.fp32.onnx")
+    sample = transformer.tokenizer(["导出样例"], return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"}
+                    for name in ("input_ids", "attention_mask", "token_type_ids", "last_hidden_state")}
+    with torch.no_grad():
+        torch.onnx.export(
+            _HiddenStateOnly(transformer.auto_model.eval()),
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    quantize_dynamic(fp32_path, os.path.join(output, MODEL_FILE), weight_type=QuantType.QInt8,
+                     per_channel=per_channel)
+    os.remove(fp32_path)
+
+    transformer.tokenizer.save_pretrained(output)
+    config = {
+        "model_name": model_name,
+        "dim": st_model.get_sentence_embedding_dimension(),
+        "pooling": pooling,
+        "normalize": normalize,
+        "max_seq_length": st_model.max_seq_length,
+        "quantization": "dynamic-int8-per-channel" if per_channel else "dynamic-int8",
+    }
+    with open(os.path.join(output, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    return config, st_model
+
+
+def check_cosine(st_model, output: str) -> np.ndarray:
+    expected = st_model.encode(SAMPLE_TEXTS, convert_to_tensor=False)
+    actual = OnnxSentenceEncoder(output).encode(SAMPLE_TEXTS)
+    expected = expected / np.linalg.norm(expected, axis=1, keepdims=True)
+    actual = actual / np.linalg.norm(actual, axis=1, keepdims=True)
+    return (expected * actual).sum(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出 int8 量化的 ONNX 句向量模型")
+    parser.add_argument("--model", default="BAAI/bge-small-zh-v1.5")
+    parser.add_argument("--output", default=os.path.join("data", "onnx", "bge-small-zh-v1.5-int8"))
+    parser.add_argument("--per-channel", action="store_true", help="按通道量化，精度更高、模型略大")
+    args = parser.parse_args()
+
+    config, st_model = export(args.model, args.output, args.per_channel)
+    size = os.path.getsize(os.path.join(args.output, MODEL_FILE)) / 1024 / 1024
+    print(f"已导出 {args.output}（{size:.1f}MB）：{config}")
+
+    cosine = check_cosine(st_model, args.output)
+    print(f"与 PyTorch 向量的余弦相似度：最小 {cosine.min():.5f}，平均 {cosine.mean():.5f}")
+    if cosine.min() < COSINE_TOLERANCE:
+        raise SystemExit(f"余弦相似度低于 {COSINE_TOLERANCE}，可尝试 --per-channel")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,15 @@ from pymilvus import Collection, connections
 from typing import List, Dict, Any
 import configparser
 
+from app.config import Settings
+from app.utils.embedding_store import EmbeddingStore
+
 
 class MilvusEmbeddingProcessor:
     def __init__(self,
                  collection_name: str = "java_interview_qa",
-                 embedding_model_name: str = 'paraphrase-MiniLM-L6-v2'):
+                 embedding_model_name: str = 'paraphrase-MiniLM-L6-v2',
+                 embedding_store_dir: str = Settings.EMBEDDING_STORE_DIR):
         cfp = configparser.ConfigParser()
         cfp.read("../config/milvus_config.ini")
         self.milvus_uri = cfp.get('milvus', 'uri')
@@ -20,6 +24,12 @@ class MilvusEmbeddingProcessor:
 
         # 加载嵌入模型
         self.embedding_model = SentenceTransformer('sentence-transformers/paraphrase-MiniLM-L6-v2')
+        # 与应用共用的磁盘向量存储，重复导入相同问题时不再重新编码；传 None 关闭
+        self.embedding_store = None
+        if embedding_store_dir:
+            self.embedding_store = EmbeddingStore(embedding_store_dir,
+                                                  'sentence-transformers/paraphrase-MiniLM-L6-v2',
+                                                  self.embedding_model.get_sentence_embedding_dimension())
 
     def _connect_to_milvus(self):
         """连接到Milvus服务器"""
@@ -64,7 +74,11 @@ class MilvusEmbeddingProcessor:
             嵌入向量列表
         """
         try:
-            embeddings = self.embedding_model.encode(texts, convert_to_tensor=False)
+            if self.embedding_store is not None:
+                embeddings = self.embedding_store.get_or_compute(
+                    texts, lambda missing: self.embedding_model.encode(missing, convert_to_tensor=False))
+            else:
+                embeddings = self.embedding_model.encode(texts, convert_to_tensor=False)
             return [embedding.tolist() for embedding in embeddings]
         except Exception as e:
             print(f"生成嵌入失败: {e}")
@@ -0,0 +1,135 @@
+"""
+把早期按表达式过滤归属的集合迁移为以 belong_to 为分区键的新结构（见 DocumentModel）
+
+分区键的类型与属性在集合创建后不能修改，因此：
+1. 新建 <集合>_pk（belong_to 为 INT64 分区键，索引沿用源集合实际建好的索引）
+2. 按批复制全部分块，主键由 Milvus 重新生成，并记录 (file_name, chunk_index) -> 新主键
+3. 校验条数后等待索引构建完成并 load，源集合改名为 <集合>_legacy，新集合改名为原集合名
+4. 按新主键更新 chunk_hashes 表，增量入库继续按主键删除分块
+迁移期间需暂停入库任务；完成后重启应用进程，使其重新加载集合。确认无误后可用 --drop-legacy 删除旧集合。
+
+用法: python -m data.build.migrate_partition_key [--collection java_doc_plus] [--dry-run] [--drop-legacy]
+"""
+import argparse
+import time
+
+from pymilvus import Collection, connections, utility
+
+from app.db.index_profiles import collection_index_profile, index_params, reconcile_with_index
+from app.main import create_app
+from app.models.document import DocumentModel
+
+COPY_BATCH = 2000
+COPY_FIELDS = ["chunk_embedding", "content", "file_name", "chunk_index", "keywords", "belong_to"]
+
+
+def create_target(name: str, source: Collection) -> Collection:
+    if utility.has_collection(name):
+        utility.drop_collection(name)  # 上次中断留下的半成品
+    target = Collection(name=name, schema=DocumentModel.create_schema(), num_partitions=DocumentModel.NUM_PARTITIONS)
+    profile = collection_index_profile(source.name)
+    built = next((index.params for index in source.indexes if index.field_name == "chunk_embedding"), None)
+    if built:
+        profile = reconcile_with_index(profile, built)
+        profile["params"] = built.get("params", profile["params"])
+    target.create_index(field_name="chunk_embedding", index_params=index_params(profile))
+    print(f"ℹ️ 已创建 {name}：{DocumentModel.NUM_PARTITIONS} 个分区，索引 {profile['index_type']}/{profile['metric_type']}")
+    return target
+
+
+def count_rows(collection: Collection) -> int:
+    """num_entities 包含尚未压缩掉的已删除数据，这里统计实际可查询的条数"""
+    return collection.query(expr="", output_fields=["count(*)"], consistency_level="Strong")[0]["count(*)"]
+
+
+def copy_entities(source: Collection, target: Collection) -> dict:
+    """:return: (file_name, chunk_index) -> 新主键"""
+    new_ids = {}
+    iterator = source.query_iterator(batch_size=COPY_BATCH, expr="chunk_index >= 0", output_fields=COPY_FIELDS)
+    start = time.perf_counter()
+    try:
+        while True:
+            rows = iterator.next()
+            if not rows:
+                break
+            result = target.insert([{field: row[field] for field in COPY_FIELDS} for row in rows])
+            for row, pk in zip(rows, result.primary_keys):
+                new_ids[(row["file_name"], int(row["chunk_index"]))] = pk
+            print(f"   已复制 {len(new_ids)} 条，{len(new_ids) / (time.perf_counter() - start):.0f} 条/s")
+    finally:
+        iterator.close()
+    target.flush()
+    return new_ids
+
+
+def update_chunk_hashes(collection_name: str, new_ids: dict) -> tuple:
+    """:return: (已更新行数, 找不到新主键的行数)"""
+    from app.extensions import db
+    from app.models.chunk_hash import ChunkHash
+
+    updated = missing = 0
+    for row in ChunkHash.query.filter_by(collection_name=collection_name).yield_per(1000):
+        pk = new_ids.get((row.file_name, row.chunk_index))
+        if pk is None:
+            missing += 1
+            continue
+        row.milvus_id = pk
+        updated += 1
+    db.session.commit()
+    return updated, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="迁移集合为 belong_to 分区键结构")
+    parser.add_argument("--collection", default="java_doc_plus")
+    parser.add_argument("--dry-run", action="store_true", help="只检查是否需要迁移")
+    parser.add_argument("--drop-legacy", action="store_true", help="删除迁移后保留的 <集合>_legacy")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        from app.config import Settings
+
+        connections.connect(uri=Settings.MILVUS_URL, token=Settings.MILVUS_TOKEN)
+        legacy_name, target_name = f"{args.collection}_legacy", f"{args.collection}_pk"
+        if args.drop_legacy:
+            if utility.has_collection(legacy_name):
+                utility.drop_collection(legacy_name)
+                print(f"ℹ️ 已删除 {legacy_name}")
+            return
+
+        source = Collection(args.collection)
+        if DocumentModel.has_partition_key(source.schema):
+            print(f"ℹ️ 集合 {args.collection} 已按 belong_to 分区，无需迁移")
+            return
+        if utility.has_collection(legacy_name):
+            raise SystemExit(f"{legacy_name} 已存在，请确认上次迁移的结果后用 --drop-legacy 删除")
+        source.load()
+        total = count_rows(source)
+        print(f"集合 {args.collection}：{total} 条分块，需要迁移")
+        if args.dry_run:
+            return
+
+        target = create_target(target_name, source)
+        new_ids = copy_entities(source, target)
+        utility.wait_for_index_building_complete(target_name)
+        target.load()
+        copied = count_rows(target)
+        if copied != total:
+            raise SystemExit(f"复制条数不一致：源 {total}，新集合 {copied}；{target_name} 保留待排查")
+        if len(new_ids) != total:
+            # 早期重复入库留下的同名分块，chunk_hashes 只能对应其中一条
+            print(f"❗有 {total - len(new_ids)} 条分块的 (file_name, chunk_index) 重复")
+
+        source.release()
+        utility.rename_collection(args.collection, legacy_name)
+        utility.rename_collection(target_name, args.collection)
+        print(f"ℹ️ {args.collection} 已切换为分区键结构，旧数据保留在 {legacy_name}")
+
+        updated, missing = update_chunk_hashes(args.collection, new_ids)
+        print(f"ℹ️ chunk_hashes 已更新 {updated} 行" + (f"，{missing} 行在集合中不存在" if missing else ""))
+        print("请重启应用进程以重新加载集合")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+离线训练本地意图分类器（最近质心）
+
+种子标注来自 INTENT_KEYWORDS / INTENT_DESCRIPTIONS 以及下方的模板问句，
+可通过 --extra 追加人工标注的 jsonl 数据（每行 {"text": ..., "intent": "technical"}）。
+
+用法: python -m data.build.train_intent_classifier [--extra labeled.jsonl] [--output path]
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from app.config import Settings
+from app.services.embedding import DEFAULT_EMBEDDING_MODEL, get_embedding_model
+from app.utils.intent_classifier import INTENT_DESCRIPTIONS, INTENT_KEYWORDS, InterviewIntent
+
+TOPICS = ["HashMap", "JVM垃圾回收", "Spring事务", "线程池", "MySQL索引", "Redis缓存", "Kafka", "volatile"]
+
+# 各意图的模板问句，{topic} 会被替换为常见的 Java 面试主题
+SEED_TEMPLATES = {
+    InterviewIntent.TECHNICAL: [
+        "{topic}的底层原理是什么", "{topic}是怎么实现的", "介绍一下{topic}",
+        "{topic}如何进行性能优化", "写一段{topic}相关的代码示例",
+    ],
+    InterviewIntent.PROCESS: [
+        "Java开发的面试一般有几轮", "技术面之后多久会有HR面", "面试前需要准备哪些材料",
+        "HR面通常会问什么问题", "笔试一般考哪些内容", "面试结束后如何跟进结果",
+    ],
+    InterviewIntent.INTERACTIVE: [
+        "你刚才关于{topic}的回答好像不对", "能再详细解释一下刚才说的{topic}吗", "为什么你上面说{topic}是这样的",
+        "我不太理解刚才的回答", "继续追问一下这个问题",
+    ],
+    InterviewIntent.ANALYSIS: [
+        "{topic}和其他方案有什么区别", "{topic}适合什么场景，使用什么方案更好", "对比一下{topic}的几种实现",
+        "分析一个{topic}的线上故障案例", "{topic}的优缺点对比",
+    ],
+    InterviewIntent.GENERAL: [
+        "你好", "谢谢", "你是谁", "今天天气怎么样", "随便聊聊",
+    ],
+}
+
+
+def build_seed_samples():
+    samples = []
+    for intent, templates in SEED_TEMPLATES.items():
+        for template in templates:
+            if "{topic}" in template:
+                samples.extend((template.format(topic=topic), intent) for topic in TOPICS)
+            else:
+                samples.append((template, intent))
+        samples.append((INTENT_DESCRIPTIONS[intent], intent))
+        # 关键词本身也作为种子（跳过英文意图名）
+        samples.extend((kw, intent) for kw in INTENT_KEYWORDS.get(intent, []) if not kw.isascii())
+    return samples
+
+
+def load_extra_samples(path):
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                samples.append((item["text"], InterviewIntent(item["intent"])))
+    return samples
+
+
+def compute_centroids(vectors, labels, intents):
+    centroids = np.stack([vectors[labels == i].mean(axis=0) for i in range(len(intents))])
+    return centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="训练本地意图分类器")
+    parser.add_argument("--extra", help="追加的标注数据 (jsonl)")
+    parser.add_argument("--output", default=Settings.INTENT_CENTROIDS_PATH)
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--temperature", type=float, default=0.05)
+    args = parser.parse_args()
+
+    samples = build_seed_samples()
+    if args.extra:
+        samples.extend(load_extra_samples(args.extra))
+
+    intents = list(InterviewIntent)
+    texts = [text for text, _ in samples]
+    labels = np.array([intents.index(intent) for _, intent in samples])
+
+    model = get_embedding_model(args.model)
+    vectors = np.asarray(model.encode(texts, normalize_embeddings=True, batch_size=64), dtype=np.float32)
+    centroids = compute_centroids(vectors, labels, intents)
+
+    # 留一法评估种子集上的准确率
+    correct = 0
+    for i in range(len(texts)):
+        mask = np.ones(len(texts), dtype=bool)
+        mask[i] = False
+        held_out = compute_centroids(vectors[mask], labels[mask], intents)
+        correct += int(np.argmax(held_out @ vectors[i]) == labels[i])
+    print(f"样本数 {len(texts)}，留一法准确率 {correct / len(texts):.2%}")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    np.savez(
+        args.output,
+        labels=np.array([intent.value for intent in intents]),
+        centroids=centroids,
+        temperature=np.float32(args.temperature),
+        model_name=np.array(args.model),
+    )
+    print(f"意图质心已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
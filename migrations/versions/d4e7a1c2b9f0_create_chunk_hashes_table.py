@@ -0,0 +1,37 @@
+"""create chunk_hashes table
+
+Revision ID: d4e7a1c2b9f0
+Revises: 5b98c8d7094e
+Create Date: 2025-06-20 10:12:41.532907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e7a1c2b9f0'
+down_revision = '5b98c8d7094e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chunk_hashes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('collection_name', sa.String(length=255), nullable=False),
+    sa.Column('file_name', sa.String(length=255), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('milvus_id', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('chunk_hashes', schema=None) as batch_op:
+        batch_op.create_index('ix_chunk_hashes_collection_file', ['collection_name', 'file_name'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chunk_hashes', schema=None) as batch_op:
+        batch_op.drop_index('ix_chunk_hashes_collection_file')
+
+    op.drop_table('chunk_hashes')
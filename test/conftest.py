@@ -0,0 +1,8 @@
+import os
+
+# app.config 在没有 .env 时只读取环境变量，这里为必填项提供测试用的占位值
+for _name in ("DEEPSEEK_API_KEY", "MILVUS_HOST", "MILVUS_URL", "MILVUS_TOKEN", "ACCESS_KEY_ID", "ACCESS_KEY_SECRET",
+              "ENDPOINT_URL", "HUNYUAN_API_KEY", "DATABASE_URI", "LANGSMITH_TRACING", "LANGSMITH_PROJECT",
+              "LANGSMITH_API_KEY", "LANGSMITH_ENDPOINT", "Aliyun_AK_ID", "Aliyun_AK_SECRET", "Aliyun_APP_KEY",
+              "NEO4J_URI", "NEO4J_USERNAME", "NEO4J_PASSWORD", "SECRET_KEY", "REDIS_URL"):
+    os.environ.setdefault(_name, "test")
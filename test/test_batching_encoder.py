@@ -0,0 +1,60 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from app.services.embedding import BatchingEncoder
+
+
+class _StubModel:
+    """第一次 encode 阻塞到 release，期间到达的调用在队列中等待合并"""
+    model_name = "stub"
+
+    def __init__(self):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    @staticmethod
+    def vector(text):
+        return [len(text), ord(text[0])]
+
+    def encode(self, texts, batch_size=None, convert_to_tensor=False):
+        self.batches.append(list(texts))
+        self.started.set()
+        self.release.wait(5)
+        return np.asarray([self.vector(text) for text in texts], dtype=np.float32)
+
+
+def test_concurrent_encode_calls_are_coalesced():
+    model = _StubModel()
+    encoder = BatchingEncoder(model, max_batch_size=4, window_ms=500)
+    results = {}
+
+    def encode(text):
+        results[text] = encoder.encode(text, timeout=5)
+
+    start = time.perf_counter()
+    first = threading.Thread(target=encode, args=("a",))
+    first.start()
+    # 只有一个调用方时立即编码，不等待合并窗口
+    assert model.started.wait(5) and time.perf_counter() - start < 0.25
+
+    texts = ["bb", "ccc", "dddd", "eeeee", "ffffff"]
+    threads = [threading.Thread(target=encode, args=(text,)) for text in texts]
+    for thread in threads:
+        thread.start()
+    while encoder._queue.qsize() < len(texts):
+        time.sleep(0.001)
+    model.release.set()
+    for thread in [first] + threads:
+        thread.join(5)
+
+    # 第一批编码期间排队的调用合并，凑满 max_batch_size 即执行，余下的进入下一批
+    assert [len(batch) for batch in model.batches] == [1, 4, 1]
+    assert sorted(text for batch in model.batches for text in batch) == sorted(["a"] + texts)
+    for text in ["a"] + texts:
+        assert results[text].tolist() == _StubModel.vector(text)
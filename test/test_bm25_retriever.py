@@ -0,0 +1,67 @@
+import pytest
+
+from app.core.retrieval.BM25Retriever import BM25Retriever
+
+
+def whitespace_tokenize(text):
+    return text.lower().split()
+
+
+def build_retriever(index_dir=None):
+    retriever = BM25Retriever(index_dir=index_dir, tokenize=whitespace_tokenize)
+    retriever.add("a.pdf", 0, "hashmap uses buckets and linked lists", belong_to=0)
+    retriever.add("a.pdf", 1, "jvm garbage collection pauses", belong_to=0)
+    retriever.add("b.md", 0, "hashmap resize doubles the table hashmap", belong_to=7)
+    return retriever
+
+
+def test_search_ranks_by_bm25():
+    retriever = build_retriever()
+    hits = retriever.search("hashmap resize", top_k=2)
+    assert [(h["file_name"], h["chunk_index"]) for h in hits] == [("b.md", 0), ("a.pdf", 0)]
+    assert hits[0]["score"] > hits[1]["score"] > 0
+
+
+def test_belong_to_filter_and_delete():
+    retriever = build_retriever()
+    assert [h["file_name"] for h in retriever.search("hashmap", belong_to=[0])] == ["a.pdf"]
+
+    retriever.delete_file("a.pdf")
+    assert len(retriever) == 1
+    assert retriever.search("garbage") == []
+
+
+def test_save_and_reload_keeps_results(tmp_path):
+    retriever = build_retriever(str(tmp_path))
+    retriever.delete("a.pdf", 1)
+    expected = retriever.search("hashmap buckets", top_k=5)
+    retriever.save()
+
+    reloaded = BM25Retriever(index_dir=str(tmp_path), tokenize=whitespace_tokenize)
+    assert reloaded.search("hashmap buckets", top_k=5) == expected
+
+    # 合并后继续增量写入
+    reloaded.add("c.md", 0, "buckets everywhere")
+    assert reloaded.search("buckets", top_k=1)[0]["file_name"] == "c.md"
+
+
+def test_writers_in_two_processes_do_not_overwrite_each_other(tmp_path):
+    # 两个实例相当于两个 worker，各自在 writing() 内修改同一个索引目录
+    first = BM25Retriever(index_dir=str(tmp_path), tokenize=whitespace_tokenize)
+    second = BM25Retriever(index_dir=str(tmp_path), tokenize=whitespace_tokenize)
+    with first.writing():
+        first.add("a.md", 0, "hashmap buckets")
+    with second.writing():
+        second.add("b.md", 0, "hashmap resize")
+    with first.writing():
+        first.delete_file("a.md")
+
+    reader = BM25Retriever(index_dir=str(tmp_path), tokenize=whitespace_tokenize)
+    assert [h["file_name"] for h in reader.search("hashmap")] == ["b.md"]
+    # 每个版本一个目录，只保留最近的几个
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_dir()) == ["v2", "v3"]
+
+    # 不在 writing() 内修改的过期实例不能覆盖其他进程保存的版本
+    second.add("c.md", 0, "stale writer")
+    with pytest.raises(RuntimeError):
+        second.save()
@@ -0,0 +1,37 @@
+from app.pipelines.chunk_hashes import ChunkDiff
+from app.utils.text_normalize import content_hash
+
+
+def test_content_hash_ignores_whitespace_and_width():
+    assert content_hash("HashMap  扩容\n机制") == content_hash("ＨａｓｈＭａｐ 扩容 机制")
+    assert content_hash("HashMap 扩容") != content_hash("HashMap 缩容")
+
+
+def test_chunk_diff_only_reports_changes():
+    old = ["a", "b", "b", "c"]
+    rows = [(i + 100, i, content_hash(text), i + 1000) for i, text in enumerate(old)]
+    diff = ChunkDiff(rows)
+
+    new = ["a", "b", "x", "c", "y"]
+    added = [(text, position) for position, text in enumerate(new) if not diff.match(text, position)[0]]
+
+    assert added == [("x", 2), ("y", 4)]
+    assert diff.unchanged == 3
+    assert diff.moved == []
+    # 重复分块按次数匹配，多出来的一个 "b" 被删除
+    assert [(row[1], row[3]) for row in diff.removed()] == [(2, 1002)]
+
+
+def test_chunk_diff_keeps_document_order():
+    old = ["a", "b", "c"]
+    rows = [(i + 100, i, content_hash(text), i + 1000) for i, text in enumerate(old)]
+    diff = ChunkDiff(rows)
+
+    new = ["x", "a", "c", "b"]
+    added = [(text, position) for position, text in enumerate(new) if not diff.match(text, position)[0]]
+
+    # 新增分块使用其位置，位置变化的分块改写序号，"c" 仍在原位
+    assert added == [("x", 0)]
+    assert [(row[3], position, text) for row, position, text in diff.moved] == [(1000, 1, "a"), (1001, 3, "b")]
+    assert diff.unchanged == 3
+    assert diff.removed() == []
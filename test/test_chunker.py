@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("langchain.text_splitter")
+
+from app.pipelines.chunk import AdvancedChunker, _iter_split_keep_start
+
+
+def build_text():
+    sections = []
+    for i in range(30):
+        sections.append(f"## 第{i}节 HashMap 扩容\n")
+        sections.append("短行。\n" * (i % 7))
+        sections.append("负载因子超过阈值时扩容为原来的两倍！" * (i * 3) + "\n\n")
+        sections.append("```\nmap.put(key, value);\n```\n")
+    return "".join(sections)
+
+
+def test_iter_chunks_matches_split_text():
+    chunker = AdvancedChunker()
+    text = build_text()
+    assert list(chunker.iter_chunks(text.split("\n"))) == chunker.split_text(text)
+    assert list(chunker.iter_chunks([text])) == chunker.split_text(text)
+
+
+def test_split_keep_start_across_blocks():
+    text = "a\n\nb\n\n\nc\n\n"
+    blocks = [text[i:i + 2] for i in range(0, len(text), 2)]
+    assert list(_iter_split_keep_start(blocks, "\n\n")) == ["a", "\n\nb", "\n\n\nc", "\n\n"]
@@ -0,0 +1,34 @@
+from app.core.retrieval.context_packer import ContextPacker, strip_overlap
+
+
+def test_strip_overlap():
+    assert strip_overlap("前文内容，HashMap 的扩容机制", "HashMap 的扩容机制是翻倍") == "是翻倍"
+    assert strip_overlap("完全无关的文本", "另一段内容") == "另一段内容"
+
+
+def test_pack_merges_adjacent_chunks_and_respects_budget():
+    docs = [
+        {"file_name": "a.md", "chunk_index": 1, "content": "HashMap 的扩容机制是翻倍", "hybrid_score": 0.9},
+        {"file_name": "a.md", "chunk_index": 0, "content": "第一块：HashMap 的扩容机制", "hybrid_score": 0.5},
+        {"file_name": "b.md", "chunk_index": 3, "content": "无关的长内容" * 50, "hybrid_score": 0.4},
+    ]
+    text, stats = ContextPacker(token_budget=40).pack(docs)
+    assert text == "第一块：HashMap 的扩容机制是翻倍"
+    assert stats["segments"] == 2
+    assert stats["selected_segments"] == 1
+    assert stats["tokens_saved"] > 0
+
+
+def test_pack_merges_dense_search_docs():
+    # RAGService.retrieve 返回的结构：分数为相似度，带 file_name / chunk_index 与接口使用的 name
+    docs = [
+        {"id": 12, "score": 0.82, "content": "HashMap 的扩容机制是翻倍", "file_name": "a.md", "chunk_index": 4,
+         "name": "a.md"},
+        {"id": 11, "score": 0.75, "content": "第一块：HashMap 的扩容机制", "file_name": "a.md", "chunk_index": 3,
+         "name": "a.md"},
+        {"id": 30, "score": 0.40, "content": "ConcurrentHashMap 分段锁", "file_name": "b.md", "chunk_index": 0,
+         "name": "b.md"},
+    ]
+    text, stats = ContextPacker(token_budget=0).pack(docs)
+    assert text == "第一块：HashMap 的扩容机制是翻倍\nConcurrentHashMap 分段锁"
+    assert stats["segments"] == 2
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pymilvus")
+pytest.importorskip("sentence_transformers")
+
+from app.pipelines.Embedding import EmbeddingGenerator
+from app.utils.embedding_store import EmbeddingStore, text_digest
+
+# 长度互不相同，按长度排序后的编码顺序是确定的
+CHUNKS = ["HashMap 扩容", "a", "ConcurrentHashMap 分段锁", "volatile", "GC Roots 可达性分析", "bb", "JIT"]
+
+
+class _StubModel:
+    """向量只由文本决定，记录每次 encode 的输入与 batch_size"""
+    fingerprint = "stub"
+    dim = 4
+
+    def __init__(self):
+        self.calls = []
+
+    @staticmethod
+    def vector(text):
+        return [len(text), ord(text[0]), ord(text[-1]), sum(map(ord, text)) % 97]
+
+    def encode(self, texts, batch_size=None, convert_to_tensor=False):
+        self.calls.append((list(texts), batch_size))
+        return np.asarray([self.vector(text) for text in texts], dtype=np.float32)
+
+
+def _generator(store=None):
+    generator = EmbeddingGenerator.__new__(EmbeddingGenerator)
+    generator.model = _StubModel()
+    generator.dim = generator.model.dim
+    generator.device = "cpu"
+    generator.store = store
+    return generator
+
+
+def _expected(texts):
+    return np.asarray([_StubModel.vector(text) for text in texts], dtype=np.float32)
+
+
+def _by_length(texts):
+    return sorted(texts, key=len, reverse=True)
+
+
+def test_generate_batch_encodes_sorted_batches_in_input_order():
+    generator = _generator()
+    vectors = generator.generate_batch(CHUNKS, batch_size=3)
+
+    # 每行都是对应输入文本的向量，排序分批后恢复了原始顺序
+    assert np.array_equal(vectors, _expected(CHUNKS))
+    texts = _by_length(CHUNKS)
+    assert generator.model.calls == [(texts[0:3], 3), (texts[3:6], 3), (texts[6:], 1)]
+
+
+def test_generate_batch_only_encodes_missing_texts(tmp_path):
+    stored = ["a", "volatile"]
+    store = EmbeddingStore(str(tmp_path), "stub", 4)
+    store.put_many([text_digest(text) for text in stored], _expected(stored))
+    generator = _generator(store)
+
+    chunks = CHUNKS + ["JIT", "a"]
+    assert np.array_equal(generator.generate_batch(chunks, batch_size=2), _expected(chunks))
+    # 已存储的文本不再编码，重复的文本只编码一次
+    missing = _by_length([text for text in CHUNKS if text not in stored])
+    assert generator.model.calls == [(missing[0:2], 2), (missing[2:4], 2), (missing[4:], 1)]
+
+    generator.model.calls.clear()
+    assert np.array_equal(generator.generate_batch(chunks, batch_size=2), _expected(chunks))
+    assert generator.model.calls == []
+
+
+def test_iter_embeddings_encodes_one_window_at_a_time():
+    generator = _generator()
+    streamed = list(generator.iter_embeddings(iter(CHUNKS), batch_size=2, window=2))
+
+    assert [text for text, _ in streamed] == CHUNKS
+    assert np.array_equal(np.asarray([vector for _, vector in streamed]), _expected(CHUNKS))
+    # 每个窗口 batch_size * window = 4 条文本，窗口内按长度排序后分批
+    first, second = _by_length(CHUNKS[:4]), _by_length(CHUNKS[4:])
+    assert generator.model.calls == [(first[0:2], 2), (first[2:4], 2), (second[0:2], 2), (second[2:], 1)]
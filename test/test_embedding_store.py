@@ -0,0 +1,50 @@
+import numpy as np
+
+from app.utils.embedding_store import EmbeddingStore, text_digest
+
+
+def _fake_encode(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[len(text)] * 4 for text in texts], dtype=np.float32)
+    return encode
+
+
+def test_embedding_store_reuses_vectors_across_instances(tmp_path):
+    calls = []
+    store = EmbeddingStore(str(tmp_path), "BAAI/bge-small-zh-v1.5", 4)
+    vectors = store.get_or_compute(["ab", "abc", "ab"], _fake_encode(calls))
+    assert vectors[:, 0].tolist() == [2, 3, 2]
+    assert calls == [["ab", "abc"]]
+
+    # 新实例（相当于另一个进程）从磁盘读取，只编码新文本
+    reopened = EmbeddingStore(str(tmp_path), "BAAI/bge-small-zh-v1.5", 4)
+    vectors = reopened.get_or_compute(["abc", "abcd"], _fake_encode(calls))
+    assert vectors[:, 0].tolist() == [3, 4]
+    assert calls[1:] == [["abcd"]]
+
+
+def test_embedding_store_compact_drops_duplicate_rows(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "m", 4)
+    store.put_many([text_digest("a"), text_digest("b")], np.zeros((2, 4)))
+    store.put_many([text_digest("a")], np.ones((1, 4)))
+
+    stats = store.compact()
+    assert (stats["rows_before"], stats["rows_after"]) == (3, 2)
+    assert store.lookup([text_digest("a")])[0].tolist() == [1, 1, 1, 1]
+    assert len(EmbeddingStore(str(tmp_path), "m", 4)) == 2
+
+
+def test_embedding_store_truncates_torn_tail(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "m", 4)
+    store.put_many([text_digest("a")], np.ones((1, 4)))
+    # 模拟写入中途退出：向量与索引各留下不完整的尾部
+    with open(store.vectors_path, "ab") as f:
+        f.write(b"\x00" * 6)
+    with open(store.index_path, "ab") as f:
+        f.write(b"\x00" * 10)
+
+    store.put_many([text_digest("b")], np.full((1, 4), 2))
+    reopened = EmbeddingStore(str(tmp_path), "m", 4)
+    assert [vector.tolist() for vector in reopened.lookup([text_digest("a"), text_digest("b")])] == \
+        [[1, 1, 1, 1], [2, 2, 2, 2]]
@@ -0,0 +1,101 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from app.db.faiss_store import FaissVectorStore
+from app.db.vector_store import parse_belong_to
+
+
+def _records(file_name, owner, vectors):
+    return [{"raw_text": f"{file_name}-{i}", "file_name": file_name, "chunk_index": i,
+             "keywords": [("HashMap", 1.0)], "chunk_vector": vector, "user_id": owner}
+            for i, vector in enumerate(vectors)]
+
+
+def test_faiss_store_filters_by_owner_and_persists(tmp_path):
+    store = FaissVectorStore(str(tmp_path), dim=4, metric_type="IP")
+    eye = np.eye(4, dtype=np.float32)
+    store.add_documents(_records("public.md", 0, eye[:2]), flush=False)
+    store.add_documents(_records("private.md", 7, eye[2:]), flush=False)
+    store.flush()
+
+    hits = store.hybrid_search(eye[2], "belong_to == 0", top_k=4)[0]
+    assert {hit.get("file_name") for hit in hits} == {"public.md"}
+    hits = store.hybrid_search(eye[2], "belong_to == 7 or belong_to == 0", top_k=1)[0]
+    assert hits[0].get("content") == "private.md-0" and hits[0].score == 1.0
+
+    # 新实例（相当于另一个进程）从磁盘加载，主键与列保持一致
+    reopened = FaissVectorStore(str(tmp_path), dim=4, metric_type="IP")
+    batch = reopened.batch_search([eye[0], eye[3]], top_k=[1, 2], expr=["belong_to == 0", None])
+    assert [len(hits) for hits in batch] == [1, 2]
+    assert batch[0][0].get("content") == "public.md-0"
+    rows = reopened.fetch_chunks([("private.md", 1)])
+    assert rows[0]["belong_to"] == 7 and rows[0]["keywords"] == "HashMap"
+
+
+def test_faiss_store_deletes_by_file_and_id(tmp_path):
+    store = FaissVectorStore(str(tmp_path), dim=4, metric_type="L2")
+    eye = np.eye(4, dtype=np.float32)
+    ids = store.add_documents(_records("a.md", 0, eye[:3]))
+    store.add_documents(_records("b.md", 0, eye[3:]))
+
+    store.delete_by_ids(ids[:1])
+    store.delete_by_file_name("b.md")
+    assert store.count() == 2
+    hits = store.search(eye[0], top_k=4)[0]
+    assert [hit.get("content") for hit in hits] == ["a.md-1", "a.md-2"]
+    assert FaissVectorStore(str(tmp_path), dim=4, metric_type="L2").count() == 2
+
+
+def test_faiss_store_writers_see_each_other(tmp_path):
+    # 两个实例相当于两个进程，各自写入前都会加载对方发布的版本
+    first = FaissVectorStore(str(tmp_path), dim=4, metric_type="IP")
+    second = FaissVectorStore(str(tmp_path), dim=4, metric_type="IP")
+    eye = np.eye(4, dtype=np.float32)
+    first_ids = first.add_documents(_records("a.md", 0, eye[:2]))
+    second_ids = second.add_documents(_records("b.md", 0, eye[2:]))
+    assert not set(first_ids) & set(second_ids)
+
+    first.delete_by_file_name("a.md")
+    assert second.count() == 2 and first.count() == 2
+    assert sorted(os.listdir(tmp_path / "java_doc_plus")) == [".lock", "CURRENT", "v2", "v3"]
+
+    # 异常退出时丢弃未发布的修改
+    with pytest.raises(ValueError):
+        with first.writing():
+            first.delete_by_file_name("b.md")
+            raise ValueError
+    assert first.count() == 2
+
+
+def test_faiss_store_search_does_not_wait_for_writers(tmp_path):
+    store = FaissVectorStore(str(tmp_path), dim=4, metric_type="IP")
+    eye = np.eye(4, dtype=np.float32)
+    store.add_documents(_records("a.md", 0, eye[:2]))
+    written, release = threading.Event(), threading.Event()
+
+    def write():
+        with store.writing():
+            store.add_documents(_records("b.md", 0, eye[2:]))
+            store.delete_by_file_name("a.md")
+            written.set()
+            release.wait(5)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    assert written.wait(5)
+    # 写入方持有锁且修改尚未发布：检索不等待，仍读取已发布的版本
+    assert [hit.get("file_name") for hit in store.search(eye[0], top_k=4)[0]] == ["a.md", "a.md"]
+    assert store.count() == 2
+    release.set()
+    writer.join()
+    assert {hit.get("file_name") for hit in store.search(eye[2], top_k=4)[0]} == {"b.md"}
+    assert store.fetch_chunks([("a.md", 0)]) == []
+
+
+def test_parse_belong_to():
+    assert parse_belong_to(None) is None
+    assert parse_belong_to("belong_to == 3 or belong_to == 0") == [3, 0]
+    assert parse_belong_to("belong_to in [0, 5]") == [0, 5]
@@ -0,0 +1,43 @@
+import numpy as np
+
+from app.core.retrieval.fusion import CandidatePool, FusionEngine, distance_to_similarity, keyword_overlap
+
+
+def build_pool():
+    pool = CandidatePool()
+    # L2 距离越小越相似
+    pool.add_dense(("a.pdf", 0), 0.2, 0, {"keywords": "HashMap,哈希"})
+    pool.add_dense(("a.pdf", 1), 0.9, 1, {"keywords": "JVM"})
+    pool.add_dense(("b.md", 0), 1.4, 2, {"keywords": "HashMap,扩容"})
+    pool.add_sparse(("b.md", 0), 8.0, 0)
+    pool.add_sparse(("c.md", 3), 2.0, 1)
+    return pool
+
+
+def test_distance_to_similarity_inverts_l2():
+    sims = distance_to_similarity(np.array([0.0, 1.0, 2.0]), "L2")
+    assert np.allclose(sims, [1.0, 0.5, 0.0])
+    assert np.allclose(distance_to_similarity(np.array([0.3]), "IP"), [0.3])
+
+
+def test_keyword_overlap_matches_whole_keywords():
+    overlap, matched = keyword_overlap(["HashMap,哈希", "HashMapX", None], ["HashMap", "哈希"])
+    assert np.allclose(overlap, [1.0, 0.0, 0.0])
+    assert matched[0].tolist() == [True, True]
+
+
+def test_weighted_fusion_prefers_close_and_keyword_hits():
+    engine = FusionEngine(strategy="weighted", vector_weight=0.7, keyword_weight=0.3)
+    fused = engine.fuse(build_pool(), ["HashMap"], top_k=3)
+    assert [item["slot"] for item in fused] == [0, 2, 1]
+    assert fused[0]["vector_score"] > fused[1]["vector_score"]
+    assert fused[1]["bm25_score"] == 8.0
+    assert fused[0]["matched_keywords"] == ["HashMap"]
+
+
+def test_rrf_fusion_includes_sparse_only_hits():
+    engine = FusionEngine(strategy="rrf", vector_weight=0.5, keyword_weight=0.5)
+    fused = engine.fuse(build_pool(), [], top_k=4)
+    assert fused[0]["slot"] == 2  # 两路都命中
+    assert 3 in [item["slot"] for item in fused]
+    assert fused[-1]["vector_score"] is None or fused[-1]["bm25_score"] is None
@@ -0,0 +1,25 @@
+import pytest
+
+from app.db.index_profiles import INDEX_PROFILES, reconcile_with_index, resolve_index_profile, search_params
+
+
+def test_resolve_index_profile_fills_defaults():
+    assert resolve_index_profile("hnsw") == INDEX_PROFILES["hnsw"]
+    assert resolve_index_profile("hnsw") is not INDEX_PROFILES["hnsw"]
+
+    profile = resolve_index_profile({"index_type": "ivf_sq8", "params": {"nlist": 2048}})
+    assert profile["index_type"] == "IVF_SQ8" and profile["metric_type"] == "IP"
+    assert search_params(profile) == {"metric_type": "IP", "params": {"nprobe": 32}}
+
+    with pytest.raises(ValueError):
+        resolve_index_profile("ivf_pq_typo")
+
+
+def test_reconcile_prefers_built_index():
+    profile = resolve_index_profile("hnsw")
+    assert reconcile_with_index(profile, {"index_type": "HNSW", "metric_type": "IP"}) is profile
+
+    # 早期按 IVF_FLAT / L2 建好的集合：度量与检索参数都要跟随实际索引
+    legacy = reconcile_with_index(profile, {"index_type": "IVF_FLAT", "metric_type": "L2", "params": {"nlist": 128}})
+    assert legacy["metric_type"] == "L2"
+    assert legacy["search_params"] == {"nprobe": 10}
@@ -0,0 +1,115 @@
+import io
+import time
+
+import pytest
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.services.ingestion import IngestionJobQueue
+
+
+class _Pipeline:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.documents = []
+
+    def process_document(self, file_stream, file_name, user_id, progress=None, replace=False, collection_name=None):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("Milvus 不可用")
+        progress("embedding", chunks_processed=2)
+        self.documents.append((file_name, user_id, file_stream.read(), collection_name))
+        return {"added": 2, "removed": 0, "unchanged": 0}
+
+
+class _Oss:
+    def __init__(self):
+        self.uploaded = []
+
+    def upload_file_to_oss(self, file_stream, file_name, overwrite=False):
+        self.uploaded.append(file_name)
+        return None
+
+
+class _Queue(IngestionJobQueue):
+    """files 表的登记不在这里测试"""
+
+    def __init__(self):
+        super().__init__()
+        self.recorded = []
+
+    def _record_file(self, job):
+        self.recorded.append(job["file_name"])
+
+    @staticmethod
+    def _rollback():
+        pass
+
+
+def _queue(tmp_path, pipeline):
+    app = Flask(__name__)
+    app.extensions["pipeline"] = pipeline
+    app.extensions["oss"] = _Oss()
+    queue = _Queue()
+    queue.init_app(app, redis=fakeredis.FakeRedis())
+    queue.spool_dir = str(tmp_path)
+    return queue
+
+
+def _enqueue(queue, content=b"# HashMap"):
+    return queue.enqueue(FileStorage(io.BytesIO(content), filename="a.md"), "a.md", 7, "Java开发", "java_doc_plus")
+
+
+def test_claimed_job_runs_to_done(tmp_path):
+    pipeline = _Pipeline()
+    queue = _queue(tmp_path, pipeline)
+    job_id = _enqueue(queue)
+
+    assert queue.claim(timeout=1) == job_id
+    assert queue.redis.lrange("ingest:processing", 0, -1) == [job_id.encode()]
+    queue.process(job_id)
+
+    job = queue.get_job(job_id)
+    assert (job["status"], job["stage"], job["chunks_added"], job["attempts"]) == ("done", "done", 2, 1)
+    assert pipeline.documents == [("a.md", 7, b"# HashMap", "java_doc_plus")]
+    assert queue.recorded == ["a.md"] and queue.app.extensions["oss"].uploaded == ["a.md"]
+    # 成功后清理上传文件并移出 processing
+    assert list(tmp_path.iterdir()) == []
+    assert queue.redis.llen("ingest:processing") == 0
+    assert queue.claim(timeout=1) is None
+
+
+def test_failed_job_keeps_file_and_can_be_retried(tmp_path):
+    queue = _queue(tmp_path, _Pipeline(failures=1))
+    job_id = _enqueue(queue)
+    queue.process(queue.claim(timeout=1))
+
+    job = queue.get_job(job_id)
+    assert job["status"] == "failed" and "Milvus" in job["error"]
+    assert len(list(tmp_path.iterdir())) == 1
+    assert queue.retry(job_id) is None
+    assert queue.retry(job_id) == "只有失败的任务可以重试"
+
+    queue.process(queue.claim(timeout=1))
+    job = queue.get_job(job_id)
+    # 重试时不再重复上传 OSS
+    assert (job["status"], job["attempts"]) == ("done", 2)
+    assert queue.app.extensions["oss"].uploaded == ["a.md"]
+
+
+def test_recover_stale_requeues_abandoned_jobs(tmp_path):
+    queue = _queue(tmp_path, _Pipeline())
+    stale_id = _enqueue(queue)
+    fresh_id = _enqueue(queue)
+    assert queue.claim(timeout=1) == stale_id
+    assert queue.claim(timeout=1) == fresh_id
+    queue.update(stale_id, status="running")
+    queue.redis.hset(f"ingest:job:{stale_id}", "updated_at", time.time() - 3600)
+
+    # 领取任务的 worker 已退出：超时的任务放回队列，仍在更新的任务不动
+    queue.recover_stale(max_age=60)
+    assert queue.redis.lrange("ingest:processing", 0, -1) == [fresh_id.encode()]
+    assert queue.get_job(stale_id)["status"] == "queued"
+    assert queue.claim(timeout=1) == stale_id
@@ -0,0 +1,66 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.config import Settings
+from app.utils import intent_classifier
+from app.utils.intent_classifier import HybridIntentClassifier, InterviewIntent, get_local_intent_classifier
+
+
+class _StubLLMClassifier:
+    calls = []
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    async def classify_intent(self, text):
+        self.calls.append(text)
+        return InterviewIntent.PROCESS
+
+
+@pytest.fixture
+def centroids_path(tmp_path, monkeypatch):
+    path = tmp_path / "intent_centroids.npz"
+    monkeypatch.setattr(Settings, "INTENT_CENTROIDS_PATH", str(path))
+    monkeypatch.setattr(intent_classifier, "_local_classifier", None)
+    monkeypatch.setattr(intent_classifier, "IntentClassificationService", _StubLLMClassifier)
+    _StubLLMClassifier.calls = []
+    return path
+
+
+def _write_centroids(path):
+    intents = list(InterviewIntent)
+    np.savez(path, labels=np.array([intent.value for intent in intents]), centroids=np.eye(len(intents), 8),
+             temperature=np.float32(0.05), model_name=np.array("stub"))
+
+
+def test_local_classifier_answers_without_llm(centroids_path):
+    _write_centroids(centroids_path)
+    classifier = HybridIntentClassifier(threshold=0.6)
+    query_vector = np.eye(8)[list(InterviewIntent).index(InterviewIntent.ANALYSIS)]
+
+    intent = asyncio.run(classifier.classify_intent("HashMap 和 TreeMap 的区别", query_vector=query_vector))
+    assert intent is InterviewIntent.ANALYSIS
+    assert _StubLLMClassifier.calls == []
+
+
+def test_low_confidence_falls_back_to_llm(centroids_path):
+    _write_centroids(centroids_path)
+    classifier = HybridIntentClassifier(threshold=0.6)
+    # 与两个质心同样接近，置信度约 0.5
+    query_vector = np.eye(8)[0] + np.eye(8)[1]
+
+    intent = asyncio.run(classifier.classify_intent("随便问问", query_vector=query_vector))
+    assert intent is InterviewIntent.PROCESS
+    assert _StubLLMClassifier.calls == ["随便问问"]
+
+
+def test_missing_centroids_are_picked_up_later(centroids_path):
+    assert get_local_intent_classifier() is None
+    assert asyncio.run(HybridIntentClassifier().classify_intent("你好")) is InterviewIntent.PROCESS
+
+    # 之后生成的质心文件无需重启即可使用
+    _write_centroids(centroids_path)
+    classifier = get_local_intent_classifier()
+    assert classifier is not None and classifier.centroids.shape == (len(InterviewIntent), 8)
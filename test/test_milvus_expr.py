@@ -0,0 +1,6 @@
+from app.db.milvus_expr import file_name_expr, string_literal
+
+
+def test_string_literal_escapes_quotes_and_backslashes():
+    assert string_literal("a.md") == "'a.md'"
+    assert file_name_expr("Java's 面试\\题.pdf") == "file_name == 'Java\\'s 面试\\\\题.pdf'"
@@ -0,0 +1,37 @@
+from app.core.retrieval.rerank import RERANK_DROPPED, CrossEncoderReranker
+
+
+class _StubCrossEncoder:
+    """分数取自文档内容中预设的值，记录每次 predict 的批大小"""
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.batches = []
+
+    def predict(self, pairs, batch_size=None, show_progress_bar=False):
+        self.batches.append(len(pairs))
+        return [self.scores[content] for _, content in pairs]
+
+
+def _docs(*contents):
+    return [{"id": i, "content": content, "hybrid_score": 1.0 - i / 10} for i, content in enumerate(contents)]
+
+
+def test_rerank_orders_by_score_and_cuts_off():
+    model = _StubCrossEncoder({"a": 0.25, "b": 0.875, "c": 0.5, "d": 0.01, "e": 0.99})
+    reranker = CrossEncoderReranker(model, max_candidates=4, score_threshold=0.05)
+    dropped_before = RERANK_DROPPED.value()
+
+    kept, stats = reranker.rerank("HashMap", _docs("a", "b", "c", "d", "e"), top_k=2)
+    # 只有前 max_candidates 个候选参与打分，一次批量 predict
+    assert model.batches == [4]
+    assert [doc["content"] for doc in kept] == ["b", "c"]
+    assert [doc["rerank_score"] for doc in kept] == [0.875, 0.5]
+    assert stats["candidates"] == 4 and stats["dropped"] == 3 and stats["latency_ms"] >= 0
+    assert RERANK_DROPPED.value() - dropped_before == 3
+
+    # 低于阈值的候选被丢弃，但至少保留 min_keep 个
+    kept, stats = reranker.rerank("HashMap", _docs("a", "d"))
+    assert [doc["content"] for doc in kept] == ["a"] and stats["dropped"] == 1
+    kept, _ = reranker.rerank("HashMap", _docs("d"))
+    assert [doc["content"] for doc in kept] == ["d"]
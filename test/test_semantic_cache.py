@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+import pytest
+from flask import Flask
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.config import Settings
+from app.services import retrieval
+from app.services.semantic_cache import SemanticCache
+
+
+def _cache(**kwargs):
+    return SemanticCache(fakeredis.FakeRedis(), **kwargs)
+
+
+def _vector(cosine):
+    """与 [1, 0, 0, 0] 的余弦相似度为 cosine 的向量"""
+    return np.asarray([cosine, np.sqrt(1 - cosine ** 2), 0, 0], dtype=np.float32)
+
+
+def test_lookup_hits_only_above_threshold():
+    cache = _cache(threshold=0.9)
+    scope = SemanticCache.scope("java_doc_plus", 7, "deepseek", top_k=5)
+    cache.store(scope, "HashMap 怎么扩容", _vector(1.0), "两倍扩容", [{"id": 1, "file_name": "a.md"}])
+
+    hit = cache.lookup(scope, _vector(0.95) * 3)  # 只比较方向，与模长无关
+    assert hit["answer"] == "两倍扩容" and hit["doc_ids"] == [1]
+    assert hit["similarity"] == pytest.approx(0.95, abs=1e-6)
+    assert cache.lookup(scope, _vector(0.85)) is None
+
+
+def test_scope_separates_top_k_and_owner():
+    cache = _cache(threshold=0.9)
+    scope = SemanticCache.scope("java_doc_plus", 7, "deepseek", top_k=5)
+    cache.store(scope, "HashMap 怎么扩容", _vector(1.0), "两倍扩容", [])
+
+    assert cache.lookup(SemanticCache.scope("java_doc_plus", 7, "deepseek", top_k=3), _vector(1.0)) is None
+    assert cache.lookup(SemanticCache.scope("java_doc_plus", 8, "deepseek", top_k=5), _vector(1.0)) is None
+    assert cache.lookup(SemanticCache.scope("java_doc_plus", 7, "deepseek", top_k=5), _vector(1.0)) is not None
+
+
+@pytest.fixture
+def semantic_cache_global(monkeypatch):
+    monkeypatch.setattr(retrieval, "_semantic_cache", None)
+
+
+def test_semantic_cache_is_disabled_by_default(semantic_cache_global):
+    assert Settings.SEMANTIC_CACHE_ENABLED is False
+    assert retrieval.get_semantic_cache() is None
+
+
+def test_semantic_cache_is_created_once(semantic_cache_global, monkeypatch):
+    monkeypatch.setattr(Settings, "SEMANTIC_CACHE_ENABLED", True)
+    app = Flask(__name__)
+    app.extensions["redis"] = fakeredis.FakeRedis()
+    created = []
+    monkeypatch.setattr(retrieval, "SemanticCache", lambda *args, **kwargs: created.append(1) or object())
+
+    def get():
+        with app.app_context():
+            results.append(retrieval.get_semantic_cache())
+
+    results = []
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1 and len({id(result) for result in results}) == 1
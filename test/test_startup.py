@@ -0,0 +1,32 @@
+from flask import Flask
+
+from app.utils.startup import LazyExtension, boot_report, warmup
+
+
+class _Client:
+    def __init__(self):
+        self.collection_name = "java_doc_plus"
+
+    def ping(self):
+        return "pong"
+
+
+def test_lazy_extension_constructs_on_first_use():
+    created = []
+    client = LazyExtension("client", lambda: created.append(1) or _Client())
+    assert not client.lazy_loaded and created == []
+
+    assert client.collection_name == "java_doc_plus"
+    assert client.ping() == "pong"
+    assert created == [1]
+    assert "client" in boot_report.components
+
+
+def test_warmup_resolves_registered_extensions():
+    app = Flask(__name__)
+    app.extensions["lazy_client"] = LazyExtension("lazy_client", _Client)
+    app.extensions["other"] = LazyExtension("other", _Client)
+
+    warmup(app, names=["lazy_client"])
+    assert app.extensions["lazy_client"].lazy_loaded
+    assert not app.extensions["other"].lazy_loaded
@@ -0,0 +1,31 @@
+import jieba.analyse
+
+from app.pipelines.tokenizer import KEYWORD_POS, get_chinese_tokenizer
+
+TEXT = "ConcurrentHashMap 在 JDK8 中放弃了分段锁，改用 CAS 与 synchronized 保证线程安全，扩容时多线程协助迁移"
+
+
+def test_memoized_keywords_match_uncached_extraction():
+    tokenizer = get_chinese_tokenizer()
+    uncached = jieba.analyse.extract_tags(TEXT, topK=5, withWeight=True, allowPOS=KEYWORD_POS)
+
+    assert tokenizer.extract_keywords(TEXT, top_k=5) == uncached
+    # 第二次命中缓存，结果不变
+    assert tokenizer.extract_keywords(TEXT, top_k=5) == uncached
+    assert tokenizer.extract_keywords_without_weight(TEXT, top_k=5) == [word for word, _ in uncached]
+    assert tokenizer.keyword_cache_info().hits >= 2
+
+
+def test_memoized_keywords_are_not_shared():
+    tokenizer = get_chinese_tokenizer()
+    first = tokenizer.extract_keywords(TEXT, top_k=3)
+    second = tokenizer.extract_keywords(TEXT, top_k=3)
+    assert first == second and first is not second
+
+    # 调用方修改返回的列表不影响缓存中的结果
+    expected = list(first)
+    first.append(("injected", 1.0))
+    first[0] = ("replaced", 0.0)
+    tokenizer.extract_keywords_without_weight(TEXT, top_k=3).clear()
+    assert tokenizer.extract_keywords(TEXT, top_k=3) == expected
+    assert all(isinstance(keyword, tuple) for keyword in expected)